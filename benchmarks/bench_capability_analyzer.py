@@ -0,0 +1,49 @@
+"""
+Per-query cost of CapabilityAnalyzer as the number of registered capabilities grows.
+
+Run from the repository root:
+    python -m benchmarks.bench_capability_analyzer
+"""
+import random
+import string
+import time
+
+from components.capability_registry import CapabilityRegistry
+from components.capability_analyzer import CapabilityAnalyzer
+
+CAPABILITY_COUNTS = [10, 100, 1_000, 10_000, 100_000]
+QUERY_COUNT = 2_000
+
+def random_word(rng: random.Random, length: int = 8) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+def build_analyzer(capability_count: int, rng: random.Random) -> CapabilityAnalyzer:
+    registry = CapabilityRegistry()
+    analyzer = CapabilityAnalyzer(registry)
+    for i in range(capability_count):
+        registry.add_keywords(f"capability_{i}", [random_word(rng, rng.randint(4, 14)) for _ in range(2)])
+    analyzer.build_index()
+    return analyzer
+
+def make_queries(rng: random.Random):
+    return [" ".join(random_word(rng, rng.randint(3, 9)) for _ in range(10)) for _ in range(QUERY_COUNT)]
+
+if __name__ == '__main__':
+    rng = random.Random(42)
+    queries = make_queries(rng)
+    print(f"{'capabilities':>12} {'build (ms)':>12} {'per query (us)':>16} {'batch per query (us)':>22}")
+    for capability_count in CAPABILITY_COUNTS:
+        start = time.perf_counter()
+        analyzer = build_analyzer(capability_count, rng)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for query in queries:
+            analyzer.analyze(query)
+        single_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+        start = time.perf_counter()
+        analyzer.analyze_many(queries)
+        batch_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+        print(f"{capability_count:>12} {build_ms:>12.1f} {single_us:>16.2f} {batch_us:>22.2f}")
@@ -0,0 +1,54 @@
+"""
+Registration, deregistration and lookup cost of CapabilityIndex as the number of tools grows.
+
+Run from the repository root:
+    python -m benchmarks.bench_capability_index
+"""
+import random
+import time
+
+from components.capability_index import CapabilityIndex
+from components.mcp_client import MCPTool
+
+TOOL_COUNTS = [1_000, 10_000, 100_000]
+CAPABILITY_COUNT = 5_000
+LOOKUP_COUNT = 100_000
+
+def make_tools(tool_count: int, rng: random.Random):
+    return [
+        MCPTool(id=f"tool_{i}", name=f"Tool {i}", capabilities=[f"capability_{rng.randrange(CAPABILITY_COUNT)}" for _ in range(3)])
+        for i in range(tool_count)
+    ]
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+if __name__ == '__main__':
+    rng = random.Random(42)
+    print(f"{'tools':>8} {'register (ms)':>14} {'register_many (ms)':>19} {'deregister (ms)':>16} {'lookup (ns)':>12} {'write+snapshot (us)':>20}")
+    for tool_count in TOOL_COUNTS:
+        tools = make_tools(tool_count, rng)
+
+        index = CapabilityIndex()
+        register_ms = timed(lambda: [index.register_tool(tool) for tool in tools])
+
+        bulk_index = CapabilityIndex()
+        register_many_ms = timed(lambda: bulk_index.register_many(tools))
+
+        snapshot = bulk_index.snapshot()
+        capabilities = [f"capability_{rng.randrange(CAPABILITY_COUNT * 2)}" for _ in range(LOOKUP_COUNT)]
+        start = time.perf_counter()
+        for capability in capabilities:
+            snapshot.can_handle(capability)
+            snapshot.get_tools_for_capability(capability)
+        lookup_ns = (time.perf_counter() - start) / LOOKUP_COUNT * 1e9
+
+        # A single write after a snapshot was published pays the copy-on-write cost once
+        extra_tool = MCPTool(id="extra", name="Extra", capabilities=["capability_0"])
+        write_us = timed(lambda: (bulk_index.register_tool(extra_tool), bulk_index.snapshot())) * 1000
+
+        deregister_ms = timed(lambda: [index.deregister_tool(tool.id) for tool in tools])
+
+        print(f"{tool_count:>8} {register_ms:>14.1f} {register_many_ms:>19.1f} {deregister_ms:>16.1f} {lookup_ns:>12.0f} {write_us:>20.0f}")
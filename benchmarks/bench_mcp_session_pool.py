@@ -0,0 +1,54 @@
+"""
+Cold (spawn + handshake per call) versus warm (pooled session) MCP call latency,
+against the local stub MCP server.
+
+Run from the repository root:
+    python -m benchmarks.bench_mcp_session_pool
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from components.mcp_client import MCPTool
+from components.mcp_session_pool import MCPSession, MCPSessionPool
+
+CALLS = 50
+CONCURRENT_CALLS = 500
+STUB_COMMAND = [sys.executable, "-m", "components.stub_mcp_server"]
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return f"p50={statistics.median(latencies) * 1000:8.2f}ms  p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:8.2f}ms"
+
+async def cold_call() -> float:
+    start = time.perf_counter()
+    session = MCPSession("stub", STUB_COMMAND)
+    await session.start()
+    await session.call_tool("echo", {"query": "cats"})
+    elapsed = time.perf_counter() - start
+    await session.close()
+    return elapsed
+
+async def main():
+    cold = [await cold_call() for _ in range(CALLS // 5)]
+    print(f"cold  (new session per call): {summarize(cold)}")
+
+    pool = MCPSessionPool(max_sessions_per_tool=2)
+    tool = MCPTool(id="stub", name="Stub", capabilities=["echo"], command=STUB_COMMAND)
+    await pool.warm(tool)
+    warm = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        await pool.call(tool, "echo", {"query": "cats"})
+        warm.append(time.perf_counter() - start)
+    print(f"warm  (pooled session):       {summarize(warm)}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.call(tool, "echo", {"query": f"q{i}"}) for i in range(CONCURRENT_CALLS)))
+    elapsed = time.perf_counter() - start
+    print(f"multiplexed: {CONCURRENT_CALLS} concurrent calls in {elapsed * 1000:.1f}ms ({CONCURRENT_CALLS / elapsed:.0f} calls/s), pool: {pool.stats()}")
+    await pool.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""
+Overload test for POST /query: an open-loop load generator offers queries at a
+multiple of what the tool behind them can serve, with and without admission
+control, and reports latency percentiles, goodput and shed counts.
+
+The tool models a backend with a fixed number of workers (--tool-capacity),
+each taking --service-ms per call, so it serves capacity / service time calls
+per second. Arrivals are Poisson at --overload times that rate and do not wait
+for earlier responses, like independent clients. Each query is unique, so the
+result cache never answers. Without admission control the backlog, and with
+it latency, grows for as long as the overload lasts; with it, excess queries
+are rejected with 429 and admitted ones keep a bounded latency.
+
+Results are written to benchmarks/results/overload.json.
+
+Run from the repository root:
+    python -m benchmarks.bench_overload [--seconds 10] [--overload 5] [--tool-capacity 4] [--service-ms 50]
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+import main
+from benchmarks.harness import latency_stats, print_table, write_results
+from components.mcp_client import MCPTool
+
+def install_backend(capacity: int, service_time: float):
+    """
+    Replaces the essential weather_api tool with one backed by `capacity` workers.
+    """
+    workers = asyncio.Semaphore(capacity)
+
+    async def handler(query: str, **_: Any) -> str:
+        async with workers:
+            await asyncio.sleep(service_time)
+        return f"answer for {query}"
+
+    main.capability_registry.register_capability_from_tool(
+        MCPTool(id="weather_api_tool", name="Weather Backend", capabilities=["weather_api"], handler=handler)
+    )
+
+async def drive(client: httpx.AsyncClient, rate: float, seconds: float, rng: random.Random) -> Tuple[Dict[str, List[float]], float]:
+    loop = asyncio.get_running_loop()
+    outcomes: Dict[str, List[float]] = {"ok": [], "shed": [], "error": []}
+
+    async def send(i: int):
+        start = time.perf_counter()
+        response = await client.post("/query", params={"query": f"what is the weather in city {i}"})
+        elapsed = time.perf_counter() - start
+        if response.status_code == 429:
+            outcomes["shed"].append(elapsed)
+        elif response.status_code == 200 and response.json()["response"]["status"] == "success":
+            outcomes["ok"].append(elapsed)
+        else:
+            outcomes["error"].append(elapsed)
+
+    requests: List[asyncio.Task] = []
+    start = loop.time()
+    next_arrival = start
+    while next_arrival < start + seconds:
+        delay = next_arrival - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        requests.append(asyncio.ensure_future(send(len(requests))))
+        next_arrival += rng.expovariate(rate)
+    await asyncio.gather(*requests)
+    return outcomes, loop.time() - start
+
+async def run_scenario(admission_control: bool, seconds: float, overload: float, capacity: int, service_time: float) -> List[Dict[str, Any]]:
+    main.REGISTRY_DATA_DIR = None
+    main.LOG_LEVEL = "ERROR"
+    main.ADMISSION_CONTROL = admission_control
+    # As an operator would: the tool's limit matches its backend, and the latency target is a few service times
+    main.TOOL_CONCURRENCY_OVERRIDES = {"weather_api_tool": capacity}
+    main.QUERY_LATENCY_TARGET_SECONDS = service_time * 5
+    capacity_qps = capacity / service_time
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        install_backend(capacity, service_time)
+        outcomes, elapsed = await drive(client, capacity_qps * overload, seconds, random.Random(42))
+        limiter_stats = main.query_limiter.stats() if main.query_limiter is not None else {}
+
+    scenario = "admission_control" if admission_control else "unprotected"
+    params = {"seconds": seconds, "overload": overload, "capacity_qps": capacity_qps, "service_ms": service_time * 1000}
+    offered = sum(len(outcomes[key]) for key in ("ok", "shed", "error"))
+    overall = latency_stats(outcomes["ok"] + outcomes["error"])
+    overall.update({
+        "offered_qps": offered / seconds,
+        "goodput_qps": len(outcomes["ok"]) / elapsed,
+        "shed": len(outcomes["shed"]),
+        "errors": len(outcomes["error"]),
+        "final_limit": limiter_stats.get("limit", 0),
+    })
+    results = [{"name": f"overload.{scenario}.admitted", "params": params, "stats": overall}]
+    if outcomes["shed"]:
+        results.append({"name": f"overload.{scenario}.shed", "params": params, "stats": latency_stats(outcomes["shed"])})
+    return results
+
+async def run(seconds: float, overload: float, capacity: int, service_time: float) -> List[Dict[str, Any]]:
+    results = []
+    for admission_control in (False, True):
+        results += await run_scenario(admission_control, seconds, overload, capacity, service_time)
+    main.ADMISSION_CONTROL = True
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Overload test for POST /query")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--overload", type=float, default=5.0, help="offered load as a multiple of the tool's capacity")
+    parser.add_argument("--tool-capacity", type=int, default=4, help="concurrent calls the tool's backend serves")
+    parser.add_argument("--service-ms", type=float, default=50.0)
+    parser.add_argument("--output", help="result file (default benchmarks/results/overload.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.seconds, args.overload, args.tool_capacity, args.service_ms / 1000))
+    print_table(results, ["count", "offered_qps", "goodput_qps", "p50_ms", "p99_ms", "max_ms", "shed", "errors", "final_limit"])
+    print(f"Results written to {write_results('overload', results, args.output)}")
@@ -0,0 +1,60 @@
+"""
+Throughput of POST /query/batch versus one POST /query per query, driven in-process.
+
+Run from the repository root:
+    python -m benchmarks.bench_query_batch
+"""
+import asyncio
+import contextlib
+import io
+import json
+import time
+
+import httpx
+
+import main
+
+BATCH_SIZES = [10, 100, 1_000]
+QUERY_MIX = ["latest news", "what is the weather", "search for cats", "tell me a joke"]
+
+def make_queries(count: int):
+    return [f"{QUERY_MIX[i % len(QUERY_MIX)]} #{i}" for i in range(count)]
+
+async def run_single(client: httpx.AsyncClient, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        response = await client.post("/query", params={"query": query})
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+async def run_batch(client: httpx.AsyncClient, queries) -> float:
+    start = time.perf_counter()
+    response = await client.post("/query/batch", json={"queries": queries})
+    response.raise_for_status()
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert len(lines) == len(queries)
+    return time.perf_counter() - start
+
+async def main_async():
+    # An in-memory registry, so the tools integrated during the benchmark are not persisted
+    main.REGISTRY_DATA_DIR = None
+    main.LOG_LEVEL = "ERROR"
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up: integrate discoverable tools and cache negative discovery results
+        with contextlib.redirect_stdout(io.StringIO()):
+            await run_single(client, make_queries(len(QUERY_MIX)))
+            await run_batch(client, make_queries(len(QUERY_MIX)))
+
+        print(f"{'queries':>8} {'/query (q/s)':>14} {'/query/batch (q/s)':>20} {'speedup':>8}")
+        for batch_size in BATCH_SIZES:
+            queries = make_queries(batch_size)
+            with contextlib.redirect_stdout(io.StringIO()):
+                single_seconds = await run_single(client, queries)
+                batch_seconds = await run_batch(client, queries)
+            single_qps = batch_size / single_seconds
+            batch_qps = batch_size / batch_seconds
+            print(f"{batch_size:>8} {single_qps:>14.0f} {batch_qps:>20.0f} {batch_qps / single_qps:>7.1f}x")
+
+if __name__ == '__main__':
+    asyncio.run(main_async())
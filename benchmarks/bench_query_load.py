@@ -0,0 +1,137 @@
+"""
+In-process load generator for POST /query. Drives the ASGI app with a
+configurable mix of query classes and reports throughput and latency
+percentiles per class:
+
+    cached   repeated queries whose capabilities have tools and whose results
+             are already in the result cache
+    missing  queries naming a capability no tool provides yet, so each one
+             queues a background integration job and gets a partial answer
+    unknown  queries matching no capability keyword
+
+Tools backing the cached class get a handler that sleeps --tool-latency-ms, so
+cache hits and misses are distinguishable. Results are written to
+benchmarks/results/query_load.json.
+
+Run from the repository root:
+    python -m benchmarks.bench_query_load [--requests 2000] [--concurrency 32] [--mix cached=0.6,missing=0.2,unknown=0.2]
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+import main
+from benchmarks.harness import latency_stats, print_table, write_results
+from components.mcp_client import MCPTool
+
+DEFAULT_MIX = {"cached": 0.6, "missing": 0.2, "unknown": 0.2}
+CACHED_QUERY_POOL = [f"what is the weather in city {i}" for i in range(10)] + [f"search for topic {i}" for i in range(10)]
+# Capabilities of the essential tools the cached class exercises
+HANDLED_CAPABILITIES = ["weather_api", "web_search"]
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown query class '{name}', expected one of {list(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+def install_handlers(tool_latency: float):
+    """
+    Gives the essential tools for the cached class a handler, so their results
+    are real successes that the result cache stores.
+    """
+    async def handler(query: str, **_: Any) -> str:
+        await asyncio.sleep(tool_latency)
+        return f"answer for {query}"
+
+    for capability in HANDLED_CAPABILITIES:
+        main.capability_registry.register_capability_from_tool(
+            MCPTool(id=f"{capability}_tool", name=f"{capability} (benchmark)", capabilities=[capability], handler=handler)
+        )
+
+def make_workload(request_count: int, mix: Dict[str, float], rng: random.Random) -> List[Tuple[str, str]]:
+    classes = rng.choices(list(mix), weights=list(mix.values()), k=request_count)
+    workload = []
+    for i, query_class in enumerate(classes):
+        if query_class == "cached":
+            query = rng.choice(CACHED_QUERY_POOL)
+        elif query_class == "missing":
+            # A fresh capability per query; its keyword is registered before the run
+            capability = f"load_missing_{i}"
+            main.capability_registry.add_keywords(capability, [f"lmiss{i}"])
+            query = f"please do lmiss{i}"
+        else:
+            query = f"tell me something about zq{rng.randrange(1_000_000)}"
+        workload.append((query_class, query))
+    return workload
+
+async def drive(client: httpx.AsyncClient, workload: List[Tuple[str, str]], concurrency: int) -> Tuple[Dict[str, List[float]], int, float]:
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+    position = 0
+
+    async def worker():
+        nonlocal errors, position
+        while position < len(workload):
+            query_class, query = workload[position]
+            position += 1
+            start = time.perf_counter()
+            response = await client.post("/query", params={"query": query})
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                errors += 1
+            latencies.setdefault(query_class, []).append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+async def run(request_count: int, concurrency: int, mix: Dict[str, float], tool_latency: float, seed: int = 42) -> List[Dict[str, Any]]:
+    # An in-memory registry, so the benchmark's tools and keywords are not persisted
+    main.REGISTRY_DATA_DIR = None
+    main.LOG_LEVEL = "ERROR"
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        install_handlers(tool_latency)
+        workload = make_workload(request_count, mix, random.Random(seed))
+
+        # Warm up: fill the result cache for the cached class
+        for query in CACHED_QUERY_POOL:
+            await client.post("/query", params={"query": query})
+        cache_before = main.mcp_client.result_cache.stats()
+
+        latencies, errors, elapsed = await drive(client, workload, concurrency)
+        cache_after = main.mcp_client.result_cache.stats()
+
+    params = {"requests": request_count, "concurrency": concurrency, "mix": mix, "tool_latency_ms": tool_latency * 1000}
+    all_latencies = [latency for class_latencies in latencies.values() for latency in class_latencies]
+    overall = {**latency_stats(all_latencies), "throughput_qps": len(all_latencies) / elapsed, "errors": errors}
+    lookups = sum(cache_after[key] - cache_before[key] for key in ("hits", "stale_hits", "misses"))
+    hits = sum(cache_after[key] - cache_before[key] for key in ("hits", "stale_hits"))
+    overall["cache_hit_rate"] = hits / lookups if lookups else 0.0
+
+    results = [{"name": "query_load.all", "params": params, "stats": overall}]
+    for query_class in mix:
+        if query_class in latencies:
+            results.append({"name": f"query_load.{query_class}", "params": params, "stats": latency_stats(latencies[query_class])})
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="In-process load generator for POST /query")
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. cached=0.6,missing=0.2,unknown=0.2")
+    parser.add_argument("--tool-latency-ms", type=float, default=5.0)
+    parser.add_argument("--output", help="result file (default benchmarks/results/query_load.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.concurrency, args.mix, args.tool_latency_ms / 1000))
+    print_table(results, ["count", "throughput_qps", "p50_ms", "p95_ms", "p99_ms", "cache_hit_rate", "errors"])
+    print(f"Results written to {write_results('query_load', results, args.output)}")
@@ -0,0 +1,167 @@
+"""
+Microbenchmarks for CapabilityRegistry and MCPClient registration and lookups
+at 1k, 10k and 100k registered tools, and the memory a registry of that size
+uses per tool. Results are written to benchmarks/results/registry.json (see
+benchmarks.harness for comparing runs).
+
+Run from the repository root:
+    python -m benchmarks.bench_registry [--sizes 1000 10000] [--output PATH]
+"""
+import argparse
+import gc
+import itertools
+import random
+import tracemalloc
+from typing import Any, Dict, List
+
+from benchmarks.harness import bench, bench_once, print_table, write_results
+from components.capability_registry import CapabilityRegistry
+from components.mcp_client import MCPClient, MCPTool
+from components.structured_logger import configure_logging
+
+TOOL_COUNTS = [1_000, 10_000, 100_000]
+CAPABILITIES_PER_TOOL = 3
+# Each tool draws from a capability space proportional to the tool count
+TOOLS_PER_CAPABILITY = 4
+REQUIRED_PER_QUERY = 5
+
+def make_tools(prefix: str, count: int, capability_count: int, rng: random.Random) -> List[MCPTool]:
+    return [
+        MCPTool(
+            id=f"{prefix}_{i}",
+            name=f"Tool {i}",
+            capabilities=[f"capability_{rng.randrange(capability_count)}" for _ in range(CAPABILITIES_PER_TOOL)]
+        )
+        for i in range(count)
+    ]
+
+def memory_per_tool(tool_count: int, capability_count: int, rng: random.Random) -> Dict[str, Any]:
+    """
+    Bytes allocated per tool by the tool objects, and by a registry indexing
+    them, as traced by tracemalloc.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tools = make_tools("memory", tool_count, capability_count, rng)
+        tool_bytes = tracemalloc.get_traced_memory()[0]
+        registry = CapabilityRegistry()
+        registry.register_many(tools)
+        registry.snapshot()
+        total_bytes = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return {"name": f"registry.memory[{tool_count}]", "params": {"tools": tool_count}, "stats": {
+        "tool_bytes": tool_bytes / tool_count,
+        "index_bytes": (total_bytes - tool_bytes) / tool_count,
+        "bytes_per_tool": total_bytes / tool_count,
+    }}
+
+class FreshTools:
+    """
+    Supplies never-registered tools to a registration benchmark, and removes
+    the previous round's tools so every round starts from the same size.
+    """
+
+    def __init__(self, register, deregister, capability_count: int, rng: random.Random):
+        self.register = register
+        self.deregister = deregister
+        self.capability_count = capability_count
+        self.rng = rng
+        self.added: List[MCPTool] = []
+        self.rounds = 0
+
+    def setup(self, iterations: int):
+        for tool in self.added:
+            self.deregister(tool.id)
+        self.rounds += 1
+        self.added = make_tools(f"fresh_{self.rounds}", iterations, self.capability_count, self.rng)
+        return iter(self.added)
+
+    def teardown(self):
+        self.setup(0)
+
+def run(tool_counts: List[int]) -> List[Dict[str, Any]]:
+    rng = random.Random(42)
+    results = []
+    for tool_count in tool_counts:
+        capability_count = max(tool_count * CAPABILITIES_PER_TOOL // TOOLS_PER_CAPABILITY, 1)
+        tools = make_tools("tool", tool_count, capability_count, rng)
+        params = {"tools": tool_count}
+        results.append(memory_per_tool(tool_count, capability_count, rng))
+
+        registry = CapabilityRegistry()
+        fill = bench_once(f"registry.fill[{tool_count}]", lambda: [registry.register_capability_from_tool(tool) for tool in tools], **params)
+        fill["stats"]["per_tool_us"] = fill["stats"]["seconds"] / tool_count * 1e6
+        results.append(fill)
+
+        fresh = FreshTools(registry.register_capability_from_tool, registry.deregister_tool, capability_count, rng)
+        results.append(bench(
+            f"registry.register_capability_from_tool[{tool_count}]",
+            lambda new_tools: registry.register_capability_from_tool(next(new_tools)),
+            setup=fresh.setup, **params
+        ))
+        fresh.teardown()
+
+        # Under query traffic a snapshot is nearly always live, so each write follows one
+        fresh = FreshTools(registry.register_capability_from_tool, registry.deregister_tool, capability_count, rng)
+
+        def register_after_snapshot(new_tools):
+            registry.snapshot()
+            registry.register_capability_from_tool(next(new_tools))
+
+        results.append(bench(
+            f"registry.register_after_snapshot[{tool_count}]",
+            register_after_snapshot,
+            setup=fresh.setup, **params
+        ))
+        fresh.teardown()
+
+        # Half the lookups hit registered capabilities, half miss
+        lookups = itertools.cycle(
+            [f"capability_{rng.randrange(capability_count * 2)}" for _ in range(10_000)]
+        )
+        results.append(bench(
+            f"registry.can_handle[{tool_count}]",
+            lambda: registry.can_handle(next(lookups)), **params
+        ))
+
+        handled = list(registry.index.snapshot().capabilities)
+        all_handled = itertools.cycle([rng.sample(handled, REQUIRED_PER_QUERY) for _ in range(1_000)])
+        results.append(bench(
+            f"registry.find_missing_capability.all_handled[{tool_count}]",
+            lambda: registry.find_missing_capability(next(all_handled)), **params
+        ))
+        one_missing = itertools.cycle([
+            rng.sample(handled, REQUIRED_PER_QUERY - 1) + [f"unregistered_{i}"] for i in range(1_000)
+        ])
+        results.append(bench(
+            f"registry.find_missing_capability.one_missing[{tool_count}]",
+            lambda: registry.find_missing_capability(next(one_missing)), **params
+        ))
+
+        client = MCPClient()
+        client_fill = bench_once(f"client.fill[{tool_count}]", lambda: [client.register_tool(tool) for tool in tools], **params)
+        client_fill["stats"]["per_tool_us"] = client_fill["stats"]["seconds"] / tool_count * 1e6
+        results.append(client_fill)
+
+        fresh = FreshTools(client.register_tool, client.deregister_tool, capability_count, rng)
+        results.append(bench(
+            f"client.register_tool[{tool_count}]",
+            lambda new_tools: client.register_tool(next(new_tools)),
+            setup=fresh.setup, **params
+        ))
+        fresh.teardown()
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=TOOL_COUNTS)
+    parser.add_argument("--output", help="result file (default benchmarks/results/registry.json)")
+    args = parser.parse_args()
+
+    # Keep log output out of the measurements
+    configure_logging(level="ERROR")
+    results = run(args.sizes)
+    print_table(results, ["median_us", "min_us", "ops", "per_tool_us", "seconds", "bytes_per_tool"])
+    print(f"Results written to {write_results('registry', results, args.output)}")
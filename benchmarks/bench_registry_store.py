@@ -0,0 +1,146 @@
+"""
+Cold start with a persisted registry of previously integrated tools: time to
+load the registry store, build the registry, build the analyzer's keyword
+index (done in slices on the event loop after startup by the application),
+run the full application lifespan startup, and answer the first query after
+it, which waits for that index; then wait for the similarity matrix too,
+tracking the longest the event loop was kept from running other requests
+meanwhile; compared with replaying an uncompacted log. Every tool
+carries one keyword, so the analyzer build is a worst case for keyword count.
+Results are written to benchmarks/results/registry_store.json.
+
+Run from the repository root:
+    python -m benchmarks.bench_registry_store [--tools 50000]
+"""
+import argparse
+import asyncio
+import gc
+import io
+import random
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import main
+from benchmarks.harness import print_table, write_results
+from components.capability_analyzer import CapabilityAnalyzer
+from components.capability_registry import CapabilityRegistry
+from components.mcp_client import MCPTool
+from components.registry_store import RegistryStore
+from components.structured_logger import configure_logging
+
+TOOL_COUNT = 50_000
+REPEATS = 5
+
+def populate(directory: str, tool_count: int, compact: bool):
+    rng = random.Random(42)
+    capability_count = tool_count * 3 // 4
+    store = RegistryStore(directory, compact_after=tool_count * 10)
+    registry = CapabilityRegistry(store.load(), store=store)
+    for i in range(tool_count):
+        capability = f"capability_{rng.randrange(capability_count)}"
+        registry.register_capability_from_tool(MCPTool(
+            id=f"tool_{i}",
+            name=f"Integrated Tool {i}",
+            capabilities=[capability, f"capability_{rng.randrange(capability_count)}"],
+            keywords=[f"kw{i}"],
+            command=["python", "-m", f"tools.tool_{i}"]
+        ))
+    store.close(compact=compact)
+
+def best_of(fn, repeats: int = REPEATS) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def load_registry(directory: str) -> CapabilityRegistry:
+    store = RegistryStore(directory)
+    registry = CapabilityRegistry(store.load(), store=store)
+    store.close(compact=False)
+    return registry
+
+async def lifespan_startup_ms(directory: str) -> Dict[str, float]:
+    main.REGISTRY_DATA_DIR = directory
+    # Starting local tool workers spawns processes, unrelated to the registry
+    main.LOCAL_TOOLS_DIRECTORY = None
+    start = time.perf_counter()
+    async with main.lifespan(main.app):
+        startup = time.perf_counter() - start
+        # Requests are served while the indexes build: track the longest the loop went without running them
+        longest_stall = 0.0
+
+        async def watch_loop():
+            nonlocal longest_stall
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0)
+                now = time.perf_counter()
+                longest_stall = max(longest_stall, now - last)
+                last = now
+
+        watcher = asyncio.ensure_future(watch_loop())
+        await main.analyze_capabilities("what is the weather in paris")
+        first_query = time.perf_counter() - start
+        while not main.capability_analyzer.fallback.ready:
+            await asyncio.sleep(0.001)
+        indexes_ready = time.perf_counter() - start
+        watcher.cancel()
+        # Shutdown may compact; keep the directory as it is for the next layout
+        main.capability_registry.store.close(compact=False)
+    return {
+        "lifespan_startup_ms": startup * 1000,
+        "first_query_ms": first_query * 1000,
+        "indexes_ready_ms": indexes_ready * 1000,
+        "max_loop_stall_ms": longest_stall * 1000,
+    }
+
+def run(tool_count: int) -> List[Dict[str, Any]]:
+    results = []
+    for layout, compact in (("snapshot", True), ("log_replay", False)):
+        directory = tempfile.mkdtemp(prefix="neuroforge-registry-")
+        try:
+            populate(directory, tool_count, compact)
+            params = {"tools": tool_count, "layout": layout}
+            store_ms = best_of(lambda: RegistryStore(directory).load())
+            registry_ms = best_of(lambda: load_registry(directory))
+            registry = load_registry(directory)
+            analyzer_ms = best_of(lambda: CapabilityAnalyzer(registry).build_index())
+            # Measured once, with nothing else alive, like a fresh worker; a long
+            # log is compacted in the background after the first start
+            del registry
+            gc.collect()
+            lifespan = asyncio.run(lifespan_startup_ms(directory))
+
+            registry = load_registry(directory)
+            start = time.perf_counter()
+            handled = registry.can_handle("capability_7")
+            tool = registry.snapshot().get_tool(f"tool_{tool_count // 2}")
+            first_lookup_us = (time.perf_counter() - start) * 1e6
+            assert tool is not None and handled == bool(registry.get_tools_for_capability("capability_7"))
+
+            results.append({"name": f"registry_store.cold_start.{layout}[{tool_count}]", "params": params, "stats": {
+                "store_load_ms": store_ms,
+                "registry_load_ms": registry_ms,
+                "analyzer_build_ms": analyzer_ms,
+                **lifespan,
+                "first_lookup_us": first_lookup_us,
+            }})
+        finally:
+            shutil.rmtree(directory)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Registry cold start benchmark")
+    parser.add_argument("--tools", type=int, default=TOOL_COUNT)
+    parser.add_argument("--output", help="result file (default benchmarks/results/registry_store.json)")
+    args = parser.parse_args()
+
+    configure_logging(level="ERROR", stream=io.StringIO())
+    main.LOG_LEVEL = "ERROR"
+    results = run(args.tools)
+    print_table(results, ["store_load_ms", "registry_load_ms", "analyzer_build_ms", "lifespan_startup_ms", "first_query_ms", "indexes_ready_ms", "max_loop_stall_ms", "first_lookup_us"])
+    print(f"Results written to {write_results('registry_store', results, args.output)}")
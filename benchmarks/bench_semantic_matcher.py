@@ -0,0 +1,115 @@
+"""
+Benchmarks SemanticMatcher at 1k, 10k and 100k capabilities: build time,
+single-query and batched scoring latency, incremental updates, and match
+quality on a fixed set of realistic capabilities hidden among synthetic ones.
+Results are written to benchmarks/results/semantic_matcher.json.
+
+Run from the repository root:
+    python -m benchmarks.bench_semantic_matcher [--sizes 1000 10000] [--output PATH]
+"""
+import argparse
+import itertools
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.harness import bench, bench_once, print_table, write_results
+from components.capability_registry import CapabilityRegistry
+from components.mcp_client import MCPTool
+from components.semantic_matcher import SemanticMatcher
+from components.structured_logger import configure_logging
+
+CAPABILITY_COUNTS = [1_000, 10_000, 100_000]
+BATCH_SIZE = 64
+
+# Capabilities the quality check expects to find, with their tool name and keywords
+REAL_CAPABILITIES = {
+    "text_summarization": ("Text Summarization Tool", ["summarize", "summary"]),
+    "language_translation": ("Language Translation Tool", ["translate"]),
+    "pdf_extraction": ("PDF Text Extractor", ["pdf", "extract"]),
+    "image_resize": ("Image Resizer", ["resize", "picture"]),
+    "stock_quotes": ("Stock Quotes Tool", ["share price", "market"]),
+    "calendar_events": ("Calendar Tool", ["meeting", "schedule"]),
+    "currency_conversion": ("Currency Converter", ["exchange rate", "money"]),
+}
+# Queries that miss every keyword, with the capability expected first (None: no match)
+QUALITY_QUERIES: List[Tuple[str, Optional[str]]] = [
+    ("can you summarise this article", "text_summarization"),
+    ("translation of this paragraph into french please", "language_translation"),
+    ("get the text out of this pdf file", "pdf_extraction"),
+    ("make this image smaller", "image_resize"),
+    ("what is acme stock trading at", "stock_quotes"),
+    ("put a meeting in my calendar for tomorrow", "calendar_events"),
+    ("how much is 10 dollars in euros, currency please", "currency_conversion"),
+    ("tell me a joke", None),
+    ("hello there", None),
+]
+
+def pseudo_word(rng: random.Random) -> str:
+    return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 4)))
+
+def make_registry(capability_count: int, rng: random.Random) -> CapabilityRegistry:
+    registry = CapabilityRegistry()
+    tools = []
+    for i in range(capability_count - len(REAL_CAPABILITIES)):
+        capability_name = f"{pseudo_word(rng)}_{pseudo_word(rng)}_{i}"
+        tools.append(MCPTool(id=f"tool_{i}", name=f"{pseudo_word(rng)} {pseudo_word(rng)}", capabilities=[capability_name]))
+        registry.add_keywords(capability_name, [pseudo_word(rng), pseudo_word(rng)])
+    for capability_name, (tool_name, keywords) in REAL_CAPABILITIES.items():
+        tools.append(MCPTool(id=f"{capability_name}_tool", name=tool_name, capabilities=[capability_name]))
+        registry.add_keywords(capability_name, keywords)
+    registry.register_many(tools)
+    return registry
+
+def build_matcher(registry: CapabilityRegistry) -> SemanticMatcher:
+    matcher = SemanticMatcher(registry)
+    matcher.build()
+    return matcher
+
+def quality(matcher: SemanticMatcher) -> float:
+    correct = 0
+    for query, expected in QUALITY_QUERIES:
+        matches = matcher.match(query)
+        if (matches[0][0] if matches else None) == expected:
+            correct += 1
+    return correct / len(QUALITY_QUERIES)
+
+def run(capability_counts: List[int]) -> List[Dict[str, Any]]:
+    rng = random.Random(42)
+    queries = [query for query, _ in QUALITY_QUERIES]
+    results = []
+    for capability_count in capability_counts:
+        params = {"capabilities": capability_count}
+        registry = make_registry(capability_count, rng)
+        matchers: List[SemanticMatcher] = []
+        build = bench_once(f"semantic_matcher.build[{capability_count}]", lambda: matchers.append(build_matcher(registry)), **params)
+        build["stats"]["per_capability_us"] = build["stats"]["seconds"] / capability_count * 1e6
+        matcher = matchers[0]
+        build["stats"]["accuracy"] = quality(matcher)
+        results.append(build)
+
+        query_cycle = itertools.cycle(queries)
+        results.append(bench(f"semantic_matcher.match[{capability_count}]", lambda: matcher.match(next(query_cycle)), **params))
+        batch = [queries[i % len(queries)] for i in range(BATCH_SIZE)]
+        batched = bench(f"semantic_matcher.match_many[{capability_count}]", lambda: matcher.match_many(batch), batch=BATCH_SIZE, **params)
+        batched["stats"]["per_query_us"] = batched["stats"]["median_us"] / BATCH_SIZE
+        results.append(batched)
+
+        # A new capability and an updated one: each appends one row
+        counter = itertools.count()
+        results.append(bench(
+            f"semantic_matcher.add_keywords[{capability_count}]",
+            lambda: registry.add_keywords(f"new_capability_{next(counter)}", [pseudo_word(rng)]),
+            **params
+        ))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="SemanticMatcher benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CAPABILITY_COUNTS)
+    parser.add_argument("--output", help="result file (default benchmarks/results/semantic_matcher.json)")
+    args = parser.parse_args()
+
+    configure_logging(level="ERROR")
+    results = run(args.sizes)
+    print_table(results, ["median_us", "per_query_us", "per_capability_us", "accuracy"])
+    print(f"Results written to {write_results('semantic_matcher', results, args.output)}")
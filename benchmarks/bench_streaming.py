@@ -0,0 +1,140 @@
+"""
+Streaming query results: how long a client waits for the first bytes and the
+first partial result from GET /query/stream (server-sent events), against the
+full latency of POST /query, when the tool behind the query produces its
+answer in --chunks pieces over --chunk-ms each. Also checks that a client
+disconnecting mid-stream stops the tool.
+
+Runs a real uvicorn server on a local port, so responses go through the same
+HTTP framing and flushing a deployment's would. Each query is unique, so the
+result cache never answers.
+
+Results are written to benchmarks/results/streaming.json.
+
+Run from the repository root:
+    python -m benchmarks.bench_streaming [--queries 20] [--chunks 10] [--chunk-ms 20]
+"""
+import argparse
+import asyncio
+import socket
+import time
+from typing import Any, Dict, List
+
+import httpx
+import uvicorn
+
+import main
+from benchmarks.harness import latency_stats, print_table, write_results
+from components.mcp_client import MCPTool
+
+class StreamingBackend:
+    """
+    Replaces the essential weather_api tool with one that yields its answer
+    in `chunks` pieces, `chunk_time` apart, and counts calls stopped early.
+    """
+
+    def __init__(self, chunks: int, chunk_time: float):
+        self.chunks = chunks
+        self.chunk_time = chunk_time
+        self.stopped = 0
+
+    async def handler(self, query: str, **_: Any):
+        sent = 0
+        try:
+            for sent in range(1, self.chunks + 1):
+                await asyncio.sleep(self.chunk_time)
+                yield f"part {sent} of the answer for {query}. "
+        finally:
+            if sent < self.chunks:
+                self.stopped += 1
+
+    def install(self):
+        main.capability_registry.register_capability_from_tool(
+            MCPTool(id="weather_api_tool", name="Streaming Weather Backend", capabilities=["weather_api"], handler=self.handler)
+        )
+
+async def time_post(client: httpx.AsyncClient, query: str) -> float:
+    start = time.perf_counter()
+    response = await client.post("/query", params={"query": query})
+    elapsed = time.perf_counter() - start
+    assert response.json()["response"]["status"] == "success", response.text
+    return elapsed
+
+async def time_stream(client: httpx.AsyncClient, query: str) -> Dict[str, float]:
+    """
+    Seconds until the first bytes, the first chunk event and the done event.
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    async with client.stream("GET", "/query/stream", params={"query": query}) as response:
+        async for line in response.aiter_lines():
+            timings.setdefault("ttfb", time.perf_counter() - start)
+            if line == "event: chunk":
+                timings.setdefault("first_chunk", time.perf_counter() - start)
+            elif line == "event: done":
+                timings["total"] = time.perf_counter() - start
+    return timings
+
+async def disconnect_mid_stream(client: httpx.AsyncClient, backend: StreamingBackend, query: str) -> Dict[str, Any]:
+    """
+    Reads the first chunk of a stream, then disconnects; reports whether the
+    tool was stopped and how long that took.
+    """
+    stopped = backend.stopped
+    async with client.stream("GET", "/query/stream", params={"query": query}) as response:
+        async for line in response.aiter_lines():
+            if line == "event: chunk":
+                break
+    start = time.perf_counter()
+    while backend.stopped == stopped and time.perf_counter() - start < backend.chunk_time * backend.chunks:
+        await asyncio.sleep(0.001)
+    return {"tool_stopped": backend.stopped > stopped, "stop_ms": (time.perf_counter() - start) * 1000}
+
+async def run(queries: int, chunks: int, chunk_time: float) -> List[Dict[str, Any]]:
+    main.REGISTRY_DATA_DIR = None
+    main.LOG_LEVEL = "ERROR"
+    main.LOCAL_TOOLS_DIRECTORY = None
+    # asyncio disables Nagle's algorithm only on sockets created with IPPROTO_TCP, as uvicorn's own are;
+    # with it, each event would wait for the client's delayed ACK of the previous one
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    listener.bind(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="error"))
+    serving = asyncio.ensure_future(server.serve(sockets=[listener]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+    backend = StreamingBackend(chunks, chunk_time)
+    backend.install()
+
+    params = {"queries": queries, "chunks": chunks, "chunk_ms": chunk_time * 1000}
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            posted = [await time_post(client, f"what is the weather in city {i}") for i in range(queries)]
+            streamed = [await time_stream(client, f"what is the weather in town {i}") for i in range(queries)]
+            cancellation = await disconnect_mid_stream(client, backend, "what is the weather in the last town")
+            cancellation["streams_cancelled_metric"] = 'streams_cancelled_total{transport="sse"}' in main.metrics.render_prometheus()
+    finally:
+        server.should_exit = True
+        await serving
+
+    results = [{"name": "streaming.post_query.total", "params": params, "stats": latency_stats(posted)}]
+    for name in ("ttfb", "first_chunk", "total"):
+        results.append({
+            "name": f"streaming.sse.{name}",
+            "params": params,
+            "stats": latency_stats([timings[name] for timings in streamed]),
+        })
+    results.append({"name": "streaming.sse.disconnect", "params": params, "stats": cancellation})
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Streaming query result benchmarks")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=10, help="pieces the tool produces its answer in")
+    parser.add_argument("--chunk-ms", type=float, default=20.0, help="time the tool takes per piece")
+    parser.add_argument("--output", help="result file (default benchmarks/results/streaming.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.queries, args.chunks, args.chunk_ms / 1000))
+    print_table(results, ["count", "p50_ms", "p99_ms", "tool_stopped", "stop_ms", "streams_cancelled_metric"])
+    print(f"Results written to {write_results('streaming', results, args.output)}")
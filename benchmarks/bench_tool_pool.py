@@ -0,0 +1,140 @@
+"""
+Local tool execution: cold (a new worker process per call) versus warm
+(pre-warmed ToolProcessPool) call latency, large arguments through shared
+memory versus the pipe, and how long CPU-heavy calls stall the event loop when
+run inline versus in the pool.
+
+Results are written to benchmarks/results/tool_pool.json.
+
+Run from the repository root:
+    python -m benchmarks.bench_tool_pool [--calls 200] [--payload-mb 4] [--output PATH]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.harness import latency_stats, print_table, write_results
+from components.structured_logger import configure_logging
+from components.tool_process_pool import TOOLS_DIRECTORY, ToolProcessPool
+
+COLD_CALLS = 10
+# A text large enough that analyzing it takes tens of milliseconds
+HEAVY_TEXT = "The quick brown fox jumps over the lazy dog. " * 20_000
+HEAVY_CALLS = 8
+PAYLOAD_TOOL = '''
+TOOL = {"capabilities": ["payload_length"]}
+
+def run(data="", **_):
+    return len(data)
+'''
+
+def make_tools_directory() -> str:
+    directory = tempfile.mkdtemp()
+    shutil.copy(os.path.join(TOOLS_DIRECTORY, "text_statistics.py"), directory)
+    with open(os.path.join(directory, "payload_length.py"), "w") as tool_file:
+        tool_file.write(PAYLOAD_TOOL)
+    return directory
+
+async def time_calls(call: Callable[[], Awaitable[Any]], count: int) -> List[float]:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+async def cold_call(directory: str) -> Any:
+    pool = ToolProcessPool(directory, workers=1, reload_interval=None)
+    await pool.start()
+    try:
+        return await pool.call("text_statistics", text="How many words are in this sentence?")
+    finally:
+        await pool.close()
+
+async def max_loop_lag(work: Callable[[], Awaitable[Any]]) -> float:
+    """
+    Runs `work` while a ticker sleeps 1 ms at a time; returns the longest the
+    ticker was kept waiting beyond that, in seconds.
+    """
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag = max(lag, time.perf_counter() - start - 0.001)
+
+    ticking = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0.01)
+    await work()
+    done = True
+    await ticking
+    return lag
+
+async def run(calls: int, payload_mb: float) -> List[Dict[str, Any]]:
+    directory = make_tools_directory()
+    results = []
+    try:
+        cold = await time_calls(lambda: cold_call(directory), COLD_CALLS)
+        results.append({"name": "tool_pool.cold_call", "params": {}, "stats": latency_stats(cold)})
+
+        pool = ToolProcessPool(directory, workers=1, reload_interval=None)
+        await pool.start()
+        warm = await time_calls(lambda: pool.call("text_statistics", text="How many words are in this sentence?"), calls)
+        results.append({"name": "tool_pool.warm_call", "params": {}, "stats": latency_stats(warm)})
+
+        payload = b"x" * int(payload_mb * 1024 * 1024)
+        params = {"payload_mb": payload_mb}
+        shared = await time_calls(lambda: pool.call("payload_length", data=payload), calls // 4)
+        results.append({"name": "tool_pool.payload.shared_memory", "params": params, "stats": latency_stats(shared)})
+        # No argument is large enough for shared memory: everything is pickled through the pipe
+        pool.shared_memory_threshold = len(payload) + 1
+        piped = await time_calls(lambda: pool.call("payload_length", data=payload), calls // 4)
+        results.append({"name": "tool_pool.payload.pipe", "params": params, "stats": latency_stats(piped)})
+        await pool.close()
+
+        # CPU-heavy calls: inline in the event loop versus in a pool of workers
+        from tools.text_statistics import run as text_statistics
+
+        async def inline():
+            for _ in range(HEAVY_CALLS):
+                text_statistics(text=HEAVY_TEXT)
+                await asyncio.sleep(0)
+
+        pool = ToolProcessPool(directory, workers=max(os.cpu_count() or 1, 2), reload_interval=None)
+        await pool.start()
+        params = {"calls": HEAVY_CALLS, "text_kb": len(HEAVY_TEXT) // 1024}
+        for name, work in (
+            ("inline", inline),
+            ("pool", lambda: asyncio.gather(*(pool.call("text_statistics", text=HEAVY_TEXT) for _ in range(HEAVY_CALLS)))),
+        ):
+            start = time.perf_counter()
+            lag = await max_loop_lag(work)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "name": f"tool_pool.heavy.{name}",
+                "params": params,
+                "stats": {"seconds": elapsed, "max_loop_lag_ms": lag * 1000},
+            })
+        await pool.close()
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local tool pool benchmarks")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--payload-mb", type=float, default=4.0)
+    parser.add_argument("--output", help="result file (default benchmarks/results/tool_pool.json)")
+    args = parser.parse_args()
+
+    configure_logging(level="ERROR")
+    results = asyncio.run(run(args.calls, args.payload_mb))
+    print_table(results, ["count", "p50_ms", "p99_ms", "seconds", "max_loop_lag_ms"])
+    print(f"Results written to {write_results('tool_pool', results, args.output)}")
@@ -0,0 +1,196 @@
+"""
+Shared helpers for the benchmark suite: timing in the style of pytest-benchmark
+(calibrated rounds, min/mean/median/stddev, ops per second), latency
+percentiles, and machine-readable result files that can be compared between
+versions to catch performance regressions.
+
+Result files are JSON documents of the form
+    {"suite": ..., "machine": {...}, "commit": ..., "created_at": ..., "results": [...]}
+where every result has a unique "name" and a "stats" dict of numbers.
+"""
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Stats where a larger value is better; every other stat is a duration or size
+HIGHER_IS_BETTER = {"ops", "throughput_qps"}
+# Counts and noisy spread stats are reported but not compared
+NOT_COMPARED = {"count", "rounds", "iterations", "stddev_us", "max_ms", "errors"}
+
+def percentile(ordered: List[float], quantile: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not ordered:
+        return float("nan")
+    rank = max(math.ceil(quantile * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def latency_stats(latencies: Iterable[float]) -> Dict[str, float]:
+    """
+    Summarizes latencies in seconds as milliseconds.
+    """
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000 if ordered else float("nan"),
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else float("nan"),
+    }
+
+def bench(
+    name: str,
+    fn: Callable[[], Any],
+    rounds: int = 5,
+    min_round_seconds: float = 0.05,
+    setup: Optional[Callable[[int], Any]] = None,
+    **params: Any,
+) -> Dict[str, Any]:
+    """
+    Times `fn` like pytest-benchmark's pedantic mode: the number of calls per
+    round is calibrated so a round takes at least `min_round_seconds`, then
+    `rounds` rounds are timed. Stats are per call. If `setup` is given it is
+    called with the round's call count before each round, outside the timing,
+    and its return value is passed to every call of `fn`.
+    """
+    def run_round(iterations: int) -> float:
+        argument = setup(iterations) if setup is not None else None
+        start = time.perf_counter()
+        if setup is not None:
+            for _ in range(iterations):
+                fn(argument)
+        else:
+            for _ in range(iterations):
+                fn()
+        return time.perf_counter() - start
+
+    iterations = 1
+    while True:
+        elapsed = run_round(iterations)
+        if elapsed >= min_round_seconds or iterations >= 1 << 20:
+            break
+        iterations *= max(2, min(10, int(min_round_seconds / max(elapsed, 1e-9)) + 1))
+
+    per_call = [run_round(iterations) / iterations for _ in range(rounds)]
+    mean = statistics.fmean(per_call)
+    return {
+        "name": name,
+        "params": params,
+        "stats": {
+            "rounds": rounds,
+            "iterations": iterations,
+            "min_us": min(per_call) * 1e6,
+            "mean_us": mean * 1e6,
+            "median_us": statistics.median(per_call) * 1e6,
+            "stddev_us": statistics.stdev(per_call) * 1e6 if rounds > 1 else 0.0,
+            "ops": 1 / mean if mean > 0 else float("inf"),
+        },
+    }
+
+def bench_once(name: str, fn: Callable[[], Any], **params: Any) -> Dict[str, Any]:
+    """
+    Times a single call, for operations too expensive to repeat (e.g. bulk loads).
+    """
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {"name": name, "params": params, "stats": {"seconds": elapsed}}
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def write_results(suite: str, results: List[Dict[str, Any]], path: Optional[str] = None) -> str:
+    """
+    Writes results to `path`, by default benchmarks/results/<suite>.json, and
+    returns the path written.
+    """
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{suite}.json")
+    document = {
+        "suite": suite,
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "machine": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(path, "w") as output:
+        json.dump(document, output, indent=2, sort_keys=True)
+    return path
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as source:
+        return json.load(source)
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """
+    Returns a description of every stat that got worse than the baseline by
+    more than `threshold` (a fraction), for results present in both documents.
+    """
+    baseline_by_name = {result["name"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in current.get("results", []):
+        previous = baseline_by_name.get(result["name"])
+        if previous is None:
+            continue
+        for stat, value in result["stats"].items():
+            old_value = previous["stats"].get(stat)
+            if stat in NOT_COMPARED or not isinstance(old_value, (int, float)) or not old_value:
+                continue
+            change = (value - old_value) / old_value
+            if stat in HIGHER_IS_BETTER:
+                change = -change
+            if change > threshold:
+                regressions.append(f"{result['name']} {stat}: {old_value:.4g} -> {value:.4g} ({change:+.0%} worse)")
+    return regressions
+
+def print_table(results: List[Dict[str, Any]], stats: List[str]):
+    name_width = max((len(result["name"]) for result in results), default=4)
+    print(f"{'name':<{name_width}} " + " ".join(f"{stat:>12}" for stat in stats))
+    for result in results:
+        values = [result["stats"].get(stat) for stat in stats]
+        print(f"{result['name']:<{name_width}} " + " ".join(
+            f"{value:>12.2f}" if isinstance(value, float) else f"{'' if value is None else value:>12}" for value in values
+        ))
+
+def main_compare(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point: `python -m benchmarks.harness BASELINE CURRENT [--threshold 0.1]`.
+    Exits non-zero if any stat regressed.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (default 0.10)")
+    args = parser.parse_args(argv)
+
+    regressions = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("No regressions beyond threshold")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main_compare())
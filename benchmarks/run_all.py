@@ -0,0 +1,48 @@
+"""
+Runs the registry and semantic matcher microbenchmarks and the /query load
+test, writes every result to one file, and optionally fails if anything
+regressed against a baseline run.
+
+Run from the repository root:
+    python -m benchmarks.run_all [--output PATH] [--baseline PATH] [--threshold 0.1] [--quick]
+
+Typical regression check between two versions:
+    git checkout v1 && python -m benchmarks.run_all --output baseline.json
+    git checkout v2 && python -m benchmarks.run_all --baseline baseline.json
+"""
+import argparse
+import asyncio
+import io
+import sys
+
+from benchmarks import bench_query_load, bench_registry, bench_semantic_matcher
+from benchmarks.harness import compare_results, load_results, print_table, write_results
+from components.structured_logger import configure_logging
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--output", help="result file (default benchmarks/results/all.json)")
+    parser.add_argument("--baseline", help="result file of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (default 0.10)")
+    parser.add_argument("--quick", action="store_true", help="skip the 100k-tool sizes and shorten the load test")
+    args = parser.parse_args()
+
+    configure_logging(level="ERROR", stream=io.StringIO())
+    sizes = bench_registry.TOOL_COUNTS[:2] if args.quick else bench_registry.TOOL_COUNTS
+    results = bench_registry.run(sizes)
+    results += bench_semantic_matcher.run(sizes)
+    results += asyncio.run(bench_query_load.run(
+        request_count=500 if args.quick else 2_000,
+        concurrency=32,
+        mix=bench_query_load.DEFAULT_MIX,
+        tool_latency=0.005
+    ))
+
+    print_table(results, ["median_us", "ops", "per_tool_us", "per_query_us", "throughput_qps", "p50_ms", "p99_ms"])
+    print(f"Results written to {write_results('all', results, args.output)}")
+
+    if args.baseline:
+        regressions = compare_results(load_results(args.baseline), {"results": results}, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
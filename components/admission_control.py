@@ -0,0 +1,245 @@
+import asyncio
+import math
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+class OverloadedError(Exception):
+    """
+    Raised when a call is shed instead of run: its wait queue was full, or it
+    waited longer than the queue timeout.
+    """
+
+    def __init__(self, key: str, reason: str):
+        super().__init__(f"'{key}' is overloaded ({reason})")
+        self.key = key
+        self.reason = reason
+
+class ConcurrencyLimit:
+    """
+    A semaphore with a bounded FIFO wait queue and a deadline on waiting.
+
+    Up to `limit` callers hold a slot at once. Up to `max_queue` more wait for
+    one, each for at most `queue_timeout` seconds; callers beyond that, and
+    callers still waiting at their deadline, get OverloadedError at once. A
+    released slot is handed straight to the oldest waiter.
+    """
+
+    def __init__(self, key: str, limit: int, max_queue: int, queue_timeout: float):
+        self.key = key
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            raise OverloadedError(self.key, "queue full")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        deadline = loop.call_later(self.queue_timeout, self._expire, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # The slot was handed over just as the caller was cancelled: pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            deadline.cancel()
+        self.admitted += 1
+
+    def _expire(self, waiter: asyncio.Future):
+        if waiter.done():
+            return
+        self._waiters.remove(waiter)
+        self.shed_timeout += 1
+        waiter.set_exception(OverloadedError(self.key, "queue timeout"))
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot changes hands, so in_flight stays the same
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
+
+class ConcurrencyLimits:
+    """
+    One ConcurrencyLimit per key (e.g. per tool ID or per capability), created
+    on first use. `overrides` sets a different limit for specific keys.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float, overrides: Optional[Dict[str, int]] = None):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.overrides = overrides or {}
+        self._limits: Dict[str, ConcurrencyLimit] = {}
+
+    def get(self, key: str) -> ConcurrencyLimit:
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = ConcurrencyLimit(key, self.overrides.get(key, self.limit), self.max_queue, self.queue_timeout)
+        return limit
+
+    def slot(self, key: str):
+        """
+        Holds one of the key's slots for the duration of an `async with` block.
+        Raises OverloadedError if the call is shed.
+        """
+        return self.get(key).slot()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {key: limit.stats() for key, limit in self._limits.items()}
+
+class AdaptiveConcurrencyLimit:
+    """
+    Admission control with an AIMD (additive increase, multiplicative
+    decrease) limit on requests in flight, as in TCP congestion control.
+
+    Requests over the limit are rejected at once: try_acquire() returns False,
+    and the caller should answer 429 with retry_after() as Retry-After.
+    Admitted requests report their latency to release(), or call abandon()
+    if the client left. While they finish
+    within `latency_target` the limit grows by about one per limit's worth of
+    requests, but only while the limit is in use, so idle periods do not
+    inflate it. A slower or failed request multiplies it by `backoff`, at most
+    once per `latency_target`, since one overload episode slows down every
+    request in flight together. Latency therefore stays near the target
+    instead of growing with the backlog.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 64,
+        min_limit: int = 4,
+        max_limit: int = 1_024,
+        latency_target: float = 1.0,
+        backoff: float = 0.9,
+        alpha: float = 0.1
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.alpha = alpha
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        self.admitted = 0
+        self.shed = 0
+        self.decreases = 0
+        self._last_decrease: Optional[float] = None
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.shed += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self, latency: float, ok: bool = True):
+        self.in_flight -= 1
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.alpha * (latency - self.latency_ewma)
+
+        if ok and latency <= self.latency_target:
+            if self.in_flight + 1 >= self.limit / 2:
+                self.limit = min(self.limit + 1.0 / self.limit, self.max_limit)
+            return
+        now = asyncio.get_running_loop().time()
+        if self._last_decrease is None or now - self._last_decrease >= self.latency_target:
+            self.limit = max(self.limit * self.backoff, self.min_limit)
+            self._last_decrease = now
+            self.decreases += 1
+
+    def abandon(self):
+        """
+        Frees a slot without feeding the limit back, for a request the client
+        abandoned: how long it ran says nothing about the server's load.
+        """
+        self.in_flight -= 1
+
+    def retry_after(self) -> int:
+        """
+        Seconds a rejected client should wait: about one request's latency,
+        by when slots will have turned over. Whole seconds, as HTTP requires.
+        """
+        return max(1, math.ceil(self.latency_ewma or 0.0))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "decreases": self.decreases,
+        }
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    async def main():
+        # A tool that handles 2 calls at once, with room for 4 more waiting up to 50 ms
+        limits = ConcurrencyLimits(limit=2, max_queue=4, queue_timeout=0.05)
+
+        async def call(i: int) -> str:
+            try:
+                async with limits.slot("slow_tool"):
+                    await asyncio.sleep(0.02)
+                return "ok"
+            except OverloadedError as e:
+                return e.reason
+
+        outcomes = await asyncio.gather(*(call(i) for i in range(10)))
+        print(f"Outcomes: {outcomes}")  # 2 run, 4 wait and run within their deadline, 4 are shed at once
+        print(f"Stats: {limits.stats()}")
+
+        # Requests slower than the target shrink the admission limit; fast ones grow it back
+        limiter = AdaptiveConcurrencyLimit(initial_limit=8, latency_target=0.01)
+        for latency in [0.005] * 20 + [0.05]:
+            if limiter.try_acquire():
+                limiter.release(latency)
+        print(f"Limit after a slow request: {limiter.stats()['limit']}")  # 7
+        print(f"Admitted while 7 in flight? {all(limiter.try_acquire() for _ in range(7))}, 8th? {limiter.try_acquire()}")  # True, False
+        print(f"Retry-After: {limiter.retry_after()}s")
+
+    asyncio.run(main())
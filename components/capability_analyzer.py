@@ -0,0 +1,198 @@
+import asyncio
+from itertools import islice
+from typing import Iterator, List, Dict, Iterable, Optional, Set, Tuple
+
+from components.capability_registry import CapabilityRegistry
+from components.semantic_matcher import SemanticMatcher
+
+# Capabilities indexed per slice of a build; an incremental build yields to the event loop between slices
+BUILD_SLICE = 500
+
+class CapabilityAnalyzer:
+    """
+    Maps free-text queries to required capabilities using a compiled keyword index
+    built from the keyword lists kept in the CapabilityRegistry.
+
+    Keywords are bucketed by length. A query is analyzed by collecting its
+    substrings of each bucket length and intersecting them with that bucket, so
+    the cost depends on the query length and the number of distinct keyword
+    lengths, not on how many capabilities or keywords are registered. Keywords
+    match as case-insensitive substrings, the same semantics as the old
+    `keyword in query.lower()` checks.
+
+    Unlike an Aho-Corasick automaton, the index needs no failure-link rebuild, so
+    keywords added by the registry take effect immediately in O(1) each.
+
+    Queries containing no keyword at all are handed to an optional `fallback`
+    SemanticMatcher, which matches them by similarity instead. While the
+    matcher is built incrementally, such queries match nothing.
+
+    The index is built on the first analysis, or earlier by awaiting
+    build_index_async(), which builds it in slices on the event loop so
+    creating an analyzer costs nothing at startup and requests keep being
+    served during the build. Like the registry, the analyzer is used from
+    the event loop's thread only.
+    """
+
+    def __init__(self, registry: CapabilityRegistry, fallback: Optional[SemanticMatcher] = None):
+        self.fallback = fallback
+        self._registry = registry
+        self._built = False
+        # The build in progress, as a generator of slices shared by every caller driving it
+        self._build: Optional[Iterator[None]] = None
+        # Keywords registered during the build, applied after it
+        self._pending: List[Tuple[str, List[str]]] = []
+        # keyword -> indices of the capabilities it maps to
+        self._keyword_capabilities: Dict[str, List[int]] = {}
+        # keyword length -> keywords of that length
+        self._buckets: Dict[int, Set[str]] = {}
+        # Capability names in first-seen order; the order results are reported in
+        self._capability_names: List[str] = []
+        self._capability_index: Dict[str, int] = {}
+
+        registry.add_keyword_listener(self.add_keywords)
+
+    @property
+    def keyword_count(self) -> int:
+        self.build_index()
+        return len(self._keyword_capabilities)
+
+    def build_index(self):
+        """
+        Builds the keyword index from the registry's keyword lists, or
+        finishes a build in progress, unless it is built already.
+        """
+        if self._built:
+            return
+        for _ in self._build_slices():
+            pass
+
+    async def build_index_async(self):
+        """
+        Like build_index(), but yields to the event loop after each slice of
+        BUILD_SLICE capabilities. Callers awaiting it concurrently drive the
+        same build; once it is done, this returns at once.
+        """
+        if self._built:
+            return
+        for _ in self._build_slices():
+            await asyncio.sleep(0)
+
+    def _build_slices(self) -> Iterator[None]:
+        if self._build is None:
+            self._build = self._build_in_slices()
+        return self._build
+
+    def _build_in_slices(self) -> Iterator[None]:
+        try:
+            # Safe to read across slices; keywords added meanwhile arrive through add_keywords
+            keyword_lists = self._registry.keyword_lists()
+            while True:
+                keyword_slice = list(islice(keyword_lists, BUILD_SLICE))
+                if not keyword_slice:
+                    break
+                for capability_name, keywords in keyword_slice:
+                    self._add_keywords(capability_name, keywords)
+                yield
+        except BaseException:
+            # The next caller starts over; re-adding keywords is harmless
+            self._build = None
+            raise
+        for capability_name, keywords in self._pending:
+            self._add_keywords(capability_name, keywords)
+        self._pending = []
+        self._built = True
+
+    def add_keywords(self, capability_name: str, keywords: Iterable[str]):
+        """
+        Adds keywords for a capability to the index. Called by the registry
+        whenever keywords are registered, so the index stays current.
+        """
+        if self._built:
+            self._add_keywords(capability_name, keywords)
+        elif self._build is not None:
+            # The build may have read this capability's list already
+            self._pending.append((capability_name, list(keywords)))
+        # Before a build starts, the registry's lists already hold them
+
+    def _add_keywords(self, capability_name: str, keywords: Iterable[str]):
+        cap_idx = self._capability_index.get(capability_name)
+        if cap_idx is None:
+            cap_idx = len(self._capability_names)
+            self._capability_names.append(capability_name)
+            self._capability_index[capability_name] = cap_idx
+
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            capability_indices = self._keyword_capabilities.get(keyword)
+            if capability_indices is None:
+                self._keyword_capabilities[keyword] = [cap_idx]
+                self._buckets.setdefault(len(keyword), set()).add(keyword)
+            elif cap_idx not in capability_indices:
+                capability_indices.append(cap_idx)
+
+    def _match(self, text: str) -> List[int]:
+        text_length = len(text)
+        matched = set()
+        for length, bucket in self._buckets.items():
+            if length > text_length:
+                continue
+            substring_count = text_length - length + 1
+            if len(bucket) <= substring_count:
+                # Few keywords of this length: a direct substring search is cheaper
+                hits = [keyword for keyword in bucket if keyword in text]
+            else:
+                hits = bucket.intersection({text[i:i + length] for i in range(substring_count)})
+            for keyword in hits:
+                matched.update(self._keyword_capabilities[keyword])
+        return sorted(matched)
+
+    def analyze(self, query: str) -> List[str]:
+        """
+        Returns every capability whose keywords occur in the query, in capability
+        registration order. Without a keyword match, returns the fallback's
+        best matches, best first. Returns an empty list if nothing matches.
+        """
+        self.build_index()
+        names = self._capability_names
+        matched = [names[idx] for idx in self._match(query.lower())]
+        if not matched and self.fallback is not None:
+            return [capability_name for capability_name, _ in self.fallback.match(query)]
+        return matched
+
+    def analyze_many(self, queries: Iterable[str]) -> List[List[str]]:
+        """
+        Analyzes a batch of queries against the same index. Queries without a
+        keyword match go to the fallback as one batch.
+        """
+        queries = list(queries)
+        self.build_index()
+        names = self._capability_names
+        results = [[names[idx] for idx in self._match(query.lower())] for query in queries]
+        if self.fallback is not None:
+            unmatched = [position for position, matched in enumerate(results) if not matched]
+            if unmatched:
+                fallback_matches = self.fallback.match_many([queries[position] for position in unmatched])
+                for position, matches in zip(unmatched, fallback_matches):
+                    results[position] = [capability_name for capability_name, _ in matches]
+        return results
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    registry = CapabilityRegistry()
+    registry.add_keywords("news_api", ["news", "headlines"])
+    registry.add_keywords("weather_api", ["weather", "forecast"])
+    registry.add_keywords("web_search", ["search", "find"])
+
+    analyzer = CapabilityAnalyzer(registry, fallback=SemanticMatcher(registry))
+    print(analyzer.analyze("Find today's news headlines"))  # ['news_api', 'web_search']
+    print(analyzer.analyze("What's the forecast?"))  # ['weather_api']
+    print(analyzer.analyze("Hello there"))  # []
+    # No keyword, but close to the forecast keyword: matched by the fallback
+    print(analyzer.analyze("weekend forecasts for paris"))  # ['weather_api']
+
+    # Keywords added later through the registry are picked up on the next query
+    registry.add_keywords("text_summarization", ["summarize", "tl;dr"])
+    print(analyzer.analyze_many(["summarize the news", "tl;dr please"]))
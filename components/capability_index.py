@@ -0,0 +1,522 @@
+import threading
+from typing import TYPE_CHECKING, Any, Collection, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+if TYPE_CHECKING:
+    from components.mcp_client import MCPTool
+    from components.registry_store import RegistrySegment
+
+_NO_TOOLS: Tuple[str, ...] = ()
+# A capability's tool IDs in registration order: a tuple while there are few,
+# a dict used as an ordered set beyond that
+ToolIds = Union[Tuple[str, ...], Dict[str, None]]
+# Up to this many tool IDs are kept in a tuple: 72 bytes for four IDs against
+# over 200 for a dict. Larger sets switch to a dict so adding a tool stays O(1)
+SMALL_TOOL_SET = 8
+# Marks a key the overlay does not mention, so the base segment decides
+_ABSENT = object()
+
+class _ShardedDict(Mapping):
+    """
+    A dict split into shards by key hash, copied on write shard by shard.
+
+    copy() shares every shard with the original and copies only the list of
+    shards; the first write to a shard afterwards duplicates that shard
+    alone. The shard count doubles whenever the entries outnumber its square,
+    so the list and each shard hold about sqrt(n) items, and a write after a
+    copy costs O(sqrt(n)) rather than the O(n) of copying a whole dict. The
+    doubling rehashes everything, but only each time n quadruples. Iteration
+    follows the shards, not insertion order.
+
+    Point lookups on the index's hot paths read `_shards[hash(key) & _mask]`
+    directly rather than calling get(), which would add a Python call.
+    """
+
+    __slots__ = ("_shards", "_mask", "_owned", "_size")
+
+    def __init__(self):
+        self._shards: List[Dict[str, Any]] = [{}]
+        self._mask = 0
+        # Per shard, whether this map may mutate it in place: it is not shared with a copy
+        self._owned = bytearray(b"\x01")
+        self._size = 0
+
+    def copy(self) -> "_ShardedDict":
+        clone = _ShardedDict.__new__(_ShardedDict)
+        clone._shards = list(self._shards)
+        clone._mask = self._mask
+        clone._owned = bytearray(len(self._shards))
+        clone._size = self._size
+        # Shared from now on, so neither map mutates them in place
+        self._owned = bytearray(len(self._shards))
+        return clone
+
+    def __getitem__(self, key: str) -> Any:
+        return self._shards[hash(key) & self._mask][key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._shards[hash(key) & self._mask].get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._shards[hash(key) & self._mask]
+
+    def __iter__(self) -> Iterator[str]:
+        for shard in self._shards:
+            yield from shard
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _writable_shard(self, key: str) -> Dict[str, Any]:
+        position = hash(key) & self._mask
+        shard = self._shards[position]
+        if not self._owned[position]:
+            shard = self._shards[position] = dict(shard)
+            self._owned[position] = 1
+        return shard
+
+    def __setitem__(self, key: str, value: Any):
+        # _writable_shard() inlined: this is the registration hot path
+        position = hash(key) & self._mask
+        shard = self._shards[position]
+        if not self._owned[position]:
+            shard = self._shards[position] = dict(shard)
+            self._owned[position] = 1
+        if key in shard:
+            shard[key] = value
+            return
+        shard[key] = value
+        self._size += 1
+        if self._size > len(self._shards) ** 2:
+            self._grow()
+
+    def __delitem__(self, key: str):
+        del self._writable_shard(key)[key]
+        self._size -= 1
+
+    def pop(self, key: str, default: Any = _ABSENT) -> Any:
+        if key not in self:
+            if default is _ABSENT:
+                raise KeyError(key)
+            return default
+        value = self._writable_shard(key).pop(key)
+        self._size -= 1
+        return value
+
+    def _grow(self):
+        count = len(self._shards) * 2
+        mask = count - 1
+        shards: List[Dict[str, Any]] = [{} for _ in range(count)]
+        for shard in self._shards:
+            for key, value in shard.items():
+                shards[hash(key) & mask][key] = value
+        self._shards = shards
+        self._mask = mask
+        self._owned = bytearray(b"\x01") * count
+
+class _MergedCapabilities(Mapping):
+    """
+    Read-only capability -> tool IDs view over the overlay and an optional
+    base segment. With a segment, iteration and len() scan it, so they are
+    meant for inspection.
+    """
+
+    def __init__(self, forward: _ShardedDict, base: Optional["RegistrySegment"]):
+        self._forward = forward
+        self._base = base
+
+    def __getitem__(self, capability_name: str) -> ToolIds:
+        tool_ids = self._forward.get(capability_name)
+        if tool_ids is None and self._base is not None:
+            tool_ids = self._base.tools_for_capability(capability_name)
+        if not tool_ids:
+            raise KeyError(capability_name)
+        return tool_ids
+
+    def __iter__(self) -> Iterator[str]:
+        for capability_name, tool_ids in self._forward.items():
+            if tool_ids:
+                yield capability_name
+        if self._base is not None:
+            for capability_name in self._base.capability_names():
+                if capability_name not in self._forward:
+                    yield capability_name
+
+    def __len__(self) -> int:
+        if self._base is None:
+            # Without a segment to hide capabilities of, emptied entries are dropped
+            return len(self._forward)
+        return sum(1 for _ in self)
+
+class _MergedTools(Mapping):
+    """
+    Read-only tool ID -> MCPTool view over the overlay and an optional base
+    segment. Base tools are materialized on access.
+    """
+
+    def __init__(self, reverse: _ShardedDict, tools: _ShardedDict, base: Optional["RegistrySegment"]):
+        self._reverse = reverse
+        self._tools = tools
+        self._base = base
+
+    def __getitem__(self, tool_id: str) -> "MCPTool":
+        tool = self._tools.get(tool_id)
+        if tool is None and self._base is not None and tool_id not in self._reverse:
+            tool = self._base.tool(tool_id)
+        if tool is None:
+            raise KeyError(tool_id)
+        return tool
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._tools
+        if self._base is not None:
+            for tool_id in self._base.tool_ids():
+                if tool_id not in self._reverse:
+                    yield tool_id
+
+    def __len__(self) -> int:
+        if self._base is None:
+            return len(self._tools)
+        return sum(1 for _ in self)
+
+class IndexSnapshot:
+    """
+    An immutable, versioned view of the capability index.
+
+    Request handlers take a snapshot once and read from it without locks; writers
+    never mutate structures that a published snapshot references.
+    """
+
+    __slots__ = ("version", "_forward", "_reverse", "_tools", "_base")
+
+    def __init__(
+        self,
+        version: int,
+        forward: _ShardedDict,
+        reverse: _ShardedDict,
+        tools: _ShardedDict,
+        base: Optional["RegistrySegment"] = None
+    ):
+        self.version = version
+        self._forward = forward
+        self._reverse = reverse
+        self._tools = tools
+        self._base = base
+
+    def can_handle(self, capability_name: str) -> bool:
+        tool_ids = self._forward._shards[hash(capability_name) & self._forward._mask].get(capability_name)
+        if tool_ids is None:
+            return self._base is not None and self._base.has_capability(capability_name)
+        return len(tool_ids) > 0
+
+    def get_tools_for_capability(self, capability_name: str) -> Collection[str]:
+        """
+        Returns the tool IDs for a capability, in registration order, as a
+        read-only view. O(1): no copy is made.
+        """
+        tool_ids = self._forward._shards[hash(capability_name) & self._forward._mask].get(capability_name)
+        if tool_ids is None and self._base is not None:
+            tool_ids = self._base.tools_for_capability(capability_name)
+        if tool_ids is None:
+            return _NO_TOOLS
+        return tool_ids.keys() if isinstance(tool_ids, dict) else tool_ids
+
+    def first_missing(self, capability_names: Iterable[str]) -> Optional[str]:
+        """
+        Returns the first capability no tool handles, or None if all are
+        handled. Equivalent to calling can_handle() on each name, with the
+        lookups inlined.
+        """
+        # The forward map's shard lookup inlined, as this runs for every capability of every query
+        shards = self._forward._shards
+        mask = self._forward._mask
+        base = self._base
+        for capability_name in capability_names:
+            tool_ids = shards[hash(capability_name) & mask].get(capability_name)
+            if tool_ids is None:
+                if base is None or not base.has_capability(capability_name):
+                    return capability_name
+            elif not tool_ids:
+                return capability_name
+        return None
+
+    def get_capabilities_for_tool(self, tool_id: str) -> Tuple[str, ...]:
+        capabilities = self._reverse._shards[hash(tool_id) & self._reverse._mask].get(tool_id, _ABSENT)
+        if capabilities is _ABSENT:
+            return self._base.capabilities_for_tool(tool_id) if self._base is not None else _NO_TOOLS
+        return capabilities or _NO_TOOLS
+
+    def get_tool(self, tool_id: str) -> Optional["MCPTool"]:
+        tool = self._tools._shards[hash(tool_id) & self._tools._mask].get(tool_id)
+        if tool is None and self._base is not None and tool_id not in self._reverse:
+            return self._base.tool(tool_id)
+        return tool
+
+    def tool_names(self) -> Iterator[Tuple[str, Collection[str]]]:
+        """
+        Yields the name and capabilities of every tool. The base segment's
+        tools are read from their records, not materialized.
+        """
+        for tool in self._tools.values():
+            yield tool.name, tool.capabilities
+        if self._base is not None:
+            reverse = self._reverse
+            for record in self._base.tool_records():
+                if record["id"] not in reverse:
+                    yield record["name"], record["capabilities"]
+
+    @property
+    def capabilities(self) -> Mapping[str, ToolIds]:
+        return _MergedCapabilities(self._forward, self._base)
+
+    @property
+    def tools(self) -> Mapping[str, "MCPTool"]:
+        return _MergedTools(self._reverse, self._tools, self._base)
+
+class CapabilityIndex:
+    """
+    The single source of truth for the capability <-> tool mapping, shared by
+    MCPClient and CapabilityRegistry.
+
+    The forward map (capability -> ordered tool IDs) and the reverse map
+    (tool ID -> capabilities) are dict-based, so registration, deregistration and
+    lookups cost O(k) in the number of capabilities of the tool involved.
+
+    Both are kept compact for catalogues of 100k tools and more: most
+    capabilities have a handful of tools, whose IDs are kept in a tuple until
+    there are more than SMALL_TOOL_SET, and the reverse map stores each tool's
+    own capability tuple. Capability names are interned by MCPTool, so every
+    occurrence shares one string.
+
+    Writes are copy-on-write: structures referenced by a published snapshot are
+    copied on the first write after publication, and mutated in place after
+    that, so readers always see a consistent version. The maps are
+    _ShardedDicts, copied shard by shard, and a capability's tool-ID dict is
+    copied only when that capability is written: a write after a snapshot
+    copies O(sqrt(n)) entries plus the tool-ID sets it touches, not the maps.
+
+    An optional `base` segment (a memory-mapped registry snapshot, see
+    RegistryStore) holds the tools persisted by a previous run. It is never
+    modified: the maps above act as an overlay, with empty tool-ID collections
+    and None capabilities marking capabilities and tools removed from the base.
+    Loading a large registry therefore costs nothing until entries are used.
+    """
+
+    def __init__(self, base: Optional["RegistrySegment"] = None):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._base = base
+        # capability -> ToolIds, tool ID -> capabilities (None if removed from the base), tool ID -> MCPTool
+        self._forward = _ShardedDict()
+        self._reverse = _ShardedDict()
+        self._tools = _ShardedDict()
+        # True while the outer maps are referenced by the published snapshot
+        self._shared = False
+        # Capabilities whose tool-ID dict was created after the last publication; tuples are never modified
+        self._owned_capabilities: Set[str] = set()
+        self._snapshot: Optional[IndexSnapshot] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def snapshot(self) -> IndexSnapshot:
+        """
+        Returns the current immutable view, publishing a new one if the index
+        changed since the last call.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = IndexSnapshot(self._version, self._forward, self._reverse, self._tools, self._base)
+                self._shared = True
+                self._owned_capabilities.clear()
+            return self._snapshot
+
+    def get_tool(self, tool_id: str) -> Optional["MCPTool"]:
+        """
+        Returns the latest registered tool with this ID. Unlike snapshot(), this
+        does not publish a version, so writers can check before writing without
+        forcing a copy of the maps.
+        """
+        tool = self._tools._shards[hash(tool_id) & self._tools._mask].get(tool_id)
+        if tool is None and self._base is not None and tool_id not in self._reverse:
+            return self._base.tool(tool_id)
+        return tool
+
+    def can_handle(self, capability_name: str) -> bool:
+        """
+        Checks the latest state without publishing a snapshot, so point lookups
+        between writes do not force the next write to copy the maps.
+        """
+        return bool(self._current_tool_ids(capability_name))
+
+    def first_missing(self, capability_names: Iterable[str]) -> Optional[str]:
+        """
+        Returns the first capability no tool handles in the latest state, or
+        None if all are handled. Like can_handle(), publishes no snapshot.
+        """
+        for capability_name in capability_names:
+            if not self._current_tool_ids(capability_name):
+                return capability_name
+        return None
+
+    def get_capabilities_for_tool(self, tool_id: str) -> Tuple[str, ...]:
+        """
+        Returns the latest capabilities of a tool, without publishing a
+        snapshot. The tuple is never modified.
+        """
+        return self._current_capabilities(tool_id)
+
+    def register_tool(self, tool: "MCPTool") -> bool:
+        """
+        Registers a tool, replacing any previous registration with the same ID.
+        Capabilities the tool no longer provides are removed. Returns False if
+        the registration was already up to date.
+        """
+        with self._lock:
+            changed = self._register(tool)
+            if changed:
+                self._publish_pending()
+            return changed
+
+    def register_many(self, tools: Iterable["MCPTool"]) -> List["MCPTool"]:
+        """
+        Registers several tools as one atomic update: readers see either none or
+        all of them. Returns the tools that changed.
+        """
+        with self._lock:
+            changed = [tool for tool in tools if self._register(tool)]
+            if changed:
+                self._publish_pending()
+            return changed
+
+    def deregister_tool(self, tool_id: str) -> Optional["MCPTool"]:
+        """
+        Removes a tool and all its capability mappings in O(k). Returns the
+        removed tool, or None if it was not registered.
+        """
+        with self._lock:
+            capabilities = self._reverse.get(tool_id, _ABSENT)
+            in_base = self._base is not None and self._base.has_tool(tool_id)
+            if capabilities is None or (capabilities is _ABSENT and not in_base):
+                return None
+            tool = self.get_tool(tool_id)
+            if capabilities is _ABSENT:
+                capabilities = self._base.capabilities_for_tool(tool_id)
+            self._prepare_write()
+            for capability_name in capabilities:
+                self._remove_edge(capability_name, tool_id)
+            self._tools.pop(tool_id, None)
+            if in_base:
+                self._reverse[tool_id] = None
+            else:
+                del self._reverse[tool_id]
+            self._publish_pending()
+            return tool
+
+    def _current_capabilities(self, tool_id: str) -> Tuple[str, ...]:
+        capabilities = self._reverse._shards[hash(tool_id) & self._reverse._mask].get(tool_id, _ABSENT)
+        if capabilities is _ABSENT:
+            return self._base.capabilities_for_tool(tool_id) if self._base is not None else _NO_TOOLS
+        return capabilities or _NO_TOOLS
+
+    def _register(self, tool: "MCPTool") -> bool:
+        tool_id = tool.id
+        new_capabilities = tool.capabilities
+        if type(new_capabilities) is not tuple:
+            new_capabilities = tuple(dict.fromkeys(new_capabilities))
+        old_capabilities = self._current_capabilities(tool_id)
+        if self._tools.get(tool_id) is tool and old_capabilities == new_capabilities:
+            return False
+
+        self._prepare_write()
+        if old_capabilities:
+            kept = set(new_capabilities)
+            for capability_name in old_capabilities:
+                if capability_name not in kept:
+                    self._remove_edge(capability_name, tool_id)
+        for capability_name in new_capabilities:
+            self._add_edge(capability_name, tool_id)
+        self._reverse[tool_id] = new_capabilities
+        self._tools[tool_id] = tool
+        return True
+
+    def _prepare_write(self):
+        if self._shared:
+            self._forward = self._forward.copy()
+            self._reverse = self._reverse.copy()
+            self._tools = self._tools.copy()
+            self._shared = False
+
+    def _publish_pending(self):
+        # The next snapshot() call publishes the new version
+        self._version += 1
+        self._snapshot = None
+
+    def _current_tool_ids(self, capability_name: str) -> Optional[ToolIds]:
+        # The shard lookup inlined: every lookup and write of the latest state comes through here
+        forward = self._forward
+        tool_ids = forward._shards[hash(capability_name) & forward._mask].get(capability_name)
+        if tool_ids is None and self._base is not None:
+            return self._base.tools_for_capability(capability_name)
+        return tool_ids
+
+    def _writable_tool_ids(self, capability_name: str, tool_ids: Dict[str, None]) -> Dict[str, None]:
+        if capability_name not in self._owned_capabilities:
+            tool_ids = dict(tool_ids)
+            self._forward[capability_name] = tool_ids
+            self._owned_capabilities.add(capability_name)
+        return tool_ids
+
+    def _add_edge(self, capability_name: str, tool_id: str):
+        tool_ids = self._current_tool_ids(capability_name)
+        if tool_ids is None:
+            self._forward[capability_name] = (tool_id,)
+        elif tool_id in tool_ids:
+            return
+        elif isinstance(tool_ids, dict):
+            self._writable_tool_ids(capability_name, tool_ids)[tool_id] = None
+        elif len(tool_ids) < SMALL_TOOL_SET:
+            self._forward[capability_name] = tool_ids + (tool_id,)
+        else:
+            grown = dict.fromkeys(tool_ids)
+            grown[tool_id] = None
+            self._forward[capability_name] = grown
+            self._owned_capabilities.add(capability_name)
+
+    def _remove_edge(self, capability_name: str, tool_id: str):
+        tool_ids = self._current_tool_ids(capability_name)
+        if tool_ids is None or tool_id not in tool_ids:
+            return
+        if len(tool_ids) == 1 and (self._base is None or not self._base.has_capability(capability_name)):
+            # Drop empty entries so can_handle stays a single dict lookup
+            del self._forward[capability_name]
+            self._owned_capabilities.discard(capability_name)
+        # Otherwise an emptied dict or tuple stays, hiding a capability of the base segment
+        elif isinstance(tool_ids, dict):
+            del self._writable_tool_ids(capability_name, tool_ids)[tool_id]
+        else:
+            self._forward[capability_name] = tuple(other for other in tool_ids if other != tool_id)
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    from components.mcp_client import MCPTool
+
+    index = CapabilityIndex()
+    index.register_tool(MCPTool(id="tool_1", name="Search Tool", capabilities=["web_search", "image_search"]))
+    index.register_tool(MCPTool(id="tool_2", name="Other Search Tool", capabilities=["web_search"]))
+
+    before = index.snapshot()
+    print(f"v{before.version}: web_search -> {list(before.get_tools_for_capability('web_search'))}")
+
+    # Re-registering drops capabilities the tool no longer provides
+    index.register_tool(MCPTool(id="tool_1", name="Search Tool", capabilities=["web_search"]))
+    index.deregister_tool("tool_2")
+    after = index.snapshot()
+
+    # The earlier snapshot is unaffected by the writes
+    print(f"v{before.version}: image_search handled? {before.can_handle('image_search')}")  # True
+    print(f"v{after.version}: image_search handled? {after.can_handle('image_search')}")  # False
+    print(f"v{after.version}: web_search -> {list(after.get_tools_for_capability('web_search'))}")  # ['tool_1']
@@ -1,73 +1,222 @@
-from typing import List, Dict, Optional, Set
+from typing import Any, Callable, Collection, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
+from components.capability_index import CapabilityIndex, IndexSnapshot
 from components.mcp_client import MCPTool # Assuming MCPTool is in this path
+from components.registry_store import RegistryStore, StoredKeywords, tool_from_record, tool_record
+from components.structured_logger import get_logger
+
+logger = get_logger("capability_registry")
 
 class CapabilityRegistry:
-    def __init__(self):
-        # Stores details about each capability, like associated tool IDs and keywords
-        self.capabilities: Dict[str, Dict[str, List[Any]]] = {}
-        # Maps tool IDs to the set of capabilities they provide
-        self.tool_mappings: Dict[str, Set[str]] = {}
+    def __init__(self, index: Optional[CapabilityIndex] = None, store: Optional[RegistryStore] = None):
+        # Capability <-> tool mappings live in a CapabilityIndex, which may be shared with an MCPClient
+        self.index = index if index is not None else CapabilityIndex()
+        # Persists registrations and keywords across restarts; pass the index returned by store.load()
+        self.store = store
+        # Maps capability names to the query keywords that indicate them; persisted lists are read on first access
+        self.keywords: Union[Dict[str, List[str]], StoredKeywords] = store.keywords if store is not None else {}
+        # Callbacks notified with (capability_name, new_keywords) when keywords are added
+        self._keyword_listeners: List[Callable[[str, List[str]], None]] = []
+        # Callbacks notified with each tool whose registration changed
+        self._tool_listeners: List[Callable[[MCPTool], None]] = []
+        # Callbacks notified with each removed tool, and the previous version of a changed one
+        self._tool_removal_listeners: List[Callable[[MCPTool], None]] = []
+        if store is not None:
+            # Changes other processes persist to the same store are applied here too
+            store.add_listener(self._apply_store_change)
+
+    @property
+    def capabilities(self) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        Details about each capability, like associated tool IDs and keywords.
+        Built on demand for inspection; use the lookup methods on hot paths.
+        """
+        snapshot = self.index.snapshot()
+        details = {
+            capability_name: {"tool_ids": list(tool_ids), "keywords": list(self.keywords.get(capability_name, []))}
+            for capability_name, tool_ids in snapshot.capabilities.items()
+        }
+        for capability_name, keywords in self.keywords.items():
+            if capability_name not in details:
+                details[capability_name] = {"tool_ids": [], "keywords": list(keywords)}
+        return details
+
+    @property
+    def tool_mappings(self) -> Dict[str, Set[str]]:
+        """
+        Maps tool IDs to the set of capabilities they provide. Built on demand for inspection.
+        """
+        snapshot = self.index.snapshot()
+        return {tool_id: set(snapshot.get_capabilities_for_tool(tool_id)) for tool_id in snapshot.tools}
+
+    def snapshot(self) -> IndexSnapshot:
+        """
+        Returns an immutable view of the current capability mappings, for callers
+        that need several consistent lookups.
+        """
+        return self.index.snapshot()
 
     def register_capability_from_tool(self, tool: MCPTool):
         """
-        Registers capabilities provided by a tool.
+        Registers capabilities provided by a tool. Re-registering a tool replaces
+        its previous capabilities, so dropped capabilities no longer list it.
         """
         if not hasattr(tool, 'id') or not hasattr(tool, 'capabilities'):
-            print(f"Error: Tool object is missing 'id' or 'capabilities' attributes.")
+            logger.error("invalid_tool", reason="missing 'id' or 'capabilities' attributes")
             return
 
-        tool_id = tool.id
+        previous_tool = self.index.get_tool(tool.id)
+        if self.index.register_tool(tool):
+            if self.store is not None:
+                self.store.record_tool(tool)
+            self._notify_tool_listeners(tool, previous_tool)
+        self._register_tool_keywords(tool)
+
+    def register_many(self, tools: Iterable[MCPTool]) -> int:
+        """
+        Registers several tools as one atomic update of the capability index.
+        Returns the number of tools that changed.
+        """
+        tools = list(tools)
+        previous_tools = {tool.id: self.index.get_tool(tool.id) for tool in tools}
+        changed = self.index.register_many(tools)
+        for tool in changed:
+            if self.store is not None:
+                # The store skips tools whose persisted record is unchanged
+                self.store.record_tool(tool)
+            self._notify_tool_listeners(tool, previous_tools[tool.id])
+        for tool in tools:
+            self._register_tool_keywords(tool)
+        return len(changed)
+
+    def deregister_tool(self, tool_id: str) -> Optional[MCPTool]:
+        """
+        Removes a tool and all its capability mappings. Keywords are kept, so the
+        capability can still be recognised in queries and rediscovered.
+        """
+        removed_tool = self.index.deregister_tool(tool_id)
+        if removed_tool is not None:
+            if self.store is not None:
+                self.store.record_removal(tool_id)
+            self._notify_tool_removal_listeners(removed_tool)
+        return removed_tool
+
+    def _register_tool_keywords(self, tool: MCPTool):
+        # Keywords declared by the tool apply to each capability it provides
+        if getattr(tool, 'keywords', None):
+            for capability_name in tool.capabilities:
+                self.add_keywords(capability_name, tool.keywords)
+
+    def _apply_store_change(self, entry: Dict[str, Any]):
+        # A change recorded by another process: apply it without persisting it again
+        if entry["op"] == "tool":
+            current_tool = self.index.get_tool(entry["tool"]["id"])
+            # Keep a local tool with the same record, it may carry a handler
+            if current_tool is None or tool_record(current_tool) != entry["tool"]:
+                tool = tool_from_record(entry["tool"])
+                self.index.register_tool(tool)
+                self._notify_tool_listeners(tool, current_tool)
+            for capability_name in entry["tool"]["capabilities"]:
+                self._add_keywords(capability_name, entry["tool"]["keywords"], persist=False)
+        elif entry["op"] == "remove":
+            removed_tool = self.index.deregister_tool(entry["id"])
+            if removed_tool is not None:
+                self._notify_tool_removal_listeners(removed_tool)
+        elif entry["op"] == "keywords":
+            self._add_keywords(entry["capability"], entry["keywords"], persist=False)
+
+    def keyword_lists(self) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Yields (capability_name, keywords) for every capability with keywords.
+        Unlike keywords.items(), it may be consumed across awaits while
+        keywords are added; capabilities added meanwhile may be skipped, so
+        consumers pick them up from the keyword listeners. Persisted lists are
+        parsed as they are reached.
+        """
+        if isinstance(self.keywords, StoredKeywords):
+            return self.keywords.items()
+        return iter(list(self.keywords.items()))
+
+    def add_keywords(self, capability_name: str, keywords: Iterable[str]):
+        """
+        Associates query keywords with a capability. The capability does not need
+        a registered tool yet, so queries can still map to capabilities that are
+        missing and trigger discovery.
+        """
+        self._add_keywords(capability_name, keywords, persist=True)
+
+    def _add_keywords(self, capability_name: str, keywords: Iterable[str], persist: bool):
+        existing_keywords = self.keywords.setdefault(capability_name, [])
+        new_keywords = []
+        for keyword in keywords:
+            if keyword not in existing_keywords:
+                existing_keywords.append(keyword)
+                new_keywords.append(keyword)
+
+        if new_keywords:
+            if persist and self.store is not None:
+                self.store.record_keywords(capability_name, new_keywords)
+            for listener in self._keyword_listeners:
+                listener(capability_name, new_keywords)
 
-        # Update self.tool_mappings
-        if tool_id not in self.tool_mappings:
-            self.tool_mappings[tool_id] = set()
+    def add_keyword_listener(self, listener: Callable[[str, List[str]], None]):
+        """
+        Registers a callback invoked with (capability_name, new_keywords) whenever
+        keywords are added, e.g. to keep a CapabilityAnalyzer up to date.
+        """
+        self._keyword_listeners.append(listener)
 
-        current_tool_capabilities = set(tool.capabilities)
-        self.tool_mappings[tool_id].update(current_tool_capabilities)
+    def add_tool_listener(self, listener: Callable[[MCPTool], None]):
+        """
+        Registers a callback invoked with each newly registered or updated tool,
+        e.g. to keep a SemanticMatcher up to date.
+        """
+        self._tool_listeners.append(listener)
 
-        # Update self.capabilities
-        for capability_name in tool.capabilities:
-            if capability_name not in self.capabilities:
-                self.capabilities[capability_name] = {"tool_ids": [], "keywords": []} # Initialize with empty keywords
+    def add_tool_removal_listener(self, listener: Callable[[MCPTool], None]):
+        """
+        Registers a callback invoked with each deregistered tool, and with the
+        previous version of a re-registered tool before the tool listeners get
+        the new one, e.g. so a SemanticMatcher forgets its name.
+        """
+        self._tool_removal_listeners.append(listener)
 
-            # Add tool_id to the capability's tool_ids list if not already present
-            if tool_id not in self.capabilities[capability_name]["tool_ids"]:
-                self.capabilities[capability_name]["tool_ids"].append(tool_id)
+    def _notify_tool_listeners(self, tool: MCPTool, previous_tool: Optional[MCPTool] = None):
+        if previous_tool is not None:
+            self._notify_tool_removal_listeners(previous_tool)
+        for listener in self._tool_listeners:
+            listener(tool)
 
-        # Optional: Clean up capabilities in self.capabilities if a tool no longer supports them
-        # This would be more complex, requiring knowledge of all tools.
-        # For now, we only add. If a tool updates and removes a capability,
-        # old entries might persist in self.capabilities until a more robust cleanup.
+    def _notify_tool_removal_listeners(self, tool: MCPTool):
+        for listener in self._tool_removal_listeners:
+            listener(tool)
 
     def can_handle(self, query_capability: str) -> bool:
         """
         Checks if a given capability can be handled by any registered tool.
+        Reads the live index: a snapshot here would make the next registration
+        copy the whole capability map.
         """
-        return query_capability in self.capabilities and bool(self.capabilities[query_capability].get("tool_ids"))
+        return self.index.can_handle(query_capability)
 
     def find_missing_capability(self, required_capabilities_list: List[str]) -> Optional[str]:
         """
         Finds the first capability in the list that cannot be handled.
         Returns None if all can be handled.
         """
-        for capability_name in required_capabilities_list:
-            if not self.can_handle(capability_name):
-                return capability_name
-        return None
+        return self.index.first_missing(required_capabilities_list)
 
-    def get_tools_for_capability(self, capability_name: str) -> List[str]:
+    def get_tools_for_capability(self, capability_name: str) -> Collection[str]:
         """
-        Returns a list of tool IDs that can handle the given capability.
+        Returns the tool IDs that can handle the given capability, as a read-only view.
+        The view comes from a snapshot, so later registrations cannot change it.
         """
-        if self.can_handle(capability_name):
-            return self.capabilities[capability_name]["tool_ids"]
-        return []
+        return self.index.snapshot().get_tools_for_capability(capability_name)
 
     def get_capabilities_for_tool(self, tool_id: str) -> Set[str]:
         """
         Returns a set of capabilities provided by the given tool_id.
         """
-        return self.tool_mappings.get(tool_id, set())
+        return set(self.index.get_capabilities_for_tool(tool_id))
 
 # Example Usage (can be removed or moved to a test file later)
 if __name__ == '__main__':
@@ -102,9 +251,9 @@ if __name__ == '__main__':
     print(f"Missing in {required2}? {registry.find_missing_capability(required2)}") # code_translation
 
     # Test get_tools_for_capability
-    print(f"Tools for 'web_search': {registry.get_tools_for_capability('web_search')}") # ['tool_001', 'tool_003']
-    print(f"Tools for 'text_summarization': {registry.get_tools_for_capability('text_summarization')}") # ['tool_002']
-    print(f"Tools for 'image_generation': {registry.get_tools_for_capability('image_generation')}") # []
+    print(f"Tools for 'web_search': {list(registry.get_tools_for_capability('web_search'))}") # ['tool_001', 'tool_003']
+    print(f"Tools for 'text_summarization': {list(registry.get_tools_for_capability('text_summarization'))}") # ['tool_002']
+    print(f"Tools for 'image_generation': {list(registry.get_tools_for_capability('image_generation'))}") # []
 
     # Test get_capabilities_for_tool
     print(f"Capabilities for 'tool_001': {registry.get_capabilities_for_tool('tool_001')}")
@@ -117,34 +266,17 @@ if __name__ == '__main__':
     registry.register_capability_from_tool(tool1_updated) # This will update tool_001's capabilities
 
     print("\nRegistry State After Updating Tool1:")
-    print(f"Capabilities: {registry.capabilities}") # Note: 'image_search' will still list tool_001 if not explicitly removed by a more complex logic
+    print(f"Capabilities: {registry.capabilities}") # 'image_search' no longer lists tool_001
     print(f"Tool Mappings: {registry.tool_mappings}")
-    print(f"Can handle 'image_search'? {registry.can_handle('image_search')}") # Still True, due to current additive logic
-    print(f"Tools for 'image_search': {registry.get_tools_for_capability('image_search')}") # Still includes 'tool_001'
+    print(f"Can handle 'image_search'? {registry.can_handle('image_search')}") # False, tool_001 dropped it
+    print(f"Tools for 'image_search': {list(registry.get_tools_for_capability('image_search'))}") # []
     print(f"Can handle 'language_translation'? {registry.can_handle('language_translation')}") # True
-    print(f"Tools for 'language_translation': {registry.get_tools_for_capability('language_translation')}") # ['tool_001']
+    print(f"Tools for 'language_translation': {list(registry.get_tools_for_capability('language_translation'))}") # ['tool_001']
     print(f"Capabilities for 'tool_001': {registry.get_capabilities_for_tool('tool_001')}")
 
-    # Note: The current register_capability_from_tool only adds capabilities.
-    # If a tool *loses* a capability, the old mapping might still exist in self.capabilities
-    # unless a more sophisticated update/sync mechanism is implemented.
-    # For self.tool_mappings, it correctly reflects the latest set of capabilities for the tool.
-    # For example, 'image_search' is no longer in tool_001's mapping:
-    # registry.tool_mappings['tool_001'] will be {'web_search', 'language_translation'}
-    # However, self.capabilities['image_search']['tool_ids'] might still contain 'tool_001'.
-    # This is a design choice for simplicity or can be enhanced.
-    # A simple fix for the self.capabilities part upon tool update:
-    # 1. Get old capabilities of the tool from self.tool_mappings before updating it.
-    # 2. For capabilities that were removed from the tool, remove the tool_id from self.capabilities[removed_cap]['tool_ids'].
-    # This is not implemented in the current version for brevity but is a point of consideration.
-    # The current implementation of tool_mappings correctly updates the tool's capabilities set.
-    # The capabilities dictionary is additive for tool_ids to capabilities.
-    # This means if tool1 previously had 'image_search' and now it doesn't, 'image_search'
-    # will still list 'tool1' as a provider in `self.capabilities`
-    # but `self.tool_mappings['tool1']` will correctly not list 'image_search'.
-    # This is fine for `can_handle` as long as the tool is still registered.
-
-    # A tool that is completely de-registered would need another method like `deregister_tool(tool_id)`.
+    # A tool can also be removed entirely
+    registry.deregister_tool("tool_002")
+    print(f"Can handle 'data_analysis' after deregistering tool_002? {registry.can_handle('data_analysis')}") # False
 
     # Test registering a tool with an invalid structure (e.g. missing 'id')
     invalid_tool = {"name": "Invalid Tool", "capabilities": ["some_cap"]}
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from components.mcp_client import MCPTool
+from components.shared_registry import DiscoveryOwnership
+
+class DiscoveryCoordinator:
+    """
+    Coordinates tool discovery and integration for missing capabilities.
+
+    Concurrent callers asking for the same capability share one in-flight task
+    (single-flight), so discovery and integration run once per capability no
+    matter how many requests are waiting on it. Capabilities for which discovery
+    found nothing are cached for `negative_ttl` seconds and return immediately.
+
+    With several worker processes, an optional `ownership` makes one process at
+    a time discover a given capability. The others wait for it, then await
+    `is_handled` (which should read the shared registry first) and skip
+    discovery if the owner integrated a tool. "Nothing found" results are
+    shared through the ownership too.
+    """
+
+    def __init__(
+        self,
+        discover: Callable[[List[str]], Awaitable[List[MCPTool]]],
+        integrate: Callable[[MCPTool], Awaitable[Any]],
+        negative_ttl: float = 60.0,
+        ownership: Optional[DiscoveryOwnership] = None,
+        is_handled: Optional[Callable[[str], Awaitable[bool]]] = None,
+    ):
+        self._discover = discover
+        self._integrate = integrate
+        self.negative_ttl = negative_ttl
+        self.ownership = ownership
+        self._is_handled = is_handled
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # capability -> monotonic expiry time of the "nothing found" result
+        self._negative_cache: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # Resolved by another process while this one waited for ownership
+        self.resolved_elsewhere = 0
+
+    async def resolve(self, capability: str) -> List[MCPTool]:
+        """
+        Discovers and integrates tools for a capability, returning the tools that
+        were integrated. Returns an empty list if nothing was found.
+        """
+        expires_at = self._negative_cache.get(capability)
+        if expires_at is not None:
+            if time.monotonic() < expires_at:
+                self.hits += 1
+                return []
+            del self._negative_cache[capability]
+
+        task = self._in_flight.get(capability)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._discover_and_integrate(capability))
+            self._in_flight[capability] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(capability, None))
+
+        # Shield the shared task so one cancelled caller does not cancel it for everyone
+        return await asyncio.shield(task)
+
+    async def resolve_many(self, capabilities: List[str]) -> Dict[str, List[MCPTool]]:
+        """
+        Resolves several capabilities concurrently.
+        """
+        results = await asyncio.gather(*(self.resolve(capability) for capability in capabilities))
+        return dict(zip(capabilities, results))
+
+    async def _discover_and_integrate(self, capability: str) -> List[MCPTool]:
+        if self.ownership is None:
+            return await self._run_discovery(capability)
+
+        async with self.ownership.claim(capability) as claim:
+            if self._is_handled is not None and await self._is_handled(capability):
+                self.resolved_elsewhere += 1
+                return []
+            miss_remaining = claim.miss_remaining()
+            if miss_remaining > 0:
+                self.resolved_elsewhere += 1
+                self._negative_cache[capability] = time.monotonic() + miss_remaining
+                return []
+            discovered_tools = await self._run_discovery(capability)
+            if not discovered_tools:
+                claim.record_miss(self.negative_ttl)
+            return discovered_tools
+
+    async def _run_discovery(self, capability: str) -> List[MCPTool]:
+        discovered_tools = await self._discover([capability])
+        if not discovered_tools:
+            self._negative_cache[capability] = time.monotonic() + self.negative_ttl
+            return []
+
+        for tool in discovered_tools:
+            await self._integrate(tool)
+        return discovered_tools
+
+    def invalidate(self, capability: Optional[str] = None):
+        """
+        Drops cached "nothing found" results, for one capability or all of them.
+        Results shared by other processes expire on their own.
+        """
+        if capability is None:
+            self._negative_cache.clear()
+        else:
+            self._negative_cache.pop(capability, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "resolved_elsewhere": self.resolved_elsewhere,
+            "in_flight": len(self._in_flight),
+            "negative_cache_size": len(self._negative_cache),
+        }
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    calls: Dict[str, int] = {"discover": 0, "integrate": 0}
+
+    async def discover(capabilities: List[str]) -> List[MCPTool]:
+        calls["discover"] += 1
+        await asyncio.sleep(0.05)
+        if "text_summarization" in capabilities:
+            return [MCPTool(id="summarizer_001", name="Text Summarization Tool", capabilities=["text_summarization"])]
+        return []
+
+    async def integrate(tool: MCPTool):
+        calls["integrate"] += 1
+        await asyncio.sleep(0.05)
+
+    async def main():
+        coordinator = DiscoveryCoordinator(discover, integrate)
+
+        # A burst of identical cold lookups results in a single discovery and integration
+        results = await asyncio.gather(*(coordinator.resolve("text_summarization") for _ in range(1000)))
+        print(f"Tools per caller: {len(results[0])}, calls: {calls}")  # {'discover': 1, 'integrate': 1}
+        print(f"Stats: {coordinator.stats()}")  # 1 miss, 999 coalesced
+
+        # Misses are cached, so repeat lookups do not rediscover
+        await coordinator.resolve("unknown_capability")
+        await coordinator.resolve("unknown_capability")
+        print(f"Calls after repeated unknown lookups: {calls}")  # discover: 2
+        print(f"Stats: {coordinator.stats()}")  # 1 hit
+
+    asyncio.run(main())
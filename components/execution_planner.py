@@ -0,0 +1,265 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from components.mcp_client import MCPClient
+
+class PlanNode:
+    __slots__ = ("capability", "dependencies")
+
+    def __init__(self, capability: str, dependencies: Tuple[str, ...]):
+        self.capability = capability
+        self.dependencies = dependencies
+
+class ExecutionPlan:
+    """
+    A dependency DAG over the capabilities required by a query, with nodes
+    stored in topological order.
+    """
+
+    def __init__(self, nodes: List[PlanNode]):
+        self.nodes = nodes
+
+    @property
+    def capabilities(self) -> List[str]:
+        return [node.capability for node in self.nodes]
+
+    @property
+    def sinks(self) -> List[str]:
+        """
+        Capabilities no other node depends on; their results form the answer.
+        """
+        depended_on = {dependency for node in self.nodes for dependency in node.dependencies}
+        return [node.capability for node in self.nodes if node.capability not in depended_on]
+
+class ExecutionPlanner:
+    """
+    Builds and runs execution plans for multi-capability queries.
+
+    `dependencies` maps a capability to the capabilities whose output it
+    consumes, e.g. {"text_summarization": ["news_api"]}. Only edges between
+    capabilities required by the query are used. Each node starts as soon as
+    its dependencies finish, and independent branches run concurrently under
+    `max_concurrency`. End-to-end latency is therefore the critical path, not
+    the sum of all steps.
+
+    stream() runs a plan the same way but yields each node's output as it is
+    produced, buffering at most `stream_buffer` events for a slow consumer.
+    """
+
+    def __init__(self, client: MCPClient, dependencies: Optional[Dict[str, List[str]]] = None, max_concurrency: int = 8, stream_buffer: int = 64):
+        self.client = client
+        self.dependencies = dependencies or {}
+        self.max_concurrency = max_concurrency
+        self.stream_buffer = stream_buffer
+
+    def build_plan(self, required_capabilities: List[str]) -> ExecutionPlan:
+        required = list(dict.fromkeys(required_capabilities))
+        required_set = set(required)
+        edges = {
+            capability: tuple(dep for dep in self.dependencies.get(capability, []) if dep in required_set)
+            for capability in required
+        }
+
+        # Depth-first topological sort, keeping the required order where possible
+        ordered: List[PlanNode] = []
+        state: Dict[str, int] = {} # 1 = visiting, 2 = done
+
+        def visit(capability: str):
+            if state.get(capability) == 2:
+                return
+            if state.get(capability) == 1:
+                raise ValueError(f"Capability dependency cycle involving '{capability}'")
+            state[capability] = 1
+            for dependency in edges[capability]:
+                visit(dependency)
+            state[capability] = 2
+            ordered.append(PlanNode(capability, edges[capability]))
+
+        for capability in required:
+            visit(capability)
+        return ExecutionPlan(ordered)
+
+    async def execute(self, plan: ExecutionPlan, query: str) -> Dict[str, Any]:
+        """
+        Runs the plan and returns a merged result with per-node timings.
+        """
+        return await self._run(plan, query, self.client.execute_task)
+
+    async def stream(self, plan: ExecutionPlan, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Runs the plan like execute(), yielding events as they happen:
+        {"event": "chunk", "capability", "tool_id", "data"} for each chunk a
+        streaming tool produces, {"event": "node", "capability", ...result}
+        when a node finishes, and finally {"event": "done", ...} with the
+        merged result execute() would return.
+
+        Nodes wait while `stream_buffer` events are unread, so tools produce
+        no faster than the consumer reads. Closing the iterator cancels the
+        nodes still running and closes their tools' streams.
+        """
+        events: asyncio.Queue = asyncio.Queue(self.stream_buffer)
+
+        async def call_tool(capability: str, task_args: Dict[str, Any]) -> Dict[str, Any]:
+            async def forward(tool_id: str, chunk: Any):
+                await events.put({"event": "chunk", "capability": capability, "tool_id": tool_id, "data": chunk})
+            return await self.client.execute_task(capability, task_args, on_chunk=forward)
+
+        async def on_result(capability: str, result: Dict[str, Any]):
+            await events.put({"event": "node", "capability": capability, **result})
+
+        async def run_plan() -> Dict[str, Any]:
+            cancelled = False
+            try:
+                return await self._run(plan, query, call_tool, on_result)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                # Ends the consumer's loop; once it cancelled the plan it reads no more, and the queue may be full
+                if not cancelled:
+                    await events.put(None)
+
+        runner = asyncio.ensure_future(run_plan())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            # Raises if a node failed unexpectedly
+            yield {"event": "done", **await runner}
+        finally:
+            runner.cancel()
+            # Wait for the tools' streams to be closed before returning
+            await asyncio.gather(runner, return_exceptions=True)
+
+    async def _run(
+        self,
+        plan: ExecutionPlan,
+        query: str,
+        call_tool: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        on_result: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Runs each node with `call_tool(capability, task_args)` once its
+        dependencies finish, awaiting `on_result(capability, result)` after
+        each, and returns the merged result.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        plan_start = time.perf_counter()
+        results: Dict[str, Dict[str, Any]] = {}
+        timings: Dict[str, Dict[str, float]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        def elapsed_ms() -> float:
+            return (time.perf_counter() - plan_start) * 1000
+
+        async def run_node(node: PlanNode):
+            if node.dependencies:
+                await asyncio.gather(*(tasks[dependency] for dependency in node.dependencies))
+            failed = [dependency for dependency in node.dependencies if results[dependency].get("status") == "error"]
+            ready_ms = elapsed_ms()
+            if failed:
+                result = {"status": "skipped", "result": f"Dependencies failed: {failed}"}
+                timings[node.capability] = {"start_ms": ready_ms, "end_ms": ready_ms, "duration_ms": 0.0, "queued_ms": 0.0}
+            else:
+                task_args: Dict[str, Any] = {"query": query}
+                if node.dependencies:
+                    task_args["inputs"] = {dependency: results[dependency].get("result") for dependency in node.dependencies}
+                async with semaphore:
+                    start_ms = elapsed_ms()
+                    result = await call_tool(node.capability, task_args)
+                    end_ms = elapsed_ms()
+                timings[node.capability] = {
+                    "start_ms": start_ms,
+                    "end_ms": end_ms,
+                    "duration_ms": end_ms - start_ms,
+                    "queued_ms": start_ms - ready_ms,
+                }
+            results[node.capability] = result
+            if on_result is not None:
+                await on_result(node.capability, result)
+
+        # Nodes are in topological order, so every dependency task exists before its dependents
+        for node in plan.nodes:
+            tasks[node.capability] = asyncio.ensure_future(run_node(node))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        return self._merge(plan, results, timings, elapsed_ms())
+
+    def _merge(self, plan: ExecutionPlan, results: Dict[str, Dict[str, Any]], timings: Dict[str, Dict[str, float]], total_ms: float) -> Dict[str, Any]:
+        sinks = plan.sinks
+        statuses = [results[capability].get("status") for capability in plan.capabilities]
+        if all(status == "success" for status in statuses):
+            status = "success"
+        elif all(status in ("error", "skipped") for status in statuses):
+            status = "error"
+        elif any(status in ("error", "skipped") for status in statuses):
+            status = "partial"
+        else:
+            status = statuses[-1] if statuses else "error"
+
+        return {
+            "status": status,
+            "result": results[sinks[0]].get("result") if len(sinks) == 1 else {capability: results[capability].get("result") for capability in sinks},
+            "nodes": results,
+            "timings": {
+                "nodes": timings,
+                "total_ms": total_ms,
+                "critical_path_ms": self._critical_path_ms(plan, timings),
+                "sum_of_steps_ms": sum(timing["duration_ms"] for timing in timings.values()),
+            },
+        }
+
+    @staticmethod
+    def _critical_path_ms(plan: ExecutionPlan, timings: Dict[str, Dict[str, float]]) -> float:
+        longest: Dict[str, float] = {}
+        for node in plan.nodes:
+            before = max((longest[dependency] for dependency in node.dependencies), default=0.0)
+            longest[node.capability] = before + timings.get(node.capability, {}).get("duration_ms", 0.0)
+        return max(longest.values(), default=0.0)
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    from components.mcp_client import MCPTool
+
+    def stub_tool(capability: str, delay: float) -> MCPTool:
+        async def handler(query: str, inputs: Optional[Dict[str, Any]] = None):
+            await asyncio.sleep(delay)
+            return f"{capability}({query}{', ' + str(inputs) if inputs else ''})"
+        return MCPTool(id=f"{capability}_tool", name=capability, capabilities=[capability], handler=handler)
+
+    async def main():
+        client = MCPClient()
+        client.register_tool(stub_tool("news_api", 0.05))
+        client.register_tool(stub_tool("weather_api", 0.05))
+        client.register_tool(stub_tool("text_summarization", 0.03))
+
+        planner = ExecutionPlanner(client, dependencies={"text_summarization": ["news_api"]})
+        plan = planner.build_plan(["text_summarization", "weather_api", "news_api"])
+        print(f"Plan order: {plan.capabilities}, sinks: {plan.sinks}")
+
+        merged = await planner.execute(plan, "news and weather")
+        print(f"Status: {merged['status']}")
+        print(f"Result: {merged['result']}")
+        timings = merged["timings"]
+        # Total is close to the critical path (news -> summarization), not the sum of all steps
+        print(f"total={timings['total_ms']:.0f}ms critical_path={timings['critical_path_ms']:.0f}ms sum={timings['sum_of_steps_ms']:.0f}ms")
+
+        # A streaming tool's chunks are forwarded as it yields them, before the plan finishes
+        async def summarize(query: str, inputs: Optional[Dict[str, Any]] = None):
+            for word in ["Markets", " rallied", " today."]:
+                await asyncio.sleep(0.02)
+                yield word
+
+        client.deregister_tool("text_summarization_tool")
+        client.register_tool(MCPTool(id="streaming_summarizer", name="Streaming Summarizer", capabilities=["text_summarization"], handler=summarize))
+        async for event in planner.stream(planner.build_plan(["text_summarization", "news_api"]), "summarize the news"):
+            print(f"{event['event']}: {event.get('capability', '')} {event['data'] if event['event'] == 'chunk' else event['result']!r}")
+
+    asyncio.run(main())
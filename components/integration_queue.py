@@ -0,0 +1,365 @@
+import asyncio
+import heapq
+import itertools
+import random
+import secrets
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from components.mcp_client import MCPTool
+from components.structured_logger import get_logger
+
+logger = get_logger("integration_queue")
+
+class _Integration:
+    """
+    The discovery and integration of one capability, shared by every job that
+    needs it.
+    """
+
+    __slots__ = ("capability", "sequence", "state", "demand", "attempts", "tool_ids", "error", "jobs", "retry_handle")
+
+    def __init__(self, capability: str, sequence: int):
+        self.capability = capability
+        # Submission order, the tie-breaker between capabilities with the same demand
+        self.sequence = sequence
+        # queued -> running -> done, failed, or retrying -> queued again
+        self.state = "queued"
+        # Number of jobs waiting on this capability
+        self.demand = 0
+        self.attempts = 0
+        self.tool_ids: List[str] = []
+        self.error: Optional[str] = None
+        self.jobs: List["IntegrationJob"] = []
+        self.retry_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed")
+
+class IntegrationJob:
+    """
+    The background work started by one request: integrating its missing
+    capabilities, then running an optional follow-up (e.g. answering the query
+    again) once each of them is integrated, found to have no tool, or failed.
+    The follow-up's return value becomes the job's result.
+
+    to_dict() reports progress; updates() follows it until the job finishes.
+    """
+
+    def __init__(self, job_id: str, on_resolved: Optional[Callable[["IntegrationJob"], Awaitable[Any]]] = None):
+        self.id = job_id
+        # queued -> integrating -> completing -> completed or failed
+        self.state = "queued"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self._integrations: List[_Integration] = []
+        self._on_resolved = on_resolved
+        # Replaced on every change, so each waiter sees the change that woke it
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("completed", "failed")
+
+    @property
+    def tool_ids(self) -> List[str]:
+        """
+        The tools integrated for this job so far.
+        """
+        return [tool_id for integration in self._integrations for tool_id in integration.tool_ids]
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "progress": {
+                "resolved": sum(1 for integration in self._integrations if integration.finished),
+                "total": len(self._integrations),
+            },
+            "capabilities": {
+                integration.capability: {
+                    "state": integration.state,
+                    "attempts": integration.attempts,
+                    "tools": list(integration.tool_ids),
+                    "error": integration.error,
+                }
+                for integration in self._integrations
+            },
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    async def wait(self) -> "IntegrationJob":
+        while not self.finished:
+            await self._changed.wait()
+        return self
+
+    async def updates(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields the job's state now and after every change, until it finishes.
+        """
+        while True:
+            changed = self._changed
+            yield self.to_dict()
+            if self.finished:
+                return
+            await changed.wait()
+
+class IntegrationQueue:
+    """
+    Discovers and integrates missing capabilities in the background, so that
+    requests can answer at once with what is available and hand out a job to
+    follow for the rest.
+
+    Each capability is integrated by one run at a time however many jobs need
+    it: jobs submitted while it is queued or running attach to it. Queued
+    capabilities run in order of demand (the number of jobs waiting on them),
+    then of submission, on `workers` concurrent workers. A failed run is
+    retried up to `max_attempts` times in all, after an exponential backoff
+    with jitter. At most `max_pending` capabilities are queued or running;
+    beyond that submit() raises asyncio.QueueFull, so callers shed load
+    instead of growing the backlog.
+
+    Finished jobs stay readable until `max_finished_jobs` newer ones finish.
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[str], Awaitable[List[MCPTool]]],
+        workers: int = 4,
+        max_pending: int = 1_000,
+        max_attempts: int = 3,
+        retry_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_finished_jobs: int = 10_000
+    ):
+        # Discovers and integrates one capability, returning the integrated tools (e.g. DiscoveryCoordinator.resolve)
+        self._resolve = resolve
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.max_finished_jobs = max_finished_jobs
+        # Unfinished integrations, by capability
+        self._integrations: Dict[str, _Integration] = {}
+        # (-demand, sequence, integration); entries left behind by a demand increase are skipped
+        self._ready: List[Tuple[int, int, _Integration]] = []
+        self._sequence = itertools.count()
+        self._work_available = asyncio.Event()
+        self._jobs: Dict[str, IntegrationJob] = {}
+        self._finished_jobs: Deque[str] = deque()
+        self._workers: List[asyncio.Task] = []
+        self._follow_ups: Set[asyncio.Task] = set()
+        self.running = 0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.retries = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        """
+        Stops the workers and pending follow-ups. Unfinished jobs stay unfinished.
+        """
+        for integration in self._integrations.values():
+            if integration.retry_handle is not None:
+                integration.retry_handle.cancel()
+        tasks = [*self._workers, *self._follow_ups]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+    def get(self, job_id: str) -> Optional[IntegrationJob]:
+        return self._jobs.get(job_id)
+
+    def submit(
+        self,
+        capabilities: List[str],
+        on_resolved: Optional[Callable[[IntegrationJob], Awaitable[Any]]] = None
+    ) -> IntegrationJob:
+        """
+        Starts a job integrating the given capabilities, then calling
+        `on_resolved(job)`. Raises asyncio.QueueFull if the capabilities not
+        already pending would exceed `max_pending`.
+        """
+        capabilities = list(dict.fromkeys(capabilities))
+        new_count = sum(1 for capability in capabilities if capability not in self._integrations)
+        if new_count and len(self._integrations) + new_count > self.max_pending:
+            self.rejected += 1
+            raise asyncio.QueueFull(f"{len(self._integrations)} capability integrations already pending")
+
+        job = IntegrationJob(secrets.token_hex(8), on_resolved)
+        for capability in capabilities:
+            integration = self._integrations.get(capability)
+            if integration is None:
+                integration = self._integrations[capability] = _Integration(capability, next(self._sequence))
+            else:
+                self.deduplicated += 1
+            integration.demand += 1
+            integration.jobs.append(job)
+            job._integrations.append(integration)
+            if integration.state == "queued":
+                # Re-queued at its new demand
+                self._push(integration)
+        self._jobs[job.id] = job
+        self.submitted += 1
+        if not capabilities:
+            self._resolve_job(job)
+        return job
+
+    def _push(self, integration: _Integration):
+        heapq.heappush(self._ready, (-integration.demand, integration.sequence, integration))
+        self._work_available.set()
+
+    async def _next(self) -> _Integration:
+        while True:
+            while not self._ready:
+                self._work_available.clear()
+                await self._work_available.wait()
+            priority, _, integration = heapq.heappop(self._ready)
+            if integration.state == "queued" and -priority == integration.demand:
+                return integration
+
+    async def _work(self):
+        while True:
+            integration = await self._next()
+            self.running += 1
+            try:
+                await self._run(integration)
+            finally:
+                self.running -= 1
+
+    async def _run(self, integration: _Integration):
+        integration.state = "running"
+        integration.attempts += 1
+        self._integration_changed(integration)
+        try:
+            tools = await self._resolve(integration.capability)
+        except Exception as e:
+            integration.error = str(e)
+            if integration.attempts < self.max_attempts:
+                self._schedule_retry(integration)
+                return
+            integration.state = "failed"
+            self.failed += 1
+            logger.error("integration_failed", capability=integration.capability, attempts=integration.attempts, error=str(e))
+        else:
+            integration.tool_ids = [tool.id for tool in tools]
+            integration.error = None
+            integration.state = "done"
+        del self._integrations[integration.capability]
+        self._integration_changed(integration)
+
+    def _schedule_retry(self, integration: _Integration):
+        # Jitter spreads out retries of capabilities that failed together, e.g. during an outage
+        delay = min(self.retry_backoff * 2 ** (integration.attempts - 1), self.max_backoff) * random.uniform(0.5, 1.0)
+        integration.state = "retrying"
+        self.retries += 1
+        logger.warning("integration_retry_scheduled", capability=integration.capability, attempt=integration.attempts, delay=delay, error=integration.error)
+        integration.retry_handle = asyncio.get_running_loop().call_later(delay, self._requeue, integration)
+        self._integration_changed(integration)
+
+    def _requeue(self, integration: _Integration):
+        integration.retry_handle = None
+        integration.state = "queued"
+        self._push(integration)
+        self._integration_changed(integration)
+
+    def _integration_changed(self, integration: _Integration):
+        for job in integration.jobs:
+            if all(other.finished for other in job._integrations):
+                self._resolve_job(job)
+            else:
+                job.state = "integrating"
+                job._notify()
+        if integration.finished:
+            integration.jobs = []
+
+    def _resolve_job(self, job: IntegrationJob):
+        if job._on_resolved is None:
+            self._finish(job, "completed")
+            return
+        job.state = "completing"
+        job._notify()
+        task = asyncio.ensure_future(self._follow_up(job))
+        self._follow_ups.add(task)
+        task.add_done_callback(self._follow_ups.discard)
+
+    async def _follow_up(self, job: IntegrationJob):
+        on_resolved, job._on_resolved = job._on_resolved, None
+        try:
+            job.result = await on_resolved(job)
+        except Exception as e:
+            job.error = str(e)
+            logger.error("integration_job_failed", job_id=job.id, error=str(e))
+            self._finish(job, "failed")
+            return
+        self._finish(job, "completed")
+
+    def _finish(self, job: IntegrationJob, state: str):
+        job.state = state
+        job.finished_at = time.time()
+        job._notify()
+        self._finished_jobs.append(job.id)
+        while len(self._finished_jobs) > self.max_finished_jobs:
+            self._jobs.pop(self._finished_jobs.popleft(), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._integrations),
+            "running": self.running,
+            "jobs": len(self._jobs),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "retries": self.retries,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    attempts: Dict[str, int] = {}
+
+    async def resolve(capability: str) -> List[MCPTool]:
+        attempts[capability] = attempts.get(capability, 0) + 1
+        await asyncio.sleep(0.05)
+        if capability == "flaky_capability" and attempts[capability] == 1:
+            raise ConnectionError("registry unreachable")
+        return [MCPTool(id=f"{capability}_tool", name=capability, capabilities=[capability])]
+
+    async def main():
+        queue = IntegrationQueue(resolve, workers=1, retry_backoff=0.05)
+        queue.start()
+
+        async def answer(job: IntegrationJob) -> str:
+            return f"answered with {job.tool_ids}"
+
+        # Two requests need text_summarization: it is integrated once, and first, having the most demand
+        first = queue.submit(["weather_api", "text_summarization"], on_resolved=answer)
+        second = queue.submit(["text_summarization", "flaky_capability"], on_resolved=answer)
+        print(f"Job {first.id}: {first.to_dict()['state']}")  # queued
+
+        async for update in second.updates():
+            print(f"Job {second.id}: {update['state']} {update['progress']}")
+        await first.wait()
+        print(f"Results: {first.result!r}, {second.result!r}")
+        print(f"Attempts: {attempts}")  # flaky_capability: 2, the others: 1
+        print(f"Stats: {queue.stats()}")
+        await queue.close()
+
+    asyncio.run(main())
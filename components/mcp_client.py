@@ -1,43 +1,309 @@
-from typing import List, Dict, Any
+import asyncio
+import sys
+import time
+from contextlib import aclosing, nullcontext
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Collection, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from components.admission_control import ConcurrencyLimits, OverloadedError
+from components.capability_index import CapabilityIndex, IndexSnapshot
+from components.metrics import MetricsRegistry
+from components.result_cache import ResultCache
+from components.structured_logger import get_logger
+from components.tool_selector import ToolSelector
+
+if TYPE_CHECKING:
+    from components.mcp_session_pool import MCPSessionPool
+
+logger = get_logger("mcp_client")
+
+def combine_chunks(chunks: List[Any]) -> Any:
+    """
+    The result of a streamed execution: the chunks concatenated if they are
+    all strings, else the list of chunks.
+    """
+    if all(isinstance(chunk, str) for chunk in chunks):
+        return "".join(chunks)
+    return chunks
+
+class _AttemptsFailed(Exception):
+    """
+    Raised by a hedged execution when every call failed, with each tool's error.
+    """
+
+    def __init__(self, failures: List[Tuple[str, BaseException]]):
+        super().__init__("; ".join(f"{tool_id}: {error}" for tool_id, error in failures))
+        self.failures = failures
 
 class MCPTool:
-    def __init__(self, id: str, name: str, capabilities: List[str]):
-        self.id = id
-        self.name = name
-        self.capabilities = capabilities
+    """
+    A tool and the capabilities it provides. Tools are immutable: to change
+    one, register a new MCPTool with the same ID. The capability index and
+    every published snapshot share tool objects, so this keeps them safe to
+    read without copies.
+
+    A catalogue can hold hundreds of thousands of tools, so they are kept
+    compact: slots instead of an instance dict, tuples instead of lists, and
+    capability names interned so every tool and the index share one string
+    per capability.
+    """
+
+    __slots__ = ("id", "name", "capabilities", "keywords", "handler", "command")
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        capabilities: Iterable[str],
+        keywords: Optional[Iterable[str]] = None,
+        handler: Optional[Callable[..., Union[Awaitable[Any], AsyncIterator[Any]]]] = None,
+        command: Optional[Iterable[str]] = None
+    ):
+        initialize = object.__setattr__
+        initialize(self, "id", id)
+        initialize(self, "name", name)
+        # Duplicates are dropped, so the index can store this tuple as is
+        initialize(self, "capabilities", tuple(dict.fromkeys(map(sys.intern, capabilities))))
+        # Query keywords that indicate this tool's capabilities are needed
+        initialize(self, "keywords", tuple(keywords) if keywords else ())
+        # Async callable invoked with the task arguments, or async generator function yielding
+        # the result in chunks; tools without one are not executable yet
+        initialize(self, "handler", handler)
+        # Command line that starts the tool's stdio MCP server, for tools served over MCP
+        initialize(self, "command", tuple(command) if command is not None else None)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"MCPTool is immutable; register a new tool to change '{name}'")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"MCPTool is immutable; cannot delete '{name}'")
 
 class MCPClient:
-    def __init__(self):
-        self.tools: Dict[str, MCPTool] = {}
-        self.capabilities: Dict[str, List[str]] = {}
+    def __init__(
+        self,
+        index: Optional[CapabilityIndex] = None,
+        selector: Optional[ToolSelector] = None,
+        hedge: bool = False,
+        session_pool: Optional["MCPSessionPool"] = None,
+        result_cache: Optional[ResultCache] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        tool_limits: Optional[ConcurrencyLimits] = None,
+        capability_limits: Optional[ConcurrencyLimits] = None
+    ):
+        # The capability index may be shared with a CapabilityRegistry
+        self.index = index if index is not None else CapabilityIndex()
+        # Decides which of a capability's tools to try first; defaults to registration order
+        self.selector = selector if selector is not None else ToolSelector()
+        # Send a duplicate request to the next tool once the first exceeds its p95 latency
+        self.hedge = hedge
+        # Warm MCP sessions for tools that declare a server command
+        self.session_pool = session_pool
+        # Serves repeated tasks (same capability and normalized arguments) without re-executing them
+        self.result_cache = result_cache
+        # Receives per-tool latency observations
+        self.metrics = metrics
+        # Bound concurrent calls per tool and per capability: excess calls wait in a bounded
+        # queue until a deadline, then a tool call fails over and a capability call errors out
+        self.tool_limits = tool_limits
+        self.capability_limits = capability_limits
+
+    @property
+    def tools(self) -> Mapping[str, MCPTool]:
+        return self.index.snapshot().tools
+
+    @property
+    def capabilities(self) -> Mapping[str, Collection[str]]:
+        return self.index.snapshot().capabilities
 
     def register_tool(self, tool: MCPTool):
-        if tool.id in self.tools:
+        existing_tool = self.index.get_tool(tool.id)
+        if existing_tool is not None and existing_tool is not tool:
             # Optionally, raise an error or log a warning if tool.id is not unique
-            print(f"Warning: Tool with ID '{tool.id}' is already registered. Overwriting.")
-        self.tools[tool.id] = tool
-        for capability in tool.capabilities:
-            if capability not in self.capabilities:
-                self.capabilities[capability] = []
-            if tool.id not in self.capabilities[capability]: # Avoid duplicate tool_ids for the same capability
-                self.capabilities[capability].append(tool.id)
-
-    async def execute_task(self, task_name: str, task_args: Dict[str, Any]) -> Dict[str, Any]:
+            logger.warning("tool_overwritten", tool_id=tool.id)
+        self.index.register_tool(tool)
+
+    def deregister_tool(self, tool_id: str) -> Optional[MCPTool]:
+        return self.index.deregister_tool(tool_id)
+
+    async def execute_task(
+        self, task_name: str, task_args: Dict[str, Any], on_chunk: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Runs the task on the capability's tools, failing over between them,
+        and returns the result. With `on_chunk`, each chunk a streaming tool
+        yields is passed to `on_chunk(tool_id, chunk)` as it arrives, and the
+        tool is pulled only as fast as that returns; cached results produce no
+        chunks. Such a call is not hedged, and a tool failing after its first
+        chunk is not replaced, since another tool's output would not continue
+        the chunks already passed on.
+        """
+        if self.result_cache is None:
+            return await self._execute_uncached(task_name, task_args, on_chunk)
+        if on_chunk is None:
+            return await self.result_cache.get_or_compute(
+                task_name, task_args, lambda: self._execute_uncached(task_name, task_args)
+            )
+        # Not shared with concurrent callers: the chunks are this caller's, and cancelling it must stop the tool
+        cached = self.result_cache.get(task_name, task_args)
+        if cached is not None:
+            return cached
+        version = self.result_cache.version(task_name)
+        result = await self._execute_uncached(task_name, task_args, on_chunk)
+        self.result_cache.put(task_name, task_args, result, version=version)
+        return result
+
+    async def _execute_uncached(
+        self, task_name: str, task_args: Dict[str, Any], on_chunk: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        try:
+            async with self._slot(self.capability_limits, task_name):
+                return await self._execute_on_candidates(task_name, task_args, on_chunk)
+        except OverloadedError as e:
+            logger.warning("capability_overloaded", capability=task_name, reason=e.reason)
+            return {"status": "error", "result": str(e)}
+
+    @staticmethod
+    def _slot(limits: Optional[ConcurrencyLimits], key: str):
+        return limits.slot(key) if limits is not None else nullcontext()
+
+    async def _execute_on_candidates(
+        self, task_name: str, task_args: Dict[str, Any], on_chunk: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
         # For now, task_name is considered a capability
-        if task_name in self.capabilities and self.capabilities[task_name]:
-            tool_id_to_use = self.capabilities[task_name][0] # Use the first available tool
-            # In a real scenario, you might select a tool based on other criteria
-            # or even try multiple tools if the first one fails.
-            print(f"Executing task {task_name} using tool {tool_id_to_use}")
-            # Placeholder for actual tool execution logic
-            # tool_to_execute = self.tools[tool_id_to_use]
-            # result = tool_to_execute.execute(**task_args)
-            # return {"status": "success", "result": result}
-            return {"status": "pending", "result": None}
-        else:
-            print(f"No tool available for task {task_name}")
+        snapshot = self.index.snapshot()
+        tool_ids = snapshot.get_tools_for_capability(task_name)
+        if not tool_ids:
+            logger.warning("no_tool_available", capability=task_name)
             return {"status": "error", "result": "No tool available"}
 
+        forward = None
+        streamed = False
+        if on_chunk is not None:
+            async def forward(tool_id: str, chunk: Any):
+                nonlocal streamed
+                streamed = True
+                await on_chunk(tool_id, chunk)
+
+        # Try tools in the selector's order, failing over to the next one on errors
+        candidates = self.selector.rank(tool_ids)
+        errors = []
+        for tool_id in candidates:
+            # Two tools' chunks would interleave, so streamed calls are not hedged
+            hedge_tool_id = next(candidates, None) if self.hedge and on_chunk is None else None
+            logger.debug("executing_task", capability=task_name, tool_id=tool_id)
+            try:
+                if hedge_tool_id:
+                    return await self._execute_hedged(snapshot, tool_id, hedge_tool_id, task_name, task_args)
+                return await self._execute_on_tool(snapshot, tool_id, task_name, task_args, forward)
+            except _AttemptsFailed as e:
+                errors.extend(f"{failed_tool_id}: {error}" for failed_tool_id, error in e.failures)
+            except Exception as e:
+                errors.append(f"{tool_id}: {e}")
+                logger.warning("tool_failed", capability=task_name, tool_id=tool_id, error=str(e))
+                if streamed:
+                    return {"status": "error", "result": f"Tool {tool_id} failed mid-stream: {e}", "tool_id": tool_id}
+
+        return {"status": "error", "result": f"All tools failed for task {task_name}", "errors": errors}
+
+    async def _execute_on_tool(
+        self,
+        snapshot: IndexSnapshot,
+        tool_id: str,
+        task_name: str,
+        task_args: Dict[str, Any],
+        on_chunk: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        tool = snapshot.get_tool(tool_id)
+        served_over_mcp = tool is not None and tool.command and self.session_pool is not None
+        if tool is None or (tool.handler is None and not served_over_mcp):
+            # Placeholder until the tool has an execution backend
+            return {"status": "pending", "result": None, "tool_id": tool_id}
+        # Raises OverloadedError if the tool is saturated, so the next tool is tried
+        async with self._slot(self.tool_limits, tool_id):
+            return await self._call_tool(tool, task_name, task_args, on_chunk)
+
+    async def _call_tool(
+        self, tool: MCPTool, task_name: str, task_args: Dict[str, Any], on_chunk: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        tool_id = tool.id
+        self.selector.on_start(tool_id)
+        start = time.perf_counter()
+        try:
+            outcome = tool.handler(**task_args) if tool.handler is not None else self.session_pool.call(tool, task_name, task_args)
+            if hasattr(outcome, "__anext__"):
+                chunks = []
+                async with aclosing(outcome) as stream:
+                    async for chunk in stream:
+                        if not chunks and self.metrics is not None:
+                            self.metrics.observe("tool_first_chunk_seconds", time.perf_counter() - start, tool=tool_id, capability=task_name)
+                        chunks.append(chunk)
+                        if on_chunk is not None:
+                            await on_chunk(tool_id, chunk)
+                result = combine_chunks(chunks)
+            else:
+                result = await outcome
+        except asyncio.CancelledError:
+            # The caller went away; a tool's stream was closed above
+            self.selector.on_cancel(tool_id)
+            raise
+        except Exception:
+            self._record(tool_id, task_name, time.perf_counter() - start, ok=False)
+            raise
+        self._record(tool_id, task_name, time.perf_counter() - start, ok=True)
+        return {"status": "success", "result": result, "tool_id": tool_id}
+
+    def _record(self, tool_id: str, task_name: str, latency: float, ok: bool):
+        self.selector.on_finish(tool_id, latency, ok=ok)
+        if self.metrics is not None:
+            self.metrics.observe("tool_latency_seconds", latency, tool=tool_id, capability=task_name)
+            if not ok:
+                self.metrics.inc("tool_errors_total", tool=tool_id, capability=task_name)
+
+    async def _execute_hedged(
+        self, snapshot: IndexSnapshot, tool_id: str, hedge_tool_id: str, task_name: str, task_args: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Runs the task on `tool_id` and, if it is still running after that tool's
+        p95 latency, also on `hedge_tool_id`. The first success wins and the
+        other call is cancelled. If the primary fails before the hedge is due,
+        the hedge tool is tried as its failover. Raises _AttemptsFailed, with
+        each tool's error, if both calls fail.
+        """
+        delay = self.selector.hedge_delay(tool_id)
+        attempts: Dict[asyncio.Future, str] = {}
+        failures: List[Tuple[str, BaseException]] = []
+
+        def attempt(attempt_tool_id: str) -> asyncio.Future:
+            task = asyncio.ensure_future(self._execute_on_tool(snapshot, attempt_tool_id, task_name, task_args))
+            attempts[task] = attempt_tool_id
+            return task
+
+        pending = {attempt(tool_id)}
+        hedged = False
+        try:
+            while pending:
+                # Until the hedge is sent, wait at most the primary's p95; with no latency data yet, until it finishes
+                done, pending = await asyncio.wait(
+                    pending, timeout=delay if len(attempts) == 1 else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.debug("hedging_task", tool_id=tool_id, hedge_tool_id=hedge_tool_id, p95_ms=delay * 1000)
+                    hedged = True
+                    pending.add(attempt(hedge_tool_id))
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        return {**task.result(), "hedged": True} if hedged else task.result()
+                    failures.append((attempts[task], task.exception()))
+                    logger.warning("tool_failed", capability=task_name, tool_id=attempts[task], error=str(task.exception()))
+                if len(attempts) == 1:
+                    # The primary failed before the hedge was due: the hedge tool is the failover
+                    pending.add(attempt(hedge_tool_id))
+        finally:
+            # Also when the caller is cancelled mid-wait, so no call outlives it
+            for task in attempts:
+                task.cancel()
+        raise _AttemptsFailed(failures)
+
 # Example Usage (can be removed or moved to a test file later)
 if __name__ == '__main__':
     # Create a dummy tool
@@ -45,39 +311,40 @@ if __name__ == '__main__':
 
     # Initialize the client
     client = MCPClient()
+    run = asyncio.run
 
     # Register the tool
     client.register_tool(dummy_tool)
-    print(f"Registered tools: {client.tools}")
-    print(f"Available capabilities: {client.capabilities}")
+    print(f"Registered tools: {dict(client.tools)}")
+    print(f"Available capabilities: { {cap: list(ids) for cap, ids in client.capabilities.items()} }")
 
     # Execute a task
-    result1 = client.execute_task("dummy_task", {"param1": "value1"})
+    result1 = run(client.execute_task("dummy_task", {"param1": "value1"}))
     print(f"Task execution result 1: {result1}")
 
-    result2 = client.execute_task("non_existent_task", {})
+    result2 = run(client.execute_task("non_existent_task", {}))
     print(f"Task execution result 2: {result2}")
 
     # Register another tool with overlapping and new capabilities
     dummy_tool_2 = MCPTool(id="tool_2", name="Advanced Dummy Tool", capabilities=["dummy_task", "advanced_task"])
     client.register_tool(dummy_tool_2)
-    print(f"Registered tools after adding tool_2: {client.tools}")
-    print(f"Available capabilities after adding tool_2: {client.capabilities}")
+    print(f"Registered tools after adding tool_2: {dict(client.tools)}")
+    print(f"Available capabilities after adding tool_2: { {cap: list(ids) for cap, ids in client.capabilities.items()} }")
 
     # Execute dummy_task again, it should still use tool_1 as per current logic (first registered)
-    result3 = client.execute_task("dummy_task", {"param1": "value2"})
+    result3 = run(client.execute_task("dummy_task", {"param1": "value2"}))
     print(f"Task execution result 3: {result3}")
 
     # Execute advanced_task
-    result4 = client.execute_task("advanced_task", {})
+    result4 = run(client.execute_task("advanced_task", {}))
     print(f"Task execution result 4: {result4}")
 
     # Test registering a tool with an existing ID
     dummy_tool_overwrite = MCPTool(id="tool_1", name="Overwriting Dummy Tool", capabilities=["overwritten_task"])
     client.register_tool(dummy_tool_overwrite)
-    print(f"Registered tools after overwriting tool_1: {client.tools}")
-    print(f"Available capabilities after overwriting tool_1: {client.capabilities}")
-    result5 = client.execute_task("overwritten_task", {})
+    print(f"Registered tools after overwriting tool_1: {dict(client.tools)}")
+    print(f"Available capabilities after overwriting tool_1: { {cap: list(ids) for cap, ids in client.capabilities.items()} }")
+    result5 = run(client.execute_task("overwritten_task", {}))
     print(f"Task execution result 5: {result5}")
-    result6 = client.execute_task("dummy_task", {}) # This should now fail as tool_1's capabilities changed
+    result6 = run(client.execute_task("dummy_task", {})) # Now served by tool_2, as tool_1 no longer provides it
     print(f"Task execution result 6: {result6}")
@@ -0,0 +1,263 @@
+import asyncio
+import itertools
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from components.mcp_client import MCPTool
+
+PROTOCOL_VERSION = "2024-11-05"
+
+class MCPSessionError(Exception):
+    pass
+
+class MCPSession:
+    """
+    One initialized MCP session over a stdio server process.
+
+    Requests are multiplexed: each gets a JSON-RPC id, and a background reader
+    resolves the matching future, so many calls can be in flight at once.
+    """
+
+    def __init__(self, tool_id: str, command: List[str], request_timeout: float = 30.0):
+        self.tool_id = tool_id
+        self.command = command
+        self.request_timeout = request_timeout
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Spawns the server process and performs the MCP initialize handshake.
+        """
+        self._process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        self._reader_task = asyncio.ensure_future(self._read_responses())
+        await self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": "neuroforge", "version": "0.1.0"},
+        })
+        await self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def _send(self, message: Dict[str, Any]):
+        self._process.stdin.write((json.dumps(message) + "\n").encode())
+        await self._process.stdin.drain()
+
+    async def _read_responses(self):
+        try:
+            while True:
+                line = await self._process.stdout.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                future = self._pending.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    future.set_exception(MCPSessionError(message["error"].get("message", "Unknown MCP error")))
+                else:
+                    future.set_result(message.get("result"))
+        finally:
+            self.closed = True
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(MCPSessionError(f"Session for tool '{self.tool_id}' closed"))
+            self._pending.clear()
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        if self.closed:
+            raise MCPSessionError(f"Session for tool '{self.tool_id}' is closed")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.in_flight += 1
+        try:
+            await self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+            return await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Any:
+        return await self.request("tools/call", {"name": name, "arguments": arguments})
+
+    async def ping(self):
+        await self.request("ping")
+
+    async def close(self):
+        if self._process is None:
+            return
+        self.closed = True
+        if self._process.returncode is None:
+            self._process.stdin.close()
+            try:
+                await asyncio.wait_for(self._process.wait(), 2.0)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+class MCPSessionPool:
+    """
+    Keeps warm MCP sessions per tool so calls skip process spawn and handshake.
+
+    Calls are multiplexed over existing sessions. A new session is started only
+    when every session of the tool has `max_in_flight_per_session` requests
+    outstanding, up to `max_sessions_per_tool`. A maintenance task pings idle
+    sessions every `keepalive_interval` seconds, replaces dead ones on demand,
+    and closes sessions unused for `idle_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        max_sessions_per_tool: int = 2,
+        max_in_flight_per_session: int = 16,
+        idle_timeout: float = 300.0,
+        keepalive_interval: float = 30.0,
+        request_timeout: float = 30.0,
+    ):
+        self.max_sessions_per_tool = max_sessions_per_tool
+        self.max_in_flight_per_session = max_in_flight_per_session
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.request_timeout = request_timeout
+        self._sessions: Dict[str, List[MCPSession]] = {}
+        # Serializes session startup per tool, so a burst does not spawn a process per call
+        self._spawn_locks: Dict[str, asyncio.Lock] = {}
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.sessions_started = 0
+        self.sessions_evicted = 0
+
+    async def call(self, tool: MCPTool, name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        Calls an MCP tool by name on a pooled session for `tool`.
+        """
+        session = await self._acquire(tool)
+        result = await session.call_tool(name, arguments)
+        if result.get("isError"):
+            raise MCPSessionError(f"Tool '{tool.id}' returned an error: {result.get('content')}")
+        return result
+
+    async def warm(self, tool: MCPTool):
+        """
+        Starts a session for the tool ahead of its first call.
+        """
+        await self._acquire(tool)
+
+    def _least_loaded(self, tool_id: str) -> Optional[MCPSession]:
+        sessions = [session for session in self._sessions.get(tool_id, []) if not session.closed]
+        self._sessions[tool_id] = sessions
+        return min(sessions, key=lambda session: session.in_flight, default=None)
+
+    async def _acquire(self, tool: MCPTool) -> MCPSession:
+        self._ensure_maintenance()
+        session = self._least_loaded(tool.id)
+        if session is not None and (
+            session.in_flight < self.max_in_flight_per_session
+            or len(self._sessions[tool.id]) >= self.max_sessions_per_tool
+        ):
+            return session
+
+        lock = self._spawn_locks.setdefault(tool.id, asyncio.Lock())
+        async with lock:
+            # Another caller may have started a session while we waited
+            session = self._least_loaded(tool.id)
+            if session is not None and (
+                session.in_flight < self.max_in_flight_per_session
+                or len(self._sessions[tool.id]) >= self.max_sessions_per_tool
+            ):
+                return session
+
+            session = MCPSession(tool.id, tool.command, request_timeout=self.request_timeout)
+            try:
+                await session.start()
+            except Exception:
+                await session.close()
+                raise
+            self._sessions.setdefault(tool.id, []).append(session)
+            self.sessions_started += 1
+            return session
+
+    def _ensure_maintenance(self):
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.ensure_future(self._maintain())
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            await self.evict_idle()
+            for sessions in list(self._sessions.values()):
+                for session in sessions:
+                    if session.in_flight == 0 and not session.closed:
+                        try:
+                            await session.ping()
+                        except Exception:
+                            await session.close() # Dropped from the pool on next acquire
+
+    async def evict_idle(self):
+        """
+        Closes sessions with no requests in flight that were unused for idle_timeout.
+        """
+        now = time.monotonic()
+        for tool_id, sessions in list(self._sessions.items()):
+            keep = []
+            for session in sessions:
+                if session.in_flight == 0 and now - session.last_used >= self.idle_timeout:
+                    await session.close()
+                    self.sessions_evicted += 1
+                elif not session.closed:
+                    keep.append(session)
+            self._sessions[tool_id] = keep
+
+    async def close(self):
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            await asyncio.gather(self._maintenance_task, return_exceptions=True)
+            self._maintenance_task = None
+        for sessions in self._sessions.values():
+            for session in sessions:
+                await session.close()
+        self._sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": {tool_id: len(sessions) for tool_id, sessions in self._sessions.items()},
+            "in_flight": {tool_id: sum(session.in_flight for session in sessions) for tool_id, sessions in self._sessions.items()},
+            "sessions_started": self.sessions_started,
+            "sessions_evicted": self.sessions_evicted,
+        }
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    import sys
+    from components.mcp_client import MCPClient
+
+    async def main():
+        pool = MCPSessionPool(max_sessions_per_tool=2, max_in_flight_per_session=4)
+        client = MCPClient(session_pool=pool)
+        client.register_tool(MCPTool(
+            id="stub_search",
+            name="Stub Search Server",
+            capabilities=["web_search"],
+            command=[sys.executable, "-m", "components.stub_mcp_server", "--call-delay", "0.01"],
+        ))
+
+        print(await client.execute_task("web_search", {"query": "cats"}))
+        # Ten concurrent calls are multiplexed over at most two sessions
+        results = await asyncio.gather(*(client.execute_task("web_search", {"query": f"q{i}"}) for i in range(10)))
+        print(f"Statuses: {[result['status'] for result in results]}")
+        print(f"Pool stats: {pool.stats()}")
+        await pool.close()
+
+    asyncio.run(main())
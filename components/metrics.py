@@ -0,0 +1,177 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Set, Tuple
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+# A collector returns (metric name, labels, value) samples, read at scrape time
+Collector = Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]
+# Replaces every label value of series beyond a metric's cap, so they share one series
+OVERFLOW_LABEL_VALUE = "other"
+
+class LatencySummary:
+    """
+    Count, sum and quantiles over a sliding window of recent observations.
+    """
+
+    __slots__ = ("count", "total", "_window")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self._window: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self._window.append(value)
+
+    def quantiles(self, quantiles: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        if not self._window:
+            return {quantile: float("nan") for quantile in quantiles}
+        ordered = sorted(self._window)
+        last = len(ordered) - 1
+        return {quantile: ordered[min(int(quantile * len(ordered)), last)] for quantile in quantiles}
+
+class MetricsRegistry:
+    """
+    In-process metrics with Prometheus text exposition.
+
+    Latency observations are kept as summaries exposing p50/p95/p99 over the
+    last `window` samples per label set. Counters are monotonic; collectors are
+    callbacks that report component values at scrape time, as gauges (queue
+    depths, cache sizes) unless declared counters with declare_counters().
+
+    Each metric keeps at most `max_series` label sets: label values such as
+    tool IDs are unbounded, and every summary holds a window of samples.
+    Further label sets are aggregated into one series whose label values are
+    all "other".
+    """
+
+    def __init__(self, window: int = 1024, max_series: int = 500):
+        self.window = window
+        self.max_series = max_series
+        self._summaries: Dict[str, Dict[LabelSet, LatencySummary]] = {}
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._collectors: List[Collector] = []
+        self._collected_counters: Set[str] = set()
+        self._help: Dict[str, str] = {}
+
+    @staticmethod
+    def _label_set(labels: Dict[str, str]) -> LabelSet:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def _series_key(self, series: Dict[LabelSet, Any], labels: Dict[str, str]) -> LabelSet:
+        label_set = self._label_set(labels)
+        if label_set in series or len(series) < self.max_series:
+            return label_set
+        return tuple((key, OVERFLOW_LABEL_VALUE) for key, _ in label_set)
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels: str):
+        series = self._summaries.setdefault(name, {})
+        label_set = self._series_key(series, labels)
+        summary = series.get(label_set)
+        if summary is None:
+            summary = series[label_set] = LatencySummary(self.window)
+        summary.observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str):
+        series = self._counters.setdefault(name, {})
+        label_set = self._series_key(series, labels)
+        series[label_set] = series.get(label_set, 0.0) + amount
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """
+        Observes the wall-clock duration of the block in seconds. Works around
+        `await` expressions too, since it only reads the clock at entry and exit.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def declare_counters(self, names: Iterable[str]):
+        """
+        Exposes collected samples with these names as counters: component
+        statistics that only ever increase, like cache hits or retries.
+        """
+        self._collected_counters.update(names)
+
+    def quantiles(self, name: str, **labels: str) -> Dict[float, float]:
+        summary = self._summaries.get(name, {}).get(self._label_set(labels))
+        return summary.quantiles() if summary is not None else {}
+
+    @staticmethod
+    def _format_labels(label_set: LabelSet) -> str:
+        if not label_set:
+            return ""
+        escaped = (
+            f'{key}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), chr(92) + "n")}"'
+            for key, value in label_set
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for name, series in self._summaries.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} summary")
+            for label_set, summary in series.items():
+                for quantile, value in summary.quantiles().items():
+                    lines.append(f"{name}{self._format_labels(label_set + (('quantile', str(quantile)),))} {value}")
+                lines.append(f"{name}_sum{self._format_labels(label_set)} {summary.total}")
+                lines.append(f"{name}_count{self._format_labels(label_set)} {summary.count}")
+
+        for name, series in self._counters.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for label_set, value in series.items():
+                lines.append(f"{name}{self._format_labels(label_set)} {value}")
+
+        collected: Dict[str, Dict[LabelSet, float]] = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                samples = collected.setdefault(name, {})
+                # Samples beyond the cap are summed into the overflow series
+                label_set = self._series_key(samples, labels)
+                samples[label_set] = samples.get(label_set, 0) + value
+        for name, samples in collected.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {'counter' if name in self._collected_counters else 'gauge'}")
+            for label_set, value in samples.items():
+                lines.append(f"{name}{self._format_labels(label_set)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    import random
+
+    metrics = MetricsRegistry()
+    metrics.describe("query_stage_seconds", "Latency of each /query pipeline stage")
+    for _ in range(1000):
+        metrics.observe("query_stage_seconds", random.expovariate(1000), stage="analyze")
+        with metrics.timer("query_stage_seconds", stage="execute"):
+            sum(range(1000))
+    metrics.inc("queries_total", stage="execute")
+    metrics.register_collector(lambda: [("result_cache_entries", {}, 42), ("result_cache_hits", {}, 7)])
+    metrics.declare_counters(["result_cache_hits"])
+    # Per-tool series are capped; the rest share tool="other"
+    capped = MetricsRegistry(max_series=3)
+    for i in range(10):
+        capped.inc("tool_errors_total", tool=f"tool_{i}")
+    print(metrics.render_prometheus())
+    print(capped.render_prometheus())
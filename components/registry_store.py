@@ -0,0 +1,860 @@
+import json
+import mmap
+import os
+import re
+import secrets
+import threading
+import zlib
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): a data directory must then be used by one process only
+    fcntl = None
+
+from components.capability_index import CapabilityIndex
+from components.mcp_client import MCPTool
+from components.structured_logger import get_logger
+
+if TYPE_CHECKING:
+    from components.shared_registry import RegistryNotifier
+
+logger = get_logger("registry_store")
+
+SEGMENT_FORMAT = 2
+# Format 1 stored the keywords as one JSON object, parsed whole on first use
+READABLE_SEGMENT_FORMATS = (1, 2)
+# The header is a JSON line padded to a fixed size, so section offsets can be written into it
+HEADER_SIZE = 512
+
+def tool_record(tool: MCPTool) -> Dict[str, Any]:
+    """
+    The persisted form of a tool. Handlers are code and are not persisted; a
+    reloaded tool is executable only if it declares a server command.
+    """
+    return {
+        "id": tool.id,
+        "name": tool.name,
+        "capabilities": list(tool.capabilities),
+        "keywords": list(tool.keywords),
+        "command": list(tool.command) if tool.command is not None else None,
+    }
+
+def tool_from_record(record: Dict[str, Any]) -> MCPTool:
+    return MCPTool(
+        id=record["id"],
+        name=record["name"],
+        capabilities=record["capabilities"],
+        keywords=record.get("keywords") or None,
+        command=record.get("command")
+    )
+
+@contextmanager
+def file_lock(fd: int, exclusive: bool):
+    """
+    Holds a flock() on `fd` for the duration of the block.
+    """
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+def try_exclusive_lock(fd: int) -> bool:
+    """
+    Takes an exclusive flock() on `fd` without blocking. Returns False if
+    another open file holds it. The lock is released when `fd` is closed.
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+def _table_slots(count: int) -> int:
+    slots = 8
+    while slots < count * 2:
+        slots *= 2
+    return slots
+
+class RegistrySegment:
+    """
+    A read-only, memory-mapped registry snapshot.
+
+    The file holds three open-addressing hash tables (capability -> tool IDs,
+    tool ID -> tool metadata and capability -> keywords) whose slots point at
+    JSON records in the same file. Opening a segment only maps the file and
+    parses its header, so it costs the same for any number of tools; records
+    are parsed on first lookup and memoized.
+
+    Layout: [header][capability table][tool table][keyword table][capability records][tool records][keyword records]
+    Each table slot is a pair of unsigned 64-bit integers (crc32 of the key,
+    absolute record offset), with offset 0 marking an empty slot.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as source:
+            self._mmap = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        header = json.loads(self._mmap[:HEADER_SIZE])
+        if header.get("format") not in READABLE_SEGMENT_FORMATS:
+            raise ValueError(f"Unsupported registry segment format {header.get('format')!r} in {path}")
+        self.tool_count: int = header["tool_count"]
+        self.capability_count: int = header["capability_count"]
+        # The last log generation folded into this segment
+        self.generation: int = header.get("generation", 0)
+        view = memoryview(self._mmap)
+        self._capability_table = view[header["capability_table"][0]:header["capability_table"][1]].cast("Q")
+        self._tool_table = view[header["tool_table"][0]:header["tool_table"][1]].cast("Q")
+        self._capability_records = tuple(header["capability_records"])
+        self._tool_records = tuple(header["tool_records"])
+        if "keyword_table" in header:
+            self._keyword_table: Optional[memoryview] = view[header["keyword_table"][0]:header["keyword_table"][1]].cast("Q")
+            self._keyword_records = tuple(header["keyword_records"])
+        else:
+            self._keyword_table = None
+            self._keyword_records = tuple(header["keywords"])
+        # Parsed records, filled on first lookup
+        self._tool_ids: Dict[str, Tuple[str, ...]] = {}
+        self._tool_metadata: Dict[str, Dict[str, Any]] = {}
+        self._tools: Dict[str, MCPTool] = {}
+        # Every keyword list of a format 1 segment, parsed on first use
+        self._legacy_keywords: Optional[Dict[str, List[str]]] = None
+
+    def _parse_legacy_keywords(self) -> Dict[str, List[str]]:
+        if self._legacy_keywords is None:
+            start, end = self._keyword_records
+            self._legacy_keywords = json.loads(self._mmap[start:end]) if end > start else {}
+        return self._legacy_keywords
+
+    def keywords_for(self, capability_name: str) -> Optional[List[str]]:
+        """
+        Returns the capability's keywords as a new list the caller owns, or
+        None if none were persisted.
+        """
+        if self._keyword_table is None:
+            keywords = self._parse_legacy_keywords().get(capability_name)
+            return list(keywords) if keywords is not None else None
+        record = self._find(self._keyword_table, capability_name)
+        return record[1] if record is not None else None
+
+    def keyword_capabilities(self) -> Iterator[str]:
+        """
+        Yields every capability with persisted keywords, in file order.
+        """
+        return iter(self.read_keywords())
+
+    def read_keywords(self) -> Dict[str, List[str]]:
+        """
+        Parses every persisted keyword list into a new dict the caller owns.
+        """
+        if self._keyword_table is None:
+            return {capability_name: list(keywords) for capability_name, keywords in self._parse_legacy_keywords().items()}
+        start, end = self._keyword_records
+        if end <= start:
+            return {}
+        # Newlines within records are escaped, so the records join into one JSON array parsed at once
+        return dict(json.loads(b"[" + self._mmap[start:end - 1].replace(b"\n", b",") + b"]"))
+
+    def iter_keywords(self, chunk_size: int = 64 * 1024) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Yields every persisted (capability, keywords) pair in file order, as
+        lists the caller owns. Records are parsed about `chunk_size` bytes at
+        a time, so a consumer pausing between pairs never waits for the rest.
+        """
+        if self._keyword_table is None:
+            yield from self.read_keywords().items()
+            return
+        start, end = self._keyword_records
+        while start < end:
+            chunk_end = self._mmap.find(b"\n", min(start + chunk_size, end - 1), end) + 1
+            for capability_name, keywords in json.loads(b"[" + self._mmap[start:chunk_end - 1].replace(b"\n", b",") + b"]"):
+                yield capability_name, keywords
+            start = chunk_end
+
+    def _find(self, table: memoryview, key: str) -> Optional[Any]:
+        slot_count = len(table) // 2
+        if not slot_count:
+            return None
+        key_hash = zlib.crc32(key.encode())
+        slot = key_hash & (slot_count - 1)
+        while True:
+            offset = table[2 * slot + 1]
+            if offset == 0:
+                return None
+            if table[2 * slot] == key_hash:
+                record = json.loads(self._mmap[offset:self._mmap.find(b"\n", offset)])
+                if (record[0] if isinstance(record, list) else record["id"]) == key:
+                    return record
+            slot = (slot + 1) & (slot_count - 1)
+
+    def tools_for_capability(self, capability_name: str) -> Optional[Tuple[str, ...]]:
+        """
+        Returns the capability's tool IDs, in registration order.
+        """
+        tool_ids = self._tool_ids.get(capability_name)
+        if tool_ids is None:
+            record = self._find(self._capability_table, capability_name)
+            if record is None:
+                return None
+            tool_ids = self._tool_ids[capability_name] = tuple(dict.fromkeys(record[1]))
+        return tool_ids
+
+    def has_capability(self, capability_name: str) -> bool:
+        return self.tools_for_capability(capability_name) is not None
+
+    def _metadata(self, tool_id: str) -> Optional[Dict[str, Any]]:
+        metadata = self._tool_metadata.get(tool_id)
+        if metadata is None:
+            metadata = self._find(self._tool_table, tool_id)
+            if metadata is None:
+                return None
+            metadata["capabilities"] = tuple(dict.fromkeys(metadata["capabilities"]))
+            self._tool_metadata[tool_id] = metadata
+        return metadata
+
+    def has_tool(self, tool_id: str) -> bool:
+        return self._metadata(tool_id) is not None
+
+    def capabilities_for_tool(self, tool_id: str) -> Tuple[str, ...]:
+        metadata = self._metadata(tool_id)
+        return metadata["capabilities"] if metadata is not None else ()
+
+    def tool(self, tool_id: str) -> Optional[MCPTool]:
+        tool = self._tools.get(tool_id)
+        if tool is None:
+            metadata = self._metadata(tool_id)
+            if metadata is None:
+                return None
+            tool = self._tools[tool_id] = tool_from_record({**metadata, "capabilities": list(metadata["capabilities"])})
+        return tool
+
+    def tool_record(self, tool_id: str) -> Optional[Dict[str, Any]]:
+        metadata = self._metadata(tool_id)
+        return {**metadata, "capabilities": list(metadata["capabilities"])} if metadata is not None else None
+
+    def _scan(self, bounds: Tuple[int, int]) -> Iterator[Any]:
+        start, end = bounds
+        while start < end:
+            line_end = self._mmap.find(b"\n", start, end)
+            yield json.loads(self._mmap[start:line_end])
+            start = line_end + 1
+
+    def capability_names(self) -> Iterator[str]:
+        for record in self._scan(self._capability_records):
+            yield record[0]
+
+    def tool_ids(self) -> Iterator[str]:
+        for record in self._scan(self._tool_records):
+            yield record["id"]
+
+    def tool_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every persisted tool record, in file order. Used by compaction,
+        and by the semantic matcher's build to read tool names.
+        """
+        return self._scan(self._tool_records)
+
+    @staticmethod
+    def write(path: str, records: Iterable[Dict[str, Any]], keywords: Dict[str, List[str]], generation: int = 0):
+        """
+        Writes a segment atomically: to a temporary file first, then renamed over `path`.
+        """
+        records = list(records)
+        forward: Dict[str, List[str]] = {}
+        for record in records:
+            for capability_name in dict.fromkeys(record["capabilities"]):
+                forward.setdefault(capability_name, []).append(record["id"])
+
+        capability_slots = _table_slots(len(forward))
+        tool_slots = _table_slots(len(records))
+        keyword_slots = _table_slots(len(keywords))
+        capability_table_start = HEADER_SIZE
+        tool_table_start = capability_table_start + capability_slots * 16
+        keyword_table_start = tool_table_start + tool_slots * 16
+        capability_records_start = keyword_table_start + keyword_slots * 16
+
+        capability_table = array("Q", bytes(capability_slots * 16))
+        tool_table = array("Q", bytes(tool_slots * 16))
+        keyword_table = array("Q", bytes(keyword_slots * 16))
+        body = bytearray()
+
+        def place(table: array, slot_count: int, key: str, line: bytes):
+            key_hash = zlib.crc32(key.encode())
+            slot = key_hash & (slot_count - 1)
+            while table[2 * slot + 1] != 0:
+                slot = (slot + 1) & (slot_count - 1)
+            table[2 * slot] = key_hash
+            table[2 * slot + 1] = capability_records_start + len(body)
+            body.extend(line)
+
+        for capability_name, tool_ids in forward.items():
+            place(capability_table, capability_slots, capability_name, json.dumps([capability_name, tool_ids]).encode() + b"\n")
+        tool_records_start = capability_records_start + len(body)
+        for record in records:
+            place(tool_table, tool_slots, record["id"], json.dumps(record).encode() + b"\n")
+        keyword_records_start = capability_records_start + len(body)
+        for capability_name, words in keywords.items():
+            place(keyword_table, keyword_slots, capability_name, json.dumps([capability_name, words]).encode() + b"\n")
+
+        header = json.dumps({
+            "format": SEGMENT_FORMAT,
+            "generation": generation,
+            "tool_count": len(records),
+            "capability_count": len(forward),
+            "capability_table": [capability_table_start, tool_table_start],
+            "tool_table": [tool_table_start, keyword_table_start],
+            "keyword_table": [keyword_table_start, capability_records_start],
+            "capability_records": [capability_records_start, tool_records_start],
+            "tool_records": [tool_records_start, keyword_records_start],
+            "keyword_records": [keyword_records_start, capability_records_start + len(body)],
+        }).encode()
+        if len(header) >= HEADER_SIZE:
+            raise ValueError("Registry segment header does not fit")
+
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as output:
+            output.write(header.ljust(HEADER_SIZE - 1) + b"\n")
+            output.write(capability_table.tobytes())
+            output.write(tool_table.tobytes())
+            output.write(keyword_table.tobytes())
+            output.write(body)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temporary_path, path)
+
+class StoredKeywords(Mapping):
+    """
+    The keyword lists a store held when it was loaded, per capability. A
+    capability's list is read from the snapshot on first access rather than
+    all at once, so loading costs the same for any number of keywords. Lists
+    are the caller's to extend, and setdefault() adds new ones; neither is
+    written back to the store.
+    """
+
+    def __init__(self, segment: Optional[RegistrySegment], pending: Dict[str, List[str]]):
+        self._segment = segment
+        self._pending = pending
+        self._lists: Dict[str, List[str]] = {}
+        # Set once every persisted list has been read into `_lists`
+        self._complete = False
+
+    def __getitem__(self, capability_name: str) -> List[str]:
+        keywords = self._lists.get(capability_name)
+        if keywords is None:
+            keywords = self._segment.keywords_for(capability_name) if self._segment is not None else None
+            pending = self._pending.get(capability_name)
+            if pending:
+                keywords = keywords if keywords is not None else []
+                keywords.extend(keyword for keyword in pending if keyword not in keywords)
+            if keywords is None:
+                raise KeyError(capability_name)
+            # Another thread may have read it meanwhile; every caller must get the same list
+            keywords = self._lists.setdefault(capability_name, keywords)
+        return keywords
+
+    def __iter__(self) -> Iterator[str]:
+        if self._complete:
+            return iter(list(self._lists))
+        names = dict.fromkeys(self._segment.keyword_capabilities()) if self._segment is not None else {}
+        names.update(dict.fromkeys(self._pending))
+        names.update(dict.fromkeys(list(self._lists)))
+        return iter(names)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def items(self) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Yields every capability and its list, parsing the snapshot's records
+        in chunks as they are reached. Capabilities added while this is
+        suspended may be skipped.
+        """
+        if self._complete:
+            yield from list(self._lists.items())
+            return
+        # One pass over the snapshot's keyword records, rather than a table lookup per capability
+        others = dict.fromkeys([*self._pending, *list(self._lists)])
+        for capability_name, keywords in self._segment.iter_keywords() if self._segment is not None else ():
+            others.pop(capability_name, None)
+            yield capability_name, self._merged(capability_name, keywords)
+        for capability_name in others:
+            yield capability_name, self._merged(capability_name, [])
+        self._complete = True
+
+    def _merged(self, capability_name: str, keywords: List[str]) -> List[str]:
+        # The capability's list, or `keywords` read from the snapshot with its pending ones added
+        merged = self._lists.get(capability_name)
+        if merged is None:
+            pending = self._pending.get(capability_name)
+            if pending:
+                keywords.extend(keyword for keyword in pending if keyword not in keywords)
+            merged = self._lists.setdefault(capability_name, keywords)
+        return merged
+
+    def setdefault(self, capability_name: str, default: List[str]) -> List[str]:
+        try:
+            return self[capability_name]
+        except KeyError:
+            return self._lists.setdefault(capability_name, default)
+
+class RegistryStore:
+    """
+    Persists the capability registry under a data directory, so integrated
+    tools survive restarts, and shares it between the worker processes that
+    open the same directory.
+
+    Changes are appended to `registry.log` as JSON lines (one write per record,
+    without fsync: they survive a process crash, not a power loss), tagged with
+    the `source` of the store that wrote them. Every store reads the log in
+    order: `poll()` applies what other processes appended since the last call
+    and hands it to the listeners, such as CapabilityRegistry. With a
+    RegistryNotifier, peers are woken to poll as soon as a record is appended,
+    so nothing polls on a timer.
+
+    Once the log holds `compact_after` records it is folded into
+    `registry.snapshot`, a RegistrySegment, in a background thread. The log is
+    numbered by generation: compaction renames it to `registry.log.<generation>`
+    and starts the next one. An archived log is kept until the following
+    compaction, so stores that have not read it yet can catch up. Replaying is
+    idempotent, so a crash at any point of compaction loses nothing.
+
+    Processes coordinate with flock() on `registry.lock`: appending and reading
+    take it shared, rotating the log takes it exclusive, and `compaction.lock`
+    lets one process compact at a time.
+
+    The record_* methods only queue the change: a writer thread appends it, so
+    callers on an event loop never wait for a flock or a write. `flush()`
+    tells when queued changes are in the log. Event-loop callers read the log
+    with read_changes() in a thread and hand the result to deliver().
+
+    `load()` maps the snapshot and replays only the logs, so cold start cost is
+    independent of how many tools the snapshot holds. `close()` compacts only
+    a log of `compact_on_close_after` records or more: below that, replaying
+    it on the next start is cheaper than rewriting the snapshot.
+    """
+
+    SNAPSHOT_FILE = "registry.snapshot"
+    LOG_FILE = "registry.log"
+    LOCK_FILE = "registry.lock"
+    COMPACTION_LOCK_FILE = "compaction.lock"
+    _ARCHIVE_PATTERN = re.compile(r"registry\.log\.(\d+)$")
+
+    def __init__(self, directory: str, compact_after: int = 10_000, compact_on_close_after: int = 250):
+        self.directory = directory
+        self.compact_after = compact_after
+        self.compact_on_close_after = compact_on_close_after
+        self.segment: Optional[RegistrySegment] = None
+        # Tags this store's records, so it does not hand its own changes to listeners
+        self.source = f"{os.getpid()}-{secrets.token_hex(4)}"
+        # Wakes other processes after each append; set by the owner once started
+        self.notifier: Optional["RegistryNotifier"] = None
+        self._lock = threading.Lock()
+        # Appends queued changes in order
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="registry-writer")
+        self._compaction: Optional[threading.Thread] = None
+        self._lock_fd: Optional[int] = None
+        self._log_fd: Optional[int] = None
+        self._read_fd: Optional[int] = None
+        # Bytes after the last complete line read
+        self._read_buffer = b""
+        # Generation of the log being read
+        self._generation = 0
+        # Records in the log being read
+        self._log_records = 0
+        # Changes not yet in the snapshot: tool ID -> record, or None if removed
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        # Keywords not yet in the snapshot, per capability
+        self._pending_keywords: Dict[str, List[str]] = {}
+        # Keywords held when loaded, for the `keywords` property
+        self._loaded_keywords: Dict[str, List[str]] = {}
+        # Records from other processes not yet handed to the listeners
+        self._unreported: List[Dict[str, Any]] = []
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.compactions = 0
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    def _archive_path(self, generation: int) -> str:
+        return self._path(f"{self.LOG_FILE}.{generation}")
+
+    def _archived_generations(self) -> List[int]:
+        generations = []
+        for file_name in os.listdir(self.directory):
+            match = self._ARCHIVE_PATTERN.match(file_name)
+            if match:
+                generations.append(int(match.group(1)))
+        return sorted(generations)
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """
+        Registers a callback receiving each log record written by another
+        process, as `{"op": "tool" | "remove" | "keywords", ...}`. Listeners
+        are called by poll() or deliver(), on the caller's thread.
+        """
+        self._listeners.append(listener)
+
+    def load(self) -> CapabilityIndex:
+        """
+        Opens the store and returns a capability index holding every persisted
+        tool. Must be called once, before any changes are recorded.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_fd = os.open(self._path(self.LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        with self._lock, file_lock(self._lock_fd, exclusive=True):
+            if os.path.exists(self._path(self.SNAPSHOT_FILE)):
+                self.segment = RegistrySegment(self._path(self.SNAPSHOT_FILE))
+            self._generation = self.segment.generation if self.segment is not None else 0
+            # Logs archived by a compaction that did not finish are replayed first
+            archived = [generation for generation in self._archived_generations() if generation > self._generation]
+            if not os.path.exists(self._path(self.LOG_FILE)):
+                self._create_log(max([self._generation, *archived]) + 1)
+            first_log = self._archive_path(archived[0]) if archived else self._path(self.LOG_FILE)
+            self._read_fd = os.open(first_log, os.O_RDONLY)
+            self._read_log()
+            # Everything read so far is in the index built below
+            self._unreported.clear()
+            self._loaded_keywords = {capability_name: list(words) for capability_name, words in self._pending_keywords.items()}
+            self._log_fd = os.open(self._path(self.LOG_FILE), os.O_WRONLY | os.O_APPEND)
+
+        index = CapabilityIndex(base=self.segment)
+        index.register_many(tool_from_record(record) for record in self._pending.values() if record is not None)
+        for tool_id, record in self._pending.items():
+            if record is None:
+                index.deregister_tool(tool_id)
+        logger.info(
+            "registry_loaded",
+            snapshot_tools=self.segment.tool_count if self.segment is not None else 0,
+            log_records=self._log_records,
+            generation=self._generation
+        )
+        return index
+
+    def _create_log(self, generation: int):
+        # Written aside and renamed, so readers never see a log without its header
+        temporary_path = self._path(f"{self.LOG_FILE}.tmp")
+        with open(temporary_path, "wb") as output:
+            output.write(json.dumps({"op": "log", "generation": generation}).encode() + b"\n")
+        os.replace(temporary_path, self._path(self.LOG_FILE))
+
+    def _read_log(self):
+        """
+        Applies every complete record appended since the last read, following
+        rotations into the next generation. Requires `_lock` and a flock.
+        """
+        while True:
+            while True:
+                chunk = os.read(self._read_fd, 1 << 16)
+                if not chunk:
+                    break
+                *lines, self._read_buffer = (self._read_buffer + chunk).split(b"\n")
+                for line in lines:
+                    self._read_record(line)
+            if os.fstat(self._read_fd).st_ino == os.stat(self._path(self.LOG_FILE)).st_ino:
+                return
+            # The file was rotated and is complete: continue with the next generation,
+            # archived if it was rotated too
+            os.close(self._read_fd)
+            next_log = self._archive_path(self._generation + 1)
+            if not os.path.exists(next_log):
+                next_log = self._path(self.LOG_FILE)
+            self._read_fd = os.open(next_log, os.O_RDONLY)
+            self._read_buffer = b""
+            self._log_records = 0
+
+    def _read_record(self, line: bytes):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # A torn final line from a crash mid-append
+            logger.warning("registry_log_record_skipped", generation=self._generation)
+            return
+        if entry["op"] == "log":
+            if entry["generation"] != self._generation + 1:
+                # Its archive was deleted before this store read it; restart to resync
+                logger.warning("registry_log_generation_skipped", expected=self._generation + 1, found=entry["generation"])
+            self._generation = entry["generation"]
+            return
+        self._apply(entry)
+        self._log_records += 1
+        if entry.get("source") != self.source:
+            self._unreported.append(entry)
+
+    def _apply(self, entry: Dict[str, Any]):
+        if entry["op"] == "tool":
+            self._pending[entry["tool"]["id"]] = entry["tool"]
+        elif entry["op"] == "remove":
+            self._pending[entry["id"]] = None
+        elif entry["op"] == "keywords":
+            existing = self._pending_keywords.setdefault(entry["capability"], [])
+            existing.extend(keyword for keyword in entry["keywords"] if keyword not in existing)
+
+    def _is_current(self, entry: Dict[str, Any]) -> bool:
+        # False if a later record, possibly from this process, superseded it
+        if entry["op"] == "tool":
+            return self._current_record(entry["tool"]["id"]) == entry["tool"]
+        if entry["op"] == "remove":
+            return self._current_record(entry["id"]) is None
+        return True
+
+    def poll(self) -> int:
+        """
+        Reads the records other processes appended since the last call and
+        hands those still current to the listeners. Returns how many were
+        handed over.
+        """
+        return self.deliver(self.read_changes())
+
+    def read_changes(self) -> List[Dict[str, Any]]:
+        """
+        The reading half of poll(): returns the records other processes
+        appended since the last call that are still current. Blocks on file
+        I/O and the flock, so event-loop callers run it in a thread.
+        """
+        with self._lock:
+            if self._read_fd is None:
+                return []
+            with file_lock(self._lock_fd, exclusive=False):
+                self._read_log()
+            entries = [entry for entry in self._unreported if self._is_current(entry)]
+            self._unreported.clear()
+        return entries
+
+    def deliver(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        The other half of poll(): hands records from read_changes() to the
+        listeners, on the caller's thread. Returns how many were handed over.
+        """
+        for entry in entries:
+            for listener in self._listeners:
+                listener(entry)
+        return len(entries)
+
+    @property
+    def keywords(self) -> StoredKeywords:
+        """
+        The persisted keyword lists as of load(), per capability, as a mapping
+        the caller owns. Lists are read on first access.
+        """
+        return StoredKeywords(self.segment, self._loaded_keywords)
+
+    def _merged_keywords(self, segment: Optional[RegistrySegment]) -> Dict[str, List[str]]:
+        keywords = segment.read_keywords() if segment is not None else {}
+        for capability_name, words in self._pending_keywords.items():
+            existing = keywords.setdefault(capability_name, [])
+            existing.extend(keyword for keyword in words if keyword not in existing)
+        return keywords
+
+    def _current_record(self, tool_id: str) -> Optional[Dict[str, Any]]:
+        if tool_id in self._pending:
+            return self._pending[tool_id]
+        return self.segment.tool_record(tool_id) if self.segment is not None else None
+
+    def _append(self, entry: Dict[str, Any]):
+        if self._log_fd is None:
+            raise RuntimeError("RegistryStore.load() must be called before recording changes")
+        entry["source"] = self.source
+        with file_lock(self._lock_fd, exclusive=False):
+            if os.fstat(self._log_fd).st_ino != os.stat(self._path(self.LOG_FILE)).st_ino:
+                # Another process rotated the log
+                os.close(self._log_fd)
+                self._log_fd = os.open(self._path(self.LOG_FILE), os.O_WRONLY | os.O_APPEND)
+            os.write(self._log_fd, json.dumps(entry).encode() + b"\n")
+            # Reading up to our own record applies every change in log order
+            self._read_log()
+        if self.notifier is not None:
+            # Records of other processes read here reach the listeners on our own wake-up
+            self.notifier.notify(include_self=bool(self._unreported))
+        if self._log_records >= self.compact_after:
+            self.compact_in_background()
+
+    def _queue(self, write: Callable[..., None], *args: Any):
+        if self._log_fd is None:
+            raise RuntimeError("RegistryStore.load() must be called before recording changes")
+        self._writer.submit(write, *args).add_done_callback(self._log_write_failure)
+
+    @staticmethod
+    def _log_write_failure(future: Future):
+        error = future.exception()
+        if error is not None:
+            logger.error("registry_write_failed", error=str(error))
+
+    def flush(self) -> Future:
+        """
+        Returns a future done once every change queued so far is in the log,
+        e.g. before telling other processes about it. Await it with
+        asyncio.wrap_future() on an event loop.
+        """
+        return self._writer.submit(lambda: None)
+
+    def record_tool(self, tool: MCPTool):
+        self._queue(self._write_tool, tool_record(tool))
+
+    def _write_tool(self, record: Dict[str, Any]):
+        with self._lock:
+            if self._current_record(record["id"]) != record:
+                self._append({"op": "tool", "tool": record})
+
+    def record_removal(self, tool_id: str):
+        self._queue(self._write_removal, tool_id)
+
+    def _write_removal(self, tool_id: str):
+        with self._lock:
+            if self._current_record(tool_id) is not None:
+                self._append({"op": "remove", "id": tool_id})
+
+    def record_keywords(self, capability_name: str, keywords: List[str]):
+        """
+        Persists keywords the caller knows are new, i.e. not in `keywords` as
+        loaded plus those recorded since.
+        """
+        self._queue(self._write_keywords, {"op": "keywords", "capability": capability_name, "keywords": list(keywords)})
+
+    def _write_keywords(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._append(entry)
+
+    def compact_in_background(self):
+        if self._compaction is None or not self._compaction.is_alive():
+            self._compaction = threading.Thread(target=self.compact, name="registry-compaction", daemon=True)
+            self._compaction.start()
+
+    def compact(self):
+        """
+        Folds the log into a new snapshot. Changes recorded meanwhile go to the
+        next log generation and are kept. Returns at once if another process
+        is compacting.
+        """
+        compaction_fd = os.open(self._path(self.COMPACTION_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if try_exclusive_lock(compaction_fd):
+                self._compact()
+        finally:
+            # Closing the file releases the lock
+            os.close(compaction_fd)
+
+    def _compact(self):
+        with self._lock:
+            if self._log_fd is None:
+                return
+            with file_lock(self._lock_fd, exclusive=True):
+                self._read_log()
+                if not self._log_records:
+                    return
+                generation = self._generation
+                # Archive the log; it is replayed on load until the snapshot covers it
+                os.replace(self._path(self.LOG_FILE), self._archive_path(generation))
+                self._create_log(generation + 1)
+                os.close(self._log_fd)
+                self._log_fd = os.open(self._path(self.LOG_FILE), os.O_WRONLY | os.O_APPEND)
+                # Moves the reader onto the new log
+                self._read_log()
+            pending = dict(self._pending)
+            pending_keywords = {capability_name: list(words) for capability_name, words in self._pending_keywords.items()}
+            segment = self.segment
+            keywords = self._merged_keywords(segment)
+            unreported = bool(self._unreported)
+        if unreported and self.notifier is not None:
+            # Records of other processes read here reach the listeners on our own wake-up
+            self.notifier.notify(include_self=True)
+
+        records: List[Dict[str, Any]] = []
+        if segment is not None:
+            records.extend(record for record in segment.tool_records() if record["id"] not in pending)
+        records.extend(record for record in pending.values() if record is not None)
+        RegistrySegment.write(self._path(self.SNAPSHOT_FILE), records, keywords, generation=generation)
+        new_segment = RegistrySegment(self._path(self.SNAPSHOT_FILE))
+        # Keep the archive just folded for stores that have not read it yet
+        for archived in self._archived_generations():
+            if archived < generation:
+                try:
+                    os.remove(self._archive_path(archived))
+                except FileNotFoundError:
+                    pass
+
+        with self._lock:
+            # Keep only what changed after the rotation
+            for tool_id, record in pending.items():
+                if self._pending.get(tool_id, record) is record:
+                    self._pending.pop(tool_id, None)
+            for capability_name, words in pending_keywords.items():
+                remaining = self._pending_keywords.get(capability_name, [])[len(words):]
+                if remaining:
+                    self._pending_keywords[capability_name] = remaining
+                else:
+                    self._pending_keywords.pop(capability_name, None)
+            # Indexes built on the old segment keep using it; its mapping stays valid
+            self.segment = new_segment
+            self.compactions += 1
+        logger.info("registry_compacted", tools=len(records), generation=generation)
+
+    def close(self, compact: bool = True):
+        """
+        Appends the queued changes, waits for a running compaction, compacts
+        the log if `compact` and it holds `compact_on_close_after` records or
+        more, and closes the log files.
+        """
+        self._writer.shutdown(wait=True)
+        if self._compaction is not None:
+            self._compaction.join()
+        if compact and self._log_fd is not None and self._log_records >= self.compact_on_close_after:
+            self.compact()
+        with self._lock:
+            for fd in (self._log_fd, self._read_fd, self._lock_fd):
+                if fd is not None:
+                    os.close(fd)
+            self._log_fd = self._read_fd = self._lock_fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "snapshot_tools": self.segment.tool_count if self.segment is not None else 0,
+            "log_records": self._log_records,
+            "log_generation": self._generation,
+            "pending_changes": len(self._pending),
+            "compactions": self.compactions,
+        }
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = RegistryStore(directory, compact_after=3, compact_on_close_after=1)
+        index = store.load()
+        # A second worker process sharing the directory, simulated in-process
+        peer = RegistryStore(directory)
+        peer_index = peer.load()
+        peer.add_listener(lambda entry: print(f"Peer received: {entry['op']} {entry.get('tool', entry).get('id')}"))
+
+        for i in range(4):
+            tool = MCPTool(id=f"tool_{i}", name=f"Tool {i}", capabilities=[f"capability_{i % 2}"], keywords=[f"kw{i}"])
+            index.register_tool(tool)
+            store.record_tool(tool)
+        index.deregister_tool("tool_0")
+        store.record_removal("tool_0")
+        store.record_keywords("capability_1", ["kw1", "kw3"])
+        store.close()
+        print(f"Store after first run: {store.stats()}")
+        # The peer catches up across the compaction's log rotation
+        print(f"Peer applied {peer.poll()} changes: {peer.stats()}")
+        peer.close(compact=False)
+
+        # A second process start: tools come back from the memory-mapped snapshot
+        reopened = RegistryStore(directory)
+        snapshot = reopened.load().snapshot()
+        print(f"capability_0 -> {list(snapshot.get_tools_for_capability('capability_0'))}")  # ['tool_2']
+        print(f"tool_3: {tool_record(snapshot.get_tool('tool_3'))}")
+        print(f"tool_0 registered? {snapshot.get_tool('tool_0') is not None}")  # False
+        print(f"capability_1 keywords: {reopened.keywords['capability_1']}")  # ['kw1', 'kw3'], read on access
+        reopened.close()
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from components.structured_logger import get_logger
+
+logger = get_logger("result_cache")
+
+class CacheEntry:
+    __slots__ = ("capability", "value", "size", "expires_at", "stale_until")
+
+    def __init__(self, capability: str, value: Dict[str, Any], size: int, expires_at: float, stale_until: float):
+        self.capability = capability
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+class ResultCache:
+    """
+    A bounded TTL + LRU cache for task results, keyed by capability and
+    canonicalized task arguments.
+
+    Each capability can have its own TTL. Once an entry expires it is still
+    served for `stale_while_revalidate` seconds while a single background
+    refresh recomputes it. The cache is bounded by entry count and by the
+    approximate JSON size of the cached results, evicting least recently used
+    entries first. Concurrent misses for the same key share one computation.
+
+    Keys ignore argument order. Whitespace and letter case are ignored only in
+    `free_text_fields`, such as the user's query: other strings, like code,
+    paths or text payloads, go into the key verbatim, so arguments differing
+    only in whitespace or case get separate entries.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: float = 60.0,
+        ttls: Optional[Dict[str, float]] = None,
+        stale_while_revalidate: float = 30.0,
+        free_text_fields: Iterable[str] = ("query",),
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # Per-capability TTLs in seconds; a TTL of 0 disables caching for that capability
+        self.ttls = dict(ttls or {})
+        self.stale_while_revalidate = stale_while_revalidate
+        self.free_text_fields = frozenset(free_text_fields)
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._keys_by_capability: Dict[str, Set[str]] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        # Background refreshes, referenced until done so they are not garbage collected
+        self._refreshes: Set[asyncio.Task] = set()
+        # Bumped by invalidate(): a computation started before an invalidation does not store its result
+        self._epoch = 0
+        self._capability_generations: Dict[str, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _normalize(self, value: Any, free_text: bool = False) -> Any:
+        if isinstance(value, str):
+            return " ".join(value.split()).casefold() if free_text else value
+        if isinstance(value, dict):
+            return {str(key): self._normalize(item, free_text or key in self.free_text_fields) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._normalize(item, free_text) for item in value]
+        return value
+
+    def make_key(self, capability: str, task_args: Dict[str, Any]) -> str:
+        """
+        Builds the cache key: argument order does not matter, nor whitespace
+        and letter case within free-text fields.
+        """
+        canonical_args = json.dumps(self._normalize(task_args), sort_keys=True, separators=(",", ":"), default=str)
+        return f"{capability}\x00{canonical_args}"
+
+    def version(self, capability: str) -> Tuple[int, int]:
+        """
+        Changes whenever entries of the capability are invalidated. Pass the
+        version read before computing a result to put(), so a result computed
+        from data an invalidation meant to drop is not cached.
+        """
+        return self._epoch, self._capability_generations.get(capability, 0)
+
+    def ttl_for(self, capability: str) -> float:
+        return self.ttls.get(capability, self.default_ttl)
+
+    async def get_or_compute(
+        self,
+        capability: str,
+        task_args: Dict[str, Any],
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Returns the cached result for the capability and arguments, computing
+        and caching it on a miss. Only results with status "success" are cached.
+        """
+        if self.ttl_for(capability) <= 0:
+            return await compute()
+
+        key = self.make_key(capability, task_args)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            if now < entry.expires_at:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return dict(entry.value)
+            if now < entry.stale_until:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    task = asyncio.ensure_future(self._refresh(key, capability, compute, self.version(capability)))
+                    self._refreshes.add(task)
+                    task.add_done_callback(self._refreshes.discard)
+                return dict(entry.value)
+            self._remove(key)
+
+        self.misses += 1
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._compute_and_store(key, capability, compute, self.version(capability)))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._forget_in_flight(key, done))
+        return dict(await asyncio.shield(future))
+
+    def get(self, capability: str, task_args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached result if it has not expired, else None. Stale
+        entries are not served: the caller computes a fresh result anyway.
+        """
+        if self.ttl_for(capability) <= 0:
+            return None
+        key = self.make_key(capability, task_args)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() < entry.expires_at:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return dict(entry.value)
+        self.misses += 1
+        return None
+
+    def put(self, capability: str, task_args: Dict[str, Any], result: Dict[str, Any], version: Optional[Tuple[int, int]] = None):
+        """
+        Caches a result the caller computed itself, e.g. by streaming it. Only
+        results with status "success" are cached, and none if the capability
+        was invalidated since `version`, read with version() before computing.
+        """
+        if self.ttl_for(capability) <= 0 or result.get("status") != "success":
+            return
+        if version is not None and version != self.version(capability):
+            return
+        self._store(self.make_key(capability, task_args), capability, result)
+
+    async def _compute_and_store(
+        self, key: str, capability: str, compute: Callable[[], Awaitable[Dict[str, Any]]], version: Tuple[int, int]
+    ) -> Dict[str, Any]:
+        result = await compute()
+        if result.get("status") == "success" and version == self.version(capability):
+            self._store(key, capability, result)
+        return result
+
+    def _forget_in_flight(self, key: str, future: asyncio.Future):
+        # An invalidation may already have replaced the computation
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    async def _refresh(self, key: str, capability: str, compute: Callable[[], Awaitable[Dict[str, Any]]], version: Tuple[int, int]):
+        try:
+            await self._compute_and_store(key, capability, compute, version)
+        except Exception as e:
+            # Keep serving the stale value until it runs out; the next request retries
+            logger.warning("cache_refresh_failed", capability=capability, error=str(e))
+        finally:
+            self._refreshing.discard(key)
+
+    def _store(self, key: str, capability: str, value: Dict[str, Any]):
+        size = len(key) + len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        ttl = self.ttl_for(capability)
+        now = time.monotonic()
+        self._entries[key] = CacheEntry(capability, value, size, now + ttl, now + ttl + self.stale_while_revalidate)
+        self._keys_by_capability.setdefault(capability, set()).add(key)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        keys = self._keys_by_capability.get(entry.capability)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_capability[entry.capability]
+
+    def invalidate(self, capability: Optional[str] = None, task_args: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Drops cached results: one entry if both capability and task_args are
+        given, every entry of a capability if only capability is given, or the
+        whole cache. Returns the number of entries removed.
+
+        Computations already running for the dropped entries finish for their
+        callers, but their results are not cached, and later callers start a
+        new one.
+        """
+        if capability is None:
+            self._epoch += 1
+            self._in_flight.clear()
+            removed = len(self._entries)
+            self._entries.clear()
+            self._keys_by_capability.clear()
+            self.bytes = 0
+            return removed
+        # Coarse for a single key: other running computations of the capability are not cached either
+        self._capability_generations[capability] = self._capability_generations.get(capability, 0) + 1
+        if task_args is not None:
+            key = self.make_key(capability, task_args)
+            self._in_flight.pop(key, None)
+            if key in self._entries:
+                self._remove(key)
+                return 1
+            return 0
+        prefix = f"{capability}\x00"
+        for key in [key for key in self._in_flight if key.startswith(prefix)]:
+            del self._in_flight[key]
+        keys = list(self._keys_by_capability.get(capability, ()))
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "entries_by_capability": {capability: len(keys) for capability, keys in self._keys_by_capability.items()},
+        }
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    calls = {"count": 0}
+
+    async def fetch_weather() -> Dict[str, Any]:
+        calls["count"] += 1
+        await asyncio.sleep(0.01)
+        return {"status": "success", "result": f"Sunny (fetch #{calls['count']})"}
+
+    async def main():
+        cache = ResultCache(max_entries=100, ttls={"weather_api": 0.05, "news_api": 0.01}, stale_while_revalidate=1.0)
+
+        # Whitespace and case in the free-text query do not create separate entries
+        print(await cache.get_or_compute("weather_api", {"query": "Weather in  Paris"}, fetch_weather))
+        print(await cache.get_or_compute("weather_api", {"query": "weather in paris"}, fetch_weather))
+
+        # After the TTL the stale value is served while one refresh runs in the background
+        await asyncio.sleep(0.06)
+        print(await cache.get_or_compute("weather_api", {"query": "weather in paris"}, fetch_weather))
+        await asyncio.sleep(0.02)
+        print(await cache.get_or_compute("weather_api", {"query": "weather in paris"}, fetch_weather))
+
+        print(f"Invalidated: {cache.invalidate('weather_api')}")
+
+        # Case still matters outside free-text fields: these are different files
+        async def read_file() -> Dict[str, Any]:
+            calls["count"] += 1
+            return {"status": "success", "result": f"contents #{calls['count']}"}
+
+        upper = await cache.get_or_compute("file_reader", {"path": "/data/README"}, read_file)
+        lower = await cache.get_or_compute("file_reader", {"path": "/data/readme"}, read_file)
+        print(f"Case-sensitive paths: {upper['result']} != {lower['result']}")
+
+        # A result computed across an invalidation is returned but not cached
+        computing = asyncio.ensure_future(cache.get_or_compute("weather_api", {"query": "weather in rome"}, fetch_weather))
+        await asyncio.sleep(0)
+        cache.invalidate("weather_api")
+        await computing
+        print(f"Cached after invalidation mid-compute? {cache.get('weather_api', {'query': 'weather in rome'}) is not None}")  # False
+        print(f"Stats: {cache.stats()}")
+
+    asyncio.run(main())
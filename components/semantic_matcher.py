@@ -0,0 +1,361 @@
+import asyncio
+import math
+import re
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from components.capability_registry import CapabilityRegistry
+from components.mcp_client import MCPTool
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# A whole word counts like two occurrences of a trigram, so shared words outweigh incidental trigrams
+WORD_COUNT = 2
+# Upper bound on the cells of one batched score matrix, so it stays cache-sized
+BATCH_SCORE_CELLS = 1 << 18
+# Tools or keyword lists read per slice of a build; an incremental build yields to the event loop between slices
+BUILD_SLICE = 500
+# Capabilities embedded per slice: each costs about as much as reading ten tools
+EMBED_SLICE = 50
+_NO_MATCHES: List[Tuple[str, float]] = []
+_NO_ROWS = np.zeros(0, dtype=np.int32)
+_NO_VALUES = np.zeros(0, dtype=np.float32)
+
+def text_features(text: str) -> Dict[str, int]:
+    """
+    The features of a text and their counts: each word, plus the character
+    trigrams of each word of three letters or more, padded with spaces, so that
+    "summarise" and "summarization" still share most features.
+    """
+    features: Dict[str, int] = {}
+    for token in _TOKEN.findall(text.lower()):
+        word = f"w:{token}"
+        features[word] = features.get(word, 0) + WORD_COUNT
+        if len(token) < 3:
+            continue
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            trigram = padded[i:i + 3]
+            features[trigram] = features.get(trigram, 0) + 1
+    return features
+
+class SemanticMatcher:
+    """
+    Fallback capability matching for queries that contain no registered
+    keyword. Each capability is embedded as a TF-IDF vector of the words and
+    character trigrams of its name, its keywords and the names of its tools,
+    with no model and no network access.
+
+    The vectors form a sparse matrix stored by feature (for each feature, the
+    rows containing it and their weights), so scoring a query against every
+    capability is one sparse matrix-vector product, computed with a single
+    np.bincount over the postings of the query's features. Its cost depends on
+    how many capabilities share the query's features, not on how many are
+    registered. Features shared by more than `max_postings` capabilities are
+    skipped when scoring: they are common n-grams that carry little signal and
+    cost the most. Top-k selection runs np.argpartition over the rows scoring
+    at least `min_score` only, since partitioning a mostly-zero score vector is
+    slow. `match_many` scores a batch with one bincount as well.
+
+    The matrix is updated incrementally from the registry's keyword and tool
+    listeners: a changed capability gets a new row and its old row is masked,
+    until masked rows outnumber live ones and the postings are rebuilt.
+
+    Embedding every capability reads every tool's name, so the matrix is
+    built on the first match, or earlier by awaiting build_async(), which
+    builds it in slices on the event loop. While that build runs, matching
+    finds nothing, so an analyzer falls back to keywords only; registry
+    changes arriving meanwhile are applied once it is done. Like the
+    registry, the matcher is used from the event loop's thread only.
+    """
+
+    def __init__(self, registry: CapabilityRegistry, top_k: int = 3, min_score: float = 0.29, max_postings: int = 2_000):
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_postings = max_postings
+        # feature -> (row numbers, row weights): the matrix, column by column
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Row number -> capability name, and whether the row is the capability's current one
+        self._row_capabilities: List[str] = []
+        self._row_alive = np.zeros(1024, dtype=bool)
+        self._live_rows: Dict[str, int] = {}
+        # The texts each capability is embedded from, kept to re-embed it on changes:
+        # its name and keywords, and the distinct names of its tools
+        self._texts: Dict[str, List[str]] = {}
+        self._tool_names: Dict[str, List[str]] = {}
+
+        self._registry = registry
+        self._built = False
+        # The build in progress, as a generator of slices shared by every caller driving it
+        self._build: Optional[Iterator[None]] = None
+        # Registry changes that arrived during a build, applied after it
+        self._changes: List[Tuple[Callable[..., None], Tuple[Any, ...]]] = []
+        registry.add_keyword_listener(self.add_keywords)
+        registry.add_tool_listener(self.add_tool)
+        registry.add_tool_removal_listener(self.remove_tool)
+
+    @property
+    def capability_count(self) -> int:
+        return len(self._live_rows)
+
+    @property
+    def ready(self) -> bool:
+        return self._built
+
+    def build(self):
+        """
+        Embeds every capability of the registry, or finishes a build in
+        progress, unless done already.
+        """
+        if self._built:
+            return
+        for _ in self._build_slices():
+            pass
+
+    async def build_async(self):
+        """
+        Like build(), but yields to the event loop after each slice of
+        BUILD_SLICE tools or keyword lists, or EMBED_SLICE capabilities.
+        Matching finds nothing until it is done.
+        """
+        if self._built:
+            return
+        for _ in self._build_slices():
+            await asyncio.sleep(0)
+
+    def _build_slices(self) -> Iterator[None]:
+        if self._build is None:
+            self._build = self._build_in_slices()
+        return self._build
+
+    def _build_in_slices(self) -> Iterator[None]:
+        try:
+            # Tool names come from the snapshot's records; materializing every tool would cost far more
+            for count, (tool_name, capabilities) in enumerate(self._registry.snapshot().tool_names(), 1):
+                for capability_name in capabilities:
+                    self._texts_for(capability_name)
+                    tool_names = self._tool_names.setdefault(capability_name, [])
+                    if tool_name not in tool_names:
+                        tool_names.append(tool_name)
+                if count % BUILD_SLICE == 0:
+                    yield
+            for count, (capability_name, keywords) in enumerate(self._registry.keyword_lists(), 1):
+                texts = self._texts_for(capability_name)
+                texts.extend(keyword for keyword in keywords if keyword not in texts)
+                if count % BUILD_SLICE == 0:
+                    yield
+            for count, capability_name in enumerate(list(self._texts), 1):
+                self._embed(capability_name)
+                if count % EMBED_SLICE == 0:
+                    yield
+        except BaseException:
+            # The next caller starts over; re-reading texts is harmless and re-embedding replaces rows
+            self._build = None
+            raise
+        for apply, args in self._changes:
+            apply(*args)
+        self._changes = []
+        self._built = True
+
+    def _ready(self) -> bool:
+        if not self._built:
+            if self._build is not None:
+                return False
+            self.build()
+        return True
+
+    def _apply_or_defer(self, apply: Callable[..., None], *args: Any):
+        # Before the build, changes are left to it: it reads the registry as it is then.
+        # During the build they are deferred, since it may have read past them
+        if self._built:
+            apply(*args)
+        elif self._build is not None:
+            self._changes.append((apply, args))
+
+    def _texts_for(self, capability_name: str) -> List[str]:
+        texts = self._texts.get(capability_name)
+        if texts is None:
+            # The name itself, with separators as spaces: "text_summarization" -> "text summarization"
+            texts = self._texts[capability_name] = [capability_name.replace("_", " ")]
+        return texts
+
+    def add_keywords(self, capability_name: str, keywords: Iterable[str]):
+        """
+        Re-embeds a capability with new keywords. Called by the registry.
+        """
+        self._apply_or_defer(self._add_keywords, capability_name, list(keywords))
+
+    def _add_keywords(self, capability_name: str, keywords: List[str]):
+        texts = self._texts_for(capability_name)
+        new_keywords = [keyword for keyword in keywords if keyword not in texts]
+        if new_keywords:
+            texts.extend(new_keywords)
+            self._embed(capability_name)
+
+    def add_tool(self, tool: MCPTool):
+        """
+        Re-embeds the capabilities of a registered tool with its name. Called by the registry.
+        """
+        self._apply_or_defer(self._add_tool, tool)
+
+    def _add_tool(self, tool: MCPTool):
+        for capability_name in tool.capabilities:
+            self._texts_for(capability_name)
+            tool_names = self._tool_names.setdefault(capability_name, [])
+            if tool.name not in tool_names:
+                tool_names.append(tool.name)
+                self._embed(capability_name)
+
+    def remove_tool(self, tool: MCPTool):
+        """
+        Re-embeds the capabilities of a removed tool without its name, unless
+        another of their tools has the same name. Called by the registry, also
+        with the previous version of a re-registered tool.
+        """
+        self._apply_or_defer(self._remove_tool, tool)
+
+    def _remove_tool(self, tool: MCPTool):
+        snapshot = self._registry.snapshot()
+        for capability_name in tool.capabilities:
+            tool_names = self._tool_names.get(capability_name)
+            if not tool_names or tool.name not in tool_names:
+                continue
+            if any(snapshot.get_tool(tool_id).name == tool.name for tool_id in snapshot.get_tools_for_capability(capability_name)):
+                continue
+            tool_names.remove(tool.name)
+            self._embed(capability_name)
+
+    def _embed(self, capability_name: str):
+        features: Dict[str, int] = {}
+        for text in (*self._texts[capability_name], *self._tool_names.get(capability_name, ())):
+            for feature, count in text_features(text).items():
+                features[feature] = features.get(feature, 0) + count
+        weights = {feature: 1.0 + math.log(count) for feature, count in features.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+
+        row = len(self._row_capabilities)
+        if row == len(self._row_alive):
+            self._row_alive = np.concatenate([self._row_alive, np.zeros(row, dtype=bool)])
+        old_row = self._live_rows.get(capability_name)
+        if old_row is not None:
+            self._row_alive[old_row] = False
+        self._row_capabilities.append(capability_name)
+        self._row_alive[row] = True
+        self._live_rows[capability_name] = row
+        for feature, weight in weights.items():
+            posting = self._postings.get(feature)
+            if posting is None:
+                posting = self._postings[feature] = (array("i"), array("f"))
+            posting[0].append(row)
+            posting[1].append(weight / norm)
+
+        dead_rows = len(self._row_capabilities) - len(self._live_rows)
+        if dead_rows > max(len(self._live_rows), 1024):
+            self._rebuild()
+
+    def _rebuild(self):
+        self._postings = {}
+        self._row_capabilities = []
+        self._row_alive = np.zeros(max(len(self._texts), 1024), dtype=bool)
+        self._live_rows = {}
+        for capability_name in self._texts:
+            self._embed(capability_name)
+
+    def _query_postings(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The query's column of the product: the rows sharing its features, and
+        the query's TF-IDF weights times the row weights. Rows appear once per
+        shared feature; bincount sums them.
+        """
+        row_count = len(self._row_capabilities)
+        postings: List[Tuple[array, array]] = []
+        weights: List[float] = []
+        norm = 0.0
+        for feature, count in text_features(query).items():
+            posting = self._postings.get(feature)
+            weight = 1.0 + math.log(count)
+            if posting is not None:
+                document_frequency = len(posting[0])
+                weight *= math.log((1 + row_count) / (1 + document_frequency)) + 1.0
+            # Features no capability has still count towards the norm, without an IDF
+            # boost: a query matching only a few incidental trigrams scores low, but
+            # filler words do not drown a real match
+            norm += weight * weight
+            if posting is not None and len(posting[0]) <= self.max_postings:
+                postings.append(posting)
+                weights.append(weight)
+        if not postings:
+            return _NO_ROWS, _NO_VALUES
+        rows = np.concatenate([np.frombuffer(posting[0], dtype=np.int32) for posting in postings])
+        values = np.concatenate([np.frombuffer(posting[1], dtype=np.float32) for posting in postings])
+        values *= np.repeat(np.array(weights, dtype=np.float32) / math.sqrt(norm), [len(posting[0]) for posting in postings])
+        return rows, values
+
+    def _top(self, scores: np.ndarray, top_k: int, min_score: float) -> List[Tuple[str, float]]:
+        candidates = np.flatnonzero(scores >= min_score)
+        candidates = candidates[self._row_alive[candidates]]
+        if not len(candidates):
+            return _NO_MATCHES
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(scores[candidates], -top_k)[-top_k:]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        names = self._row_capabilities
+        return [(names[row], float(scores[row])) for row in candidates]
+
+    def match(self, query: str, top_k: Optional[int] = None, min_score: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Returns up to `top_k` (capability, score) pairs scoring at least
+        `min_score`, best first. Scores are cosine-like, between 0 and 1.
+        Builds the matrix first if nobody has; returns nothing while an
+        incremental build runs.
+        """
+        if not self._ready():
+            return _NO_MATCHES
+        rows, values = self._query_postings(query)
+        if not len(rows):
+            return _NO_MATCHES
+        scores = np.bincount(rows, weights=values, minlength=len(self._row_capabilities))
+        return self._top(scores, top_k or self.top_k, self.min_score if min_score is None else min_score)
+
+    def match_many(self, queries: List[str], top_k: Optional[int] = None, min_score: Optional[float] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Matches a batch of queries. The postings of a chunk of queries are
+        offset into one (queries x rows) score matrix computed by a single
+        bincount; chunks are sized to keep that matrix cache-sized.
+        """
+        if not self._ready():
+            return [_NO_MATCHES for _ in queries]
+        top_k = top_k or self.top_k
+        min_score = self.min_score if min_score is None else min_score
+        row_count = len(self._row_capabilities)
+        chunk_size = max(BATCH_SCORE_CELLS // max(row_count, 1), 1)
+        results: List[List[Tuple[str, float]]] = []
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            all_rows: List[np.ndarray] = []
+            all_values: List[np.ndarray] = []
+            for position, query in enumerate(chunk):
+                rows, values = self._query_postings(query)
+                all_rows.append(rows + position * row_count)
+                all_values.append(values)
+            scores = np.bincount(
+                np.concatenate(all_rows), weights=np.concatenate(all_values), minlength=len(chunk) * row_count
+            ).reshape(len(chunk), row_count)
+            results.extend(self._top(query_scores, top_k, min_score) for query_scores in scores)
+        return results
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    registry = CapabilityRegistry()
+    registry.add_keywords("news_api", ["news", "headlines"])
+    registry.add_keywords("weather_api", ["weather", "forecast"])
+    registry.register_capability_from_tool(MCPTool(id="translator_001", name="Language Translation Tool", capabilities=["language_translation"]))
+
+    matcher = SemanticMatcher(registry)
+    print(matcher.match("translate this into french"))  # [('language_translation', ...)]
+    print(matcher.match("tell me a joke"))  # []
+
+    # Tools registered later are matched on the next query
+    registry.register_capability_from_tool(MCPTool(id="summarizer_001", name="Text Summarization Tool", capabilities=["text_summarization"]))
+    print(matcher.match_many(["please summarise this article", "will it rain tomorrow in the weather report"]))
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import socket
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+from components.registry_store import try_exclusive_lock
+from components.structured_logger import get_logger
+
+logger = get_logger("shared_registry")
+
+class RegistryNotifier:
+    """
+    Wakes the other processes sharing a RegistryStore directory as soon as this
+    one appends to the registry log, so they read the change within a
+    scheduling delay instead of on a polling interval.
+
+    Each process binds a unix datagram socket under `<directory>/peers/` and
+    watches it from the event loop. notify() sends an empty datagram to every
+    other socket there; sockets left by a dead process are removed by whoever
+    notices first. Datagrams carry no data: the log is the source of truth, so
+    a coalesced notification still leads to a complete read.
+    """
+
+    PEERS_DIRECTORY = "peers"
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(directory, self.PEERS_DIRECTORY)
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{secrets.token_hex(4)}.sock")
+        self._socket: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._callbacks: List[Callable[[], None]] = []
+        self.sent = 0
+        self.received = 0
+
+    def add_callback(self, callback: Callable[[], None]):
+        """
+        Registers a function the event loop calls after notifications arrive.
+        """
+        self._callbacks.append(callback)
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        os.makedirs(self.directory, exist_ok=True)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.bind(self.path)
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop.add_reader(self._socket.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        # Drain every queued datagram: one read of the log covers them all
+        while True:
+            try:
+                self._socket.recv(1)
+            except BlockingIOError:
+                break
+            self.received += 1
+        for callback in self._callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error("registry_notification_failed", error=str(e))
+
+    def notify(self, include_self: bool = False):
+        """
+        Wakes every peer, and this process too if `include_self`. Safe to call
+        from any thread.
+        """
+        if self._socket is None:
+            return
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            if not file_name.endswith(".sock") or (path == self.path and not include_self):
+                continue
+            try:
+                self._socket.sendto(b"", path)
+            except BlockingIOError:
+                # The peer's queue is full, so it has a wake-up pending already
+                continue
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody is bound to it any more: the process exited without cleaning up
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            self.sent += 1
+
+    def close(self):
+        if self._socket is None:
+            return
+        self._loop.remove_reader(self._socket.fileno())
+        self._socket.close()
+        self._socket = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        peers = sum(1 for name in os.listdir(self.directory) if name.endswith(".sock") and os.path.join(self.directory, name) != self.path)
+        return {"peers": peers, "sent": self.sent, "received": self.received}
+
+class DiscoveryClaim:
+    """
+    Ownership of one capability's discovery, held until the `claim()` block
+    exits. The lock file doubles as a shared "nothing found" cache entry.
+    """
+
+    def __init__(self, fd: int):
+        self._fd = fd
+
+    def miss_remaining(self) -> float:
+        """
+        Seconds left before a fruitless discovery, by any process, may be
+        retried; 0 if there is none.
+        """
+        content = os.pread(self._fd, 256, 0)
+        if not content:
+            return 0.0
+        return max(json.loads(content)["miss_until"] - time.time(), 0.0)
+
+    def record_miss(self, ttl: float):
+        # Wall-clock time, since monotonic clocks are not comparable across processes
+        os.ftruncate(self._fd, 0)
+        os.pwrite(self._fd, json.dumps({"miss_until": time.time() + ttl}).encode(), 0)
+
+class DiscoveryOwnership:
+    """
+    Makes one process at a time the owner of a capability's discovery, with a
+    flock() on `<directory>/locks/<capability hash>.lock`. The operating system
+    releases the lock if the owner dies, so a crash never blocks discovery.
+
+    Waiters retry when a notification arrives (owners notify peers on release)
+    and every `retry_interval` seconds, in case the owner died.
+    """
+
+    LOCKS_DIRECTORY = "locks"
+
+    def __init__(self, directory: str, notifier: Optional[RegistryNotifier] = None, retry_interval: float = 0.05):
+        self.directory = os.path.join(directory, self.LOCKS_DIRECTORY)
+        os.makedirs(self.directory, exist_ok=True)
+        self.notifier = notifier
+        self.retry_interval = retry_interval
+        self._waiters: Set[asyncio.Event] = set()
+        if notifier is not None:
+            notifier.add_callback(self._wake_waiters)
+        self.claims = 0
+        self.contended = 0
+
+    def _path(self, capability_name: str) -> str:
+        # Capability names are free-form; hash them into safe file names
+        return os.path.join(self.directory, f"{hashlib.sha1(capability_name.encode()).hexdigest()[:20]}.lock")
+
+    def _wake_waiters(self):
+        for event in self._waiters:
+            event.set()
+
+    async def _wait_for_release(self):
+        event = asyncio.Event()
+        self._waiters.add(event)
+        try:
+            await asyncio.wait_for(event.wait(), self.retry_interval)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(event)
+
+    @asynccontextmanager
+    async def claim(self, capability_name: str) -> AsyncIterator[DiscoveryClaim]:
+        """
+        Waits until this process owns the capability's discovery. Each process
+        must hold at most one claim per capability (DiscoveryCoordinator's
+        single-flight guarantees it).
+        """
+        fd = os.open(self._path(capability_name), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if not try_exclusive_lock(fd):
+                self.contended += 1
+                while not try_exclusive_lock(fd):
+                    await self._wait_for_release()
+            self.claims += 1
+            yield DiscoveryClaim(fd)
+        finally:
+            # Closing the file releases the lock
+            os.close(fd)
+            if self.notifier is not None:
+                self.notifier.notify()
+
+    def stats(self) -> Dict[str, int]:
+        return {"claims": self.claims, "contended": self.contended, "waiting": len(self._waiters)}
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    import multiprocessing
+    import tempfile
+
+    from components.capability_registry import CapabilityRegistry
+    from components.mcp_client import MCPTool
+    from components.registry_store import RegistryStore
+
+    def integrating_worker(directory: str, ready, go):
+        async def run():
+            store = RegistryStore(directory)
+            registry = CapabilityRegistry(store.load(), store=store)
+            notifier = RegistryNotifier(directory)
+            notifier.start()
+            store.notifier = notifier
+            ready.set()
+            await asyncio.to_thread(go.wait)
+            registry.register_capability_from_tool(MCPTool(id="summarizer_001", name="Summarizer", capabilities=["text_summarization"]))
+            # Closing the store appends the queued change and wakes the peer
+            store.close(compact=False)
+            notifier.close()
+        asyncio.run(run())
+
+    async def main(directory: str):
+        store = RegistryStore(directory)
+        registry = CapabilityRegistry(store.load(), store=store)
+        notifier = RegistryNotifier(directory)
+        notifier.add_callback(store.poll)
+        notifier.start()
+        store.notifier = notifier
+        visible = asyncio.Event()
+        store.add_listener(lambda entry: visible.set())
+
+        ready, go = multiprocessing.Event(), multiprocessing.Event()
+        worker = multiprocessing.Process(target=integrating_worker, args=(directory, ready, go))
+        worker.start()
+        await asyncio.to_thread(ready.wait)
+        start = time.perf_counter()
+        go.set()
+        await visible.wait()
+        print(f"Tool integrated by process {worker.pid} visible after {(time.perf_counter() - start) * 1000:.2f} ms")
+        print(f"Can handle text_summarization? {registry.can_handle('text_summarization')}")  # True
+        await asyncio.to_thread(worker.join)
+        store.close(compact=False)
+        notifier.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(main(directory))
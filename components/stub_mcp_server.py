@@ -0,0 +1,80 @@
+"""
+A minimal MCP server speaking newline-delimited JSON-RPC 2.0 over stdio.
+
+Used to exercise MCPSessionPool offline. Every tool name is accepted by
+tools/call and answered with an echo of its arguments. Requests are served
+concurrently, so several calls can be multiplexed over one session.
+
+Run with:
+    python -m components.stub_mcp_server [--startup-delay S] [--call-delay S]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict
+
+PROTOCOL_VERSION = "2024-11-05"
+
+class StubMCPServer:
+    def __init__(self, call_delay: float = 0.0):
+        self.call_delay = call_delay
+        self.calls = 0
+        self._write_lock = asyncio.Lock()
+
+    async def handle(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if method == "initialize":
+            return {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "neuroforge-stub", "version": "0.1.0"},
+            }
+        if method == "ping":
+            return {}
+        if method == "tools/list":
+            return {"tools": [{"name": "echo", "description": "Echoes its arguments", "inputSchema": {"type": "object"}}]}
+        if method == "tools/call":
+            self.calls += 1
+            await asyncio.sleep(self.call_delay)
+            text = json.dumps({"tool": params.get("name"), "arguments": params.get("arguments", {}), "call": self.calls})
+            return {"content": [{"type": "text", "text": text}], "isError": False}
+        raise LookupError(f"Method not found: {method}")
+
+    async def respond(self, message: Dict[str, Any]):
+        try:
+            result = await self.handle(message["method"], message.get("params") or {})
+            response = {"jsonrpc": "2.0", "id": message["id"], "result": result}
+        except LookupError as e:
+            response = {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": str(e)}}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32603, "message": str(e)}}
+        async with self._write_lock:
+            sys.stdout.write(json.dumps(response) + "\n")
+            sys.stdout.flush()
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        pending = set()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break # stdin closed: the client went away
+            message = json.loads(line)
+            if "id" not in message:
+                continue # Notifications need no response
+            task = asyncio.ensure_future(self.respond(message))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="Seconds to sleep before serving, simulating server boot cost")
+    parser.add_argument("--call-delay", type=float, default=0.0, help="Seconds each tools/call takes")
+    args = parser.parse_args()
+
+    if args.startup_delay:
+        import time
+        time.sleep(args.startup_delay)
+    asyncio.run(StubMCPServer(call_delay=args.call_delay).serve())
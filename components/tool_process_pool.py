@@ -0,0 +1,767 @@
+import asyncio
+import functools
+import importlib.util
+import inspect
+import itertools
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+from collections import deque
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from components.mcp_client import MCPTool, combine_chunks
+from components.structured_logger import get_logger
+
+logger = get_logger("tool_process_pool")
+
+TOOLS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools")
+
+class ToolProcessError(Exception):
+    pass
+
+def tool_files(directory: str) -> Dict[str, int]:
+    """
+    The tool modules in a directory and their modification times: every .py
+    file not starting with "_" or ".".
+    """
+    files = {}
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return files
+    for entry in entries:
+        if entry.name.endswith(".py") and not entry.name.startswith(("_", ".")):
+            try:
+                files[entry.path] = entry.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+    return files
+
+# --- Worker processes ---
+# A worker imports every tool module once, reports the tools it found, then
+# runs one call at a time: ("call", tool_id, arguments, arena name, shared
+# arguments, stream) in, (status, result or error, resident memory) out. A
+# streamed call sends ("chunk", data) messages first, at most as many as the
+# pool granted with ("credit", n) messages, and stops early on ("cancel",).
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # Without /proc, the peak is the best available figure: KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def _load_tools(directory: str) -> Tuple[Dict[str, Callable[..., Any]], List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Imports every tool module. A module declares its tool in a TOOL dict (id,
+    name, capabilities, keywords; id and name default to the file name) and
+    runs it with a synchronous run(**task_args) function, or a generator
+    function yielding the result in chunks.
+
+    Returns the run functions by tool ID, the declarations, and an error per
+    file that could not be loaded.
+    """
+    runners: Dict[str, Callable[..., Any]] = {}
+    declarations: List[Dict[str, Any]] = []
+    errors: Dict[str, str] = {}
+    for path in sorted(tool_files(directory)):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        try:
+            spec = importlib.util.spec_from_file_location(f"tools.{stem}", path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[spec.name] = module
+            spec.loader.exec_module(module)
+            declaration = {
+                "id": module.TOOL.get("id", stem),
+                "name": module.TOOL.get("name", stem),
+                "capabilities": list(module.TOOL["capabilities"]),
+                "keywords": list(module.TOOL.get("keywords", [])),
+                "streaming": inspect.isgeneratorfunction(module.run),
+            }
+            run = module.run
+        except Exception as e:
+            errors[path] = f"{type(e).__name__}: {e}"
+            continue
+        runners[declaration["id"]] = run
+        declarations.append(declaration)
+    return runners, declarations, errors
+
+def _attach(arena: Optional[SharedMemory], name: str) -> SharedMemory:
+    if arena is not None:
+        try:
+            arena.close()
+        except BufferError:
+            # A tool kept a view of an argument; the mapping goes when the view does
+            pass
+    return SharedMemory(name=name)
+
+def _send_chunks(connection: Connection, chunks: Iterator[Any], credits: int) -> Tuple[str, Any]:
+    """
+    Sends a generator's chunks while the pool has granted credit for them,
+    and closes it if the pool cancels the call or shuts the worker down.
+    """
+    for chunk in chunks:
+        connection.send(("chunk", chunk))
+        credits -= 1
+        # Wait for credit when out of it; otherwise only look for a cancellation
+        while credits == 0 or connection.poll():
+            message = connection.recv()
+            if message is None or message[0] == "cancel":
+                chunks.close()
+                return ("exit" if message is None else "cancelled"), None
+            if message[0] == "credit":
+                credits += message[1]
+    return "ok", None
+
+def _worker_main(connection: Connection, directory: str):
+    # Shutdown is the pool's job: Ctrl-C in the server's terminal must not interrupt a call
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    runners, declarations, errors = _load_tools(directory)
+    connection.send(("ready", declarations, errors, _rss_bytes()))
+    arena: Optional[SharedMemory] = None
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        if message[0] != "call":
+            # Credit or a cancellation that arrived after its call had finished
+            continue
+        _, tool_id, task_args, arena_name, shared, credits = message
+        views = []
+        try:
+            if shared:
+                if arena is None or arena.name != arena_name:
+                    arena = _attach(arena, arena_name)
+                for key, (offset, length, is_text) in shared.items():
+                    view = arena.buf[offset:offset + length]
+                    if is_text:
+                        task_args[key] = str(view, "utf-8")
+                        view.release()
+                    else:
+                        # Bytes arguments are read in place, without a copy
+                        task_args[key] = view
+                        views.append(view)
+            result = runners[tool_id](**task_args)
+            if inspect.isgenerator(result):
+                # Streamed if the pool asked for it, else collected into one result
+                reply = _send_chunks(connection, result, credits) if credits else ("ok", combine_chunks(list(result)))
+            else:
+                reply = ("ok", result)
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        finally:
+            for view in views:
+                try:
+                    view.release()
+                except BufferError:
+                    pass
+            del task_args
+        if reply[0] == "exit":
+            break
+        try:
+            connection.send((*reply, _rss_bytes()))
+        except Exception as e:
+            connection.send(("error", f"Result could not be sent: {type(e).__name__}: {e}", _rss_bytes()))
+
+# --- Pool ---
+
+class _Worker:
+    __slots__ = (
+        "id", "generation", "process", "connection", "started", "ready", "call", "tool_id", "deadline",
+        "chunks", "credits", "wakeup", "arena", "tasks", "rss", "retiring"
+    )
+
+    def __init__(self, worker_id: int, generation: int, process: multiprocessing.process.BaseProcess, connection: Connection):
+        self.id = worker_id
+        # The version of the tools directory the worker imported
+        self.generation = generation
+        self.process = process
+        self.connection = connection
+        self.started = False
+        # True once the worker has imported the tools; False if it stops or exits first
+        self.ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        # The reply to the call in progress, if any, and the tool called
+        self.call: Optional[asyncio.Future] = None
+        self.tool_id: Optional[str] = None
+        self.deadline: Optional[asyncio.TimerHandle] = None
+        # For a streamed call: chunks received and not yet consumed, chunks the worker may
+        # still send, and the consumer waiting for the next chunk
+        self.chunks: Optional[Deque[Any]] = None
+        self.credits = 0
+        self.wakeup: Optional[asyncio.Future] = None
+        # Shared memory for large arguments, owned by the pool and reused across calls
+        self.arena: Optional[SharedMemory] = None
+        self.tasks = 0
+        self.rss = 0
+        self.retiring = False
+
+class ToolProcessPool:
+    """
+    Runs the Python tools in a directory (by default tools/) in a pool of
+    pre-warmed worker processes, so CPU-heavy tools never block the event
+    loop and calls skip process startup and imports.
+
+    Every worker imports every tool module once, when it starts. Calls are
+    dispatched to idle workers, one call per worker at a time; callers wait
+    for a worker when all are busy. String and bytes arguments of at least
+    `shared_memory_threshold` bytes are not pickled through the worker's pipe:
+    they are copied once into a shared memory arena kept per worker, and bytes
+    arguments reach the tool as a memoryview of it, with no further copy.
+
+    Tools whose run() is a generator stream their output: stream() yields
+    chunks as the worker sends them. The worker runs at most `stream_window`
+    chunks ahead of the consumer, and closing the stream early closes the
+    tool's generator at its next yield.
+
+    A worker is recycled after `max_tasks_per_worker` calls, or after a call
+    that leaves its resident memory above `max_worker_memory`, and killed if a
+    call runs longer than `task_timeout` or its caller is cancelled (a losing
+    hedge, a client that disconnected). A replacement is started in each
+    case, and after a crash.
+
+    The directory is checked for changes every `reload_interval` seconds. On a
+    change, a new set of workers imports the tools again; once the first of
+    them is ready, new calls go to the new generation, idle old workers stop,
+    and busy ones stop after their current call. Listeners added with
+    add_tools_listener() receive the tools declared by each generation, to
+    keep the registry in sync. With no tool files, no workers run.
+    """
+
+    def __init__(
+        self,
+        directory: str = TOOLS_DIRECTORY,
+        workers: int = 4,
+        max_tasks_per_worker: int = 1_000,
+        max_worker_memory: int = 512 * 1024 * 1024,
+        task_timeout: Optional[float] = 30.0,
+        shared_memory_threshold: int = 64 * 1024,
+        stream_window: int = 16,
+        reload_interval: Optional[float] = 1.0,
+        start_method: str = "spawn"
+    ):
+        self.directory = directory
+        self.workers = workers
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_worker_memory = max_worker_memory
+        self.task_timeout = task_timeout
+        self.shared_memory_threshold = shared_memory_threshold
+        self.stream_window = stream_window
+        self.reload_interval = reload_interval
+        # spawn starts workers from a fresh interpreter, not a fork of a process running threads and an event loop
+        self._context = multiprocessing.get_context(start_method)
+        self._files: Dict[str, int] = {}
+        # The generation being started, and the one calls go to (none until a worker is ready)
+        self.generation = 0
+        self.active_generation = -1
+        self._worker_ids = itertools.count(1)
+        self._workers: List[_Worker] = []
+        # Most recently used last, so calls reuse the warmest worker
+        self._idle: List[_Worker] = []
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._tools: Dict[str, MCPTool] = {}
+        self._listeners: List[Callable[[List[MCPTool], List[str]], None]] = []
+        self._background: Set[asyncio.Task] = set()
+        self._watcher: Optional[asyncio.Task] = None
+        self._closed = False
+        self.calls = 0
+        self.shared_memory_bytes = 0
+        self.started = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.timed_out = 0
+        self.abandoned = 0
+        self.reloads = 0
+
+    @property
+    def tools(self) -> List[MCPTool]:
+        """
+        The tools of the active generation, with handlers that call the pool.
+        """
+        return list(self._tools.values())
+
+    def add_tools_listener(self, listener: Callable[[List[MCPTool], List[str]], None]):
+        """
+        Registers a function called with the tools of each new generation and
+        the IDs of tools it no longer declares.
+        """
+        self._listeners.append(listener)
+
+    async def start(self):
+        """
+        Starts the workers and waits until they have imported the tools.
+        """
+        self._files = tool_files(self.directory)
+        self._fill()
+        ready = await asyncio.gather(*(worker.ready for worker in self._workers))
+        if self._files and not any(ready):
+            logger.error("local_tool_workers_not_ready", workers=len(ready))
+        if self.reload_interval is not None:
+            self._watcher = asyncio.ensure_future(self._watch())
+
+    async def close(self):
+        """
+        Stops every worker, waiting up to two seconds each for calls in progress.
+        """
+        self._closed = True
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_exception(ToolProcessError("Tool process pool closed"))
+        self._waiters.clear()
+        for worker in list(self._workers):
+            self._stop(worker)
+        # Workers still starting stop once started; the others are being joined
+        while self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def reload(self):
+        """
+        Starts a new generation of workers, which import the tools again.
+        """
+        self.generation += 1
+        self.reloads += 1
+        logger.info("local_tools_reloading", generation=self.generation, files=len(self._files))
+        if not self._files:
+            # Every tool file is gone: no worker would start to replace the old ones
+            self._activate(self.generation, [], {})
+            return
+        self._fill()
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            files = tool_files(self.directory)
+            if files != self._files:
+                self._files = files
+                self.reload()
+
+    # --- Calls ---
+
+    async def call(self, tool_id: str, /, **task_args: Any) -> Any:
+        """
+        Runs a tool in a worker process and returns its result. Raises
+        ToolProcessError if the tool raised, timed out, or its worker died.
+        """
+        worker, reply = await self._dispatch(tool_id, task_args, credits=0)
+        try:
+            status, result = await reply
+        except asyncio.CancelledError:
+            if worker.call is reply:
+                # E.g. a losing hedge or a client that left: the tool is still running
+                self._abandon(worker)
+            raise
+        if status == "error":
+            raise ToolProcessError(f"Local tool '{tool_id}' failed: {result}")
+        return result
+
+    async def stream(self, tool_id: str, /, **task_args: Any) -> AsyncIterator[Any]:
+        """
+        Runs a generator tool in a worker process, yielding its chunks as they
+        arrive. Raises ToolProcessError like call(), after the chunks received
+        before the failure.
+        """
+        worker, reply = await self._dispatch(tool_id, task_args, credits=self.stream_window)
+        chunks = worker.chunks
+        # Credit is returned in batches, so the worker is not woken for every chunk
+        credit_batch = max(self.stream_window // 2, 1)
+        consumed = 0
+        try:
+            while True:
+                if chunks:
+                    chunk = chunks.popleft()
+                    consumed += 1
+                    if consumed % credit_batch == 0 and not reply.done():
+                        self._grant(worker, credit_batch)
+                    yield chunk
+                elif reply.done():
+                    break
+                else:
+                    worker.wakeup = asyncio.get_running_loop().create_future()
+                    await worker.wakeup
+        finally:
+            if not reply.done():
+                # Closed early: the worker closes the generator, and its reply is dropped
+                reply.cancel()
+                try:
+                    worker.connection.send(("cancel",))
+                except OSError:
+                    pass
+        status, result = reply.result()
+        if status == "error":
+            raise ToolProcessError(f"Local tool '{tool_id}' failed: {result}")
+
+    async def _dispatch(self, tool_id: str, task_args: Dict[str, Any], credits: int) -> Tuple[_Worker, asyncio.Future]:
+        """
+        Sends a call to an idle worker; returns the worker and the future of its
+        reply. A non-zero `credits` streams the call.
+        """
+        if tool_id not in self._tools:
+            raise ToolProcessError(f"Unknown local tool '{tool_id}'")
+        worker = await self._acquire()
+        try:
+            worker.connection.send(self._pack(worker, tool_id, task_args, credits))
+        except BaseException:
+            self._release(worker)
+            raise
+        self.calls += 1
+        worker.call = reply = asyncio.get_running_loop().create_future()
+        worker.tool_id = tool_id
+        worker.chunks = deque() if credits else None
+        worker.credits = credits
+        self._arm_deadline(worker)
+        return worker, reply
+
+    def _grant(self, worker: _Worker, credits: int):
+        worker.credits += credits
+        try:
+            worker.connection.send(("credit", credits))
+        except OSError:
+            return
+        self._arm_deadline(worker)
+
+    def _arm_deadline(self, worker: _Worker):
+        """
+        (Re)starts the timeout of the worker's call. A stream's timeout runs
+        from its last chunk, and not while the worker waits for the consumer.
+        """
+        if worker.deadline is not None:
+            worker.deadline.cancel()
+            worker.deadline = None
+        if self.task_timeout is None or (worker.chunks is not None and worker.credits <= 0):
+            return
+        worker.deadline = asyncio.get_running_loop().call_later(self.task_timeout, self._expire, worker)
+
+    def _wake(self, worker: _Worker):
+        if worker.wakeup is not None and not worker.wakeup.done():
+            worker.wakeup.set_result(None)
+
+    def _pack(
+        self, worker: _Worker, tool_id: str, task_args: Dict[str, Any], credits: int
+    ) -> Tuple[str, str, Dict[str, Any], Optional[str], Dict[str, Tuple[int, int, bool]], int]:
+        large: Dict[str, Any] = {}
+        for key, value in task_args.items():
+            if isinstance(value, (str, bytes, bytearray)) and len(value) >= self.shared_memory_threshold:
+                large[key] = value.encode() if isinstance(value, str) else value
+        if not large:
+            return "call", tool_id, task_args, None, {}, credits
+
+        size = sum(len(value) for value in large.values())
+        if worker.arena is None or worker.arena.size < size:
+            # Grown to the next power of two, so a worker's arena is replaced rarely
+            if worker.arena is not None:
+                self._free_arena(worker)
+            worker.arena = SharedMemory(create=True, size=1 << (size - 1).bit_length())
+        small = {key: value for key, value in task_args.items() if key not in large}
+        shared: Dict[str, Tuple[int, int, bool]] = {}
+        offset = 0
+        buffer = worker.arena.buf
+        for key, value in large.items():
+            buffer[offset:offset + len(value)] = value
+            shared[key] = (offset, len(value), isinstance(task_args[key], str))
+            offset += len(value)
+        self.shared_memory_bytes += size
+        return "call", tool_id, small, worker.arena.name, shared, credits
+
+    async def _acquire(self) -> _Worker:
+        if self._idle:
+            return self._idle.pop()
+        if self._closed:
+            raise ToolProcessError("Tool process pool closed")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # Handed a worker just as the caller was cancelled: pass it on
+                self._release(waiter.result())
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self, worker: _Worker):
+        """
+        Returns a worker that finished a call (or became ready) to the pool, or
+        recycles it.
+        """
+        reason = None
+        if worker.retiring or worker.generation < self.active_generation:
+            reason = "reloaded"
+        elif worker.tasks >= self.max_tasks_per_worker:
+            reason = "max_tasks"
+        elif worker.rss >= self.max_worker_memory:
+            reason = "memory"
+        if reason is not None:
+            if reason != "reloaded":
+                self.recycled += 1
+                logger.info("local_tool_worker_recycled", worker=worker.id, reason=reason, tasks=worker.tasks, rss=worker.rss)
+            self._stop(worker)
+            self._fill()
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(worker)
+                return
+        self._idle.append(worker)
+
+    # --- Worker lifecycle ---
+
+    def _fill(self):
+        """
+        Starts workers until the current generation has its full count.
+        """
+        if self._closed or not self._files:
+            return
+        current = sum(1 for worker in self._workers if worker.generation == self.generation and not worker.retiring)
+        for _ in range(self.workers - current):
+            parent_connection, child_connection = self._context.Pipe()
+            process = self._context.Process(
+                target=_worker_main, args=(child_connection, self.directory), name="neuroforge-tool-worker", daemon=True
+            )
+            worker = _Worker(next(self._worker_ids), self.generation, process, parent_connection)
+            self._workers.append(worker)
+            self._run_in_background(self._start_worker(worker, child_connection))
+
+    def _run_in_background(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _start_worker(self, worker: _Worker, child_connection: Connection):
+        try:
+            # Starting a process blocks for milliseconds; keep that off the event loop
+            await asyncio.to_thread(worker.process.start)
+        except Exception as e:
+            logger.error("local_tool_worker_start_failed", error=str(e))
+            self._lost(worker)
+            return
+        finally:
+            child_connection.close()
+        worker.started = True
+        self.started += 1
+        if worker.retiring:
+            # Stopped while it started
+            worker.connection.send(None)
+            await self._join(worker)
+            return
+        asyncio.get_running_loop().add_reader(worker.connection.fileno(), self._on_readable, worker)
+
+    def _on_readable(self, worker: _Worker):
+        try:
+            message = worker.connection.recv()
+        except (EOFError, OSError):
+            self._lost(worker)
+            return
+        if message[0] == "chunk":
+            if worker.chunks is not None:
+                worker.chunks.append(message[1])
+                worker.credits -= 1
+                self._arm_deadline(worker)
+                self._wake(worker)
+            return
+        worker.rss = message[-1]
+        if message[0] == "ready":
+            self._on_ready(worker, message[1], message[2])
+            return
+        if worker.deadline is not None:
+            worker.deadline.cancel()
+            worker.deadline = None
+        reply, worker.call = worker.call, None
+        worker.tasks += 1
+        if reply is not None and not reply.done():
+            reply.set_result(message[:2])
+        self._wake(worker)
+        self._release(worker)
+
+    def _on_ready(self, worker: _Worker, declarations: List[Dict[str, Any]], errors: Dict[str, str]):
+        worker.ready.set_result(True)
+        if worker.generation != self.generation:
+            # Superseded by a newer reload while it started
+            self._stop(worker)
+            return
+        if worker.generation > self.active_generation:
+            self._activate(worker.generation, declarations, errors)
+        self._release(worker)
+
+    def _activate(self, generation: int, declarations: List[Dict[str, Any]], errors: Dict[str, str]):
+        for path, error in errors.items():
+            logger.error("local_tool_import_failed", path=path, error=error)
+        self.active_generation = generation
+        tools = {
+            declaration["id"]: MCPTool(
+                id=declaration["id"],
+                name=declaration["name"],
+                capabilities=declaration["capabilities"],
+                keywords=declaration["keywords"],
+                handler=functools.partial(self.stream if declaration["streaming"] else self.call, declaration["id"])
+            )
+            for declaration in declarations
+        }
+        removed = [tool_id for tool_id in self._tools if tool_id not in tools]
+        self._tools = tools
+        # Idle workers of older generations are replaced now; busy ones after their call
+        for worker in [worker for worker in self._idle if worker.generation < generation]:
+            self._idle.remove(worker)
+            self._stop(worker)
+        logger.info("local_tools_loaded", generation=generation, tools=list(tools), removed=removed)
+        for listener in self._listeners:
+            listener(list(tools.values()), removed)
+
+    def _expire(self, worker: _Worker):
+        worker.deadline = None
+        self.timed_out += 1
+        reply, worker.call = worker.call, None
+        if reply is not None and not reply.done():
+            reply.set_exception(ToolProcessError(f"Local tool '{worker.tool_id}' timed out after {self.task_timeout}s"))
+        self._wake(worker)
+        logger.warning("local_tool_timed_out", tool_id=worker.tool_id, worker=worker.id)
+        # The call cannot be interrupted in the worker, so the worker goes
+        worker.retiring = True
+        worker.process.kill()
+
+    def _abandon(self, worker: _Worker):
+        """
+        Kills a worker whose caller was cancelled during a call, so it does
+        not hold a worker until the call ends; _lost() replaces it.
+        """
+        if worker.deadline is not None:
+            worker.deadline.cancel()
+            worker.deadline = None
+        worker.call = None
+        self.abandoned += 1
+        logger.info("local_tool_call_abandoned", tool_id=worker.tool_id, worker=worker.id)
+        # Like a timed-out call, it cannot be interrupted in the worker
+        worker.retiring = True
+        worker.process.kill()
+
+    def _lost(self, worker: _Worker):
+        """
+        Handles a worker that exited without being asked to, or was killed.
+        """
+        if worker not in self._workers:
+            return
+        self._forget(worker)
+        was_ready = worker.ready.done() and worker.ready.result()
+        if not worker.ready.done():
+            worker.ready.set_result(False)
+        if worker.deadline is not None:
+            worker.deadline.cancel()
+        reply, worker.call = worker.call, None
+        if reply is not None and not reply.done():
+            reply.set_exception(ToolProcessError(f"Local tool worker exited with code {worker.process.exitcode}"))
+        self._wake(worker)
+        if not worker.retiring:
+            self.crashed += 1
+            logger.error("local_tool_worker_crashed", worker=worker.id, exitcode=worker.process.exitcode, tasks=worker.tasks)
+        # A worker that dies before it is ready would die again at once, so it is replaced later
+        asyncio.get_running_loop().call_later(0.0 if was_ready else 1.0, self._fill)
+        if worker.started:
+            self._run_in_background(self._join(worker))
+
+    def _stop(self, worker: _Worker):
+        """
+        Asks an idle or starting worker to exit.
+        """
+        worker.retiring = True
+        if worker not in self._workers:
+            return
+        self._forget(worker)
+        if not worker.ready.done():
+            worker.ready.set_result(False)
+        if not worker.started:
+            # _start_worker stops it once started
+            return
+        try:
+            worker.connection.send(None)
+        except OSError:
+            pass
+        self._run_in_background(self._join(worker))
+
+    def _forget(self, worker: _Worker):
+        self._workers.remove(worker)
+        if worker in self._idle:
+            self._idle.remove(worker)
+        if worker.started:
+            asyncio.get_running_loop().remove_reader(worker.connection.fileno())
+
+    async def _join(self, worker: _Worker):
+        process = worker.process
+        await asyncio.to_thread(process.join, 2.0)
+        if process.exitcode is None:
+            process.kill()
+            await asyncio.to_thread(process.join)
+        worker.connection.close()
+        self._free_arena(worker)
+
+    def _free_arena(self, worker: _Worker):
+        if worker.arena is None:
+            return
+        worker.arena.close()
+        worker.arena.unlink()
+        worker.arena = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": len(self._workers),
+            "idle": len(self._idle),
+            "waiting": len(self._waiters),
+            "tools": len(self._tools),
+            "generation": self.active_generation,
+            "calls": self.calls,
+            "shared_memory_bytes": self.shared_memory_bytes,
+            "started": self.started,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+            "timed_out": self.timed_out,
+            "abandoned": self.abandoned,
+            "reloads": self.reloads,
+        }
+
+# Example Usage (can be removed or moved to a test file later)
+if __name__ == '__main__':
+    import shutil
+    import tempfile
+
+    async def main():
+        # A copy of tools/, so the demo can add a tool without touching the repository
+        directory = tempfile.mkdtemp()
+        for file_name in ("text_statistics.py", "key_sentences.py"):
+            shutil.copy(os.path.join(TOOLS_DIRECTORY, file_name), directory)
+        pool = ToolProcessPool(directory, workers=2, max_tasks_per_worker=3, reload_interval=0.1)
+        pool.add_tools_listener(lambda tools, removed: print(f"Tools: {[tool.id for tool in tools]}, removed: {removed}"))
+        await pool.start()
+
+        print(await pool.call("text_statistics", text="The quick brown fox jumps over the lazy dog. It was not amused."))
+        # Large arguments go through shared memory instead of the pipe
+        results = await asyncio.gather(*(pool.call("text_statistics", text="lorem ipsum " * 50_000) for _ in range(4)))
+        print(f"Words: {[result['words'] for result in results]}")
+
+        # A generator tool streams: each chunk arrives as soon as the worker yields it
+        article = "\n\n".join(f"Rain is expected on day {day}. Rain on day {day} means rain gear. Nothing else." for day in range(3))
+        async for chunk in pool.stream("key_sentences", text=article):
+            print(f"Chunk: {chunk!r}")
+
+        # A new tool file is loaded without a restart
+        with open(os.path.join(directory, "shout.py"), "w") as tool_file:
+            tool_file.write('TOOL = {"capabilities": ["shouting"]}\n\ndef run(query="", **_):\n    return query.upper()\n')
+        while "shout" not in [tool.id for tool in pool.tools]:
+            await asyncio.sleep(0.05)
+        shout = next(tool for tool in pool.tools if tool.id == "shout")
+        print(await shout.handler(query="hello from a new tool"))
+        print(f"Stats: {pool.stats()}")  # workers recycled after 3 calls, and one reload
+        await pool.close()
+        shutil.rmtree(directory)
+
+    asyncio.run(main())
@@ -0,0 +1,193 @@
+import random
+from collections import deque
+from typing import Collection, Deque, Dict, Iterator, Optional, Sequence
+
+class ToolStats:
+    """
+    Rolling performance statistics for one tool.
+    """
+
+    __slots__ = ("latency_ewma", "error_ewma", "in_flight", "requests", "failures", "_samples")
+
+    def __init__(self, window: int):
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        # Recent latencies of successful calls, used for percentile estimates
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool, alpha: float):
+        self.requests += 1
+        self.error_ewma += alpha * ((0.0 if ok else 1.0) - self.error_ewma)
+        if ok:
+            self._samples.append(latency)
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += alpha * (latency - self.latency_ewma)
+        else:
+            self.failures += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    @property
+    def sample_count(self) -> int:
+        return len(self._samples)
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        return {
+            "latency_ewma": self.latency_ewma,
+            "error_rate": self.error_ewma,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "p95": self.percentile(0.95),
+        }
+
+class ToolSelector:
+    """
+    Decides the order in which the tools registered for a capability are tried,
+    and tracks per-tool latency EWMA, error rate and in-flight count.
+
+    The base class keeps registration order, the original MCPClient behaviour.
+    Subclasses override `rank` to implement other policies.
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 256, min_hedge_samples: int = 20):
+        self.alpha = alpha
+        self.window = window
+        # Tools need this many successful samples before their p95 is trusted for hedging
+        self.min_hedge_samples = min_hedge_samples
+        self.stats: Dict[str, ToolStats] = {}
+
+    def _stats(self, tool_id: str) -> ToolStats:
+        stats = self.stats.get(tool_id)
+        if stats is None:
+            stats = self.stats[tool_id] = ToolStats(self.window)
+        return stats
+
+    def rank(self, tool_ids: Collection[str]) -> Iterator[str]:
+        """
+        Yields the candidate tool IDs in the order they should be tried. Callers
+        take only as many as they try, so later candidates may be ordered lazily.
+        """
+        return iter(tool_ids)
+
+    def on_start(self, tool_id: str):
+        self._stats(tool_id).in_flight += 1
+
+    def on_finish(self, tool_id: str, latency: float, ok: bool):
+        stats = self._stats(tool_id)
+        stats.in_flight -= 1
+        stats.record(latency, ok, self.alpha)
+
+    def on_cancel(self, tool_id: str):
+        # Cancelled calls (e.g. the losing side of a hedge) say nothing about the tool's health
+        self._stats(tool_id).in_flight -= 1
+
+    def hedge_delay(self, tool_id: str) -> Optional[float]:
+        """
+        Returns how long to wait for a tool before sending a hedged request to
+        the next one: the tool's p95 latency, or None if there is too little data.
+        """
+        stats = self.stats.get(tool_id)
+        if stats is None or stats.sample_count < self.min_hedge_samples:
+            return None
+        return stats.percentile(0.95)
+
+    def score(self, tool_id: str) -> float:
+        """
+        Expected cost of sending one more request to a tool; lower is better.
+        Tools without data score 0 so they get tried at least once.
+        """
+        stats = self.stats.get(tool_id)
+        if stats is None or stats.latency_ewma is None:
+            return 0.0
+        success_rate = max(1.0 - stats.error_ewma, 0.05)
+        return stats.latency_ewma * (stats.in_flight + 1) / success_rate
+
+class PowerOfTwoChoicesSelector(ToolSelector):
+    """
+    Picks two random candidates and tries the one with the lower score first.
+    The remaining candidates follow in score order as failover targets; they
+    are scored only if a caller gets that far.
+
+    Sampling two instead of always taking the global best avoids herding every
+    request onto the tool that looked fastest a moment ago.
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 256, min_hedge_samples: int = 20, rng: Optional[random.Random] = None):
+        super().__init__(alpha=alpha, window=window, min_hedge_samples=min_hedge_samples)
+        self._rng = rng or random.Random()
+
+    def rank(self, tool_ids: Collection[str]) -> Iterator[str]:
+        candidates = tool_ids if isinstance(tool_ids, Sequence) else tuple(tool_ids)
+        if len(candidates) <= 1:
+            yield from candidates
+            return
+        first, second = self._rng.sample(range(len(candidates)), 2)
+        if self.score(candidates[second]) < self.score(candidates[first]):
+            first, second = second, first
+        yield candidates[first]
+        yield candidates[second]
+        # Scoring and sorting the rest is only worth it once both sampled tools failed
+        yield from sorted((tool_id for position, tool_id in enumerate(candidates) if position != first and position != second), key=self.score)
+
+# Example Usage (scenarios with assertions are in tests/test_tool_selector.py)
+if __name__ == '__main__':
+    import asyncio
+    from collections import Counter
+    from components.mcp_client import MCPClient, MCPTool
+
+    def stub_tool(tool_id: str, delay: float, failure_rate: float = 0.0, stall_rate: float = 0.0, stall: float = 0.0) -> MCPTool:
+        rng = random.Random(tool_id)
+
+        async def handler(**task_args):
+            if rng.random() < stall_rate:
+                await asyncio.sleep(stall)
+            await asyncio.sleep(delay)
+            if rng.random() < failure_rate:
+                raise RuntimeError(f"{tool_id} failed")
+            return f"{tool_id} handled {task_args.get('query')}"
+
+        return MCPTool(id=tool_id, name=tool_id, capabilities=["web_search"], handler=handler)
+
+    async def main():
+        # Latency-aware selection: most traffic moves to the fast tool, and the flaky one's errors fail over
+        client = MCPClient(selector=PowerOfTwoChoicesSelector(rng=random.Random(1)))
+        client.register_tool(stub_tool("slow", delay=0.05))
+        client.register_tool(stub_tool("fast", delay=0.005))
+        client.register_tool(stub_tool("flaky", delay=0.005, failure_rate=0.5))
+        used = Counter()
+        for i in range(100):
+            result = await client.execute_task("web_search", {"query": f"q{i}"})
+            used[result.get("tool_id") if result["status"] == "success" else "error"] += 1
+        print(f"Requests per tool: {dict(used)}")
+        print(f"Stats: { {tool_id: stats.as_dict() for tool_id, stats in client.selector.stats.items()} }")
+
+        # Failover: a tool that always fails never surfaces an error while a peer works
+        client = MCPClient()
+        client.register_tool(stub_tool("broken", delay=0.001, failure_rate=1.0))
+        client.register_tool(stub_tool("backup", delay=0.001))
+        print(f"Failover result: {await client.execute_task('web_search', {'query': 'cats'})}")
+
+        # Hedging: occasional stalls are masked by a duplicate request after p95
+        for hedge in (False, True):
+            client = MCPClient(hedge=hedge)
+            client.register_tool(stub_tool("stalling", delay=0.002, stall_rate=0.03, stall=0.2))
+            client.register_tool(stub_tool("steady", delay=0.004))
+            latencies = []
+            for i in range(200):
+                start = asyncio.get_running_loop().time()
+                await client.execute_task("web_search", {"query": f"q{i}"})
+                latencies.append(asyncio.get_running_loop().time() - start)
+            latencies.sort()
+            print(f"hedge={hedge}: p50={latencies[100] * 1000:.1f}ms p99={latencies[198] * 1000:.1f}ms")
+
+    asyncio.run(main())
@@ -1,14 +1,68 @@
 import asyncio
-from fastapi import FastAPI
-from typing import List, Dict, Any, Optional
-
+import json
+import os
+import time
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import List, Dict, Any, AsyncIterator, Optional
+
+from components.admission_control import AdaptiveConcurrencyLimit, ConcurrencyLimits
 from components.mcp_client import MCPClient, MCPTool
+from components.capability_index import CapabilityIndex
 from components.capability_registry import CapabilityRegistry
+from components.capability_analyzer import CapabilityAnalyzer
+from components.discovery_coordinator import DiscoveryCoordinator
+from components.execution_planner import ExecutionPlanner
+from components.integration_queue import IntegrationJob, IntegrationQueue
+from components.mcp_session_pool import MCPSessionPool
+from components.metrics import MetricsRegistry
+from components.registry_store import RegistryStore
+from components.result_cache import ResultCache
+from components.semantic_matcher import SemanticMatcher
+from components.shared_registry import DiscoveryOwnership, RegistryNotifier
+from components.structured_logger import configure_logging, dropped_records, get_logger, shutdown_logging
+from components.tool_process_pool import TOOLS_DIRECTORY, ToolProcessPool
+from components.tool_selector import PowerOfTwoChoicesSelector
+
+# --- Logging and Metrics ---
+# Log records are written as JSON lines by a background thread, never on the event loop
+LOG_LEVEL = "INFO"
+# Fraction of events kept per level; per-task debug chatter is sampled
+LOG_SAMPLE_RATES = {"DEBUG": 0.1}
+logger = get_logger("main")
+# Label sets kept per metric; further tools share one "other" series, so /metrics stays bounded
+METRICS_MAX_SERIES_PER_METRIC = 500
+
+metrics = MetricsRegistry(max_series=METRICS_MAX_SERIES_PER_METRIC)
+metrics.describe("query_stage_seconds", "Latency of each /query pipeline stage")
+metrics.describe("tool_latency_seconds", "Latency of each tool execution")
+metrics.describe("tool_errors_total", "Failed tool executions")
+metrics.describe("queries_total", "Queries processed")
+metrics.describe("queries_shed_total", "Queries rejected with 429 by admission control")
+metrics.describe("tool_concurrency_queued", "Calls waiting for a slot, per tool")
+metrics.describe("capability_concurrency_queued", "Calls waiting for a slot, per capability")
+metrics.describe("tool_first_chunk_seconds", "Time from a streaming tool's call to its first chunk")
+metrics.describe("stream_ttfb_seconds", "Time from a streamed query's arrival to its first event, per transport")
+metrics.describe("stream_first_result_seconds", "Time from a streamed query's arrival to its first partial result, per transport")
+metrics.describe("streams_cancelled_total", "Streamed queries the client disconnected from or cancelled before the end")
 
 # --- Global Variables ---
-# These will be initialized by setup_essential_tools()
+# These are initialized by lifespan() when the application starts, not at import
 mcp_client: MCPClient
 capability_registry: CapabilityRegistry
+capability_analyzer: CapabilityAnalyzer
+discovery_coordinator: DiscoveryCoordinator
+integration_queue: IntegrationQueue
+execution_planner: ExecutionPlanner
+query_limiter: Optional[AdaptiveConcurrencyLimit] = None
+local_tool_pool: Optional[ToolProcessPool] = None
+# Wakes the other worker processes sharing REGISTRY_DATA_DIR when the registry changes
+registry_notifier: Optional[RegistryNotifier] = None
+# Reads the changes those workers persisted, after their wake-ups
+registry_poll: Optional[asyncio.Task] = None
+registry_poll_requested = False
 
 # --- Essential Tools Setup ---
 ESSENTIAL_TOOLS_LIST = [
@@ -19,66 +73,261 @@ ESSENTIAL_TOOLS_LIST = [
     "weather_api"
 ]
 
+# Query keywords for each capability. Capabilities without an essential tool
+# (e.g. text_summarization) are listed too, so queries can trigger their discovery.
+CAPABILITY_KEYWORDS = {
+    "news_api": ["news"],
+    "text_summarization": ["news"],
+    "weather_api": ["weather"],
+    "web_search": ["search", "find"]
+}
+
+# Capabilities that consume another capability's output
+CAPABILITY_DEPENDENCIES = {
+    "text_summarization": ["news_api"]
+}
+# Upper bound on concurrent tool executions within one query plan
+PLAN_MAX_CONCURRENCY = 8
+# Required capability of a query no capability was recognised in; it is never discovered
+UNKNOWN_CAPABILITY = "unknown_capability"
+
+# Concurrent requests for the same missing capability share one discovery/integration
+# run, and capabilities with no tools found are not rediscovered until the TTL expires.
+DISCOVERY_NEGATIVE_TTL_SECONDS = 60.0
+# Upper bound on concurrent executions within one /query/batch request
+BATCH_MAX_CONCURRENCY = 32
+# Background integration: concurrent discoveries, capabilities queued or running at
+# most, and attempts per capability, retried after an exponential backoff
+INTEGRATION_WORKERS = 4
+INTEGRATION_MAX_PENDING = 1_000
+INTEGRATION_MAX_ATTEMPTS = 3
+INTEGRATION_RETRY_BACKOFF_SECONDS = 0.5
+
+# Result cache TTLs in seconds: weather changes slowly, news quickly
+RESULT_CACHE_TTLS = {
+    "weather_api": 600.0,
+    "news_api": 60.0
+}
+RESULT_CACHE_DEFAULT_TTL_SECONDS = 120.0
+RESULT_CACHE_MAX_ENTRIES = 10_000
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Overload protection; False runs every request and call as soon as it arrives
+ADMISSION_CONTROL = True
+# Concurrent calls per tool and per capability. Calls beyond a limit wait in a bounded
+# FIFO queue for at most the queue timeout; shed tool calls fail over to the next tool
+TOOL_MAX_CONCURRENCY = 16
+TOOL_CONCURRENCY_OVERRIDES: Dict[str, int] = {}
+CAPABILITY_MAX_CONCURRENCY = 64
+EXECUTION_MAX_QUEUE = 256
+EXECUTION_QUEUE_TIMEOUT_SECONDS = 2.0
+# Adaptive limit on /query requests in flight: it grows while queries finish within the
+# latency target and shrinks when they do not. Queries over the limit get 429 at once
+QUERY_CONCURRENCY_INITIAL = 64
+QUERY_CONCURRENCY_MIN = 4
+QUERY_CONCURRENCY_MAX = 1_024
+QUERY_LATENCY_TARGET_SECONDS = 1.0
+
+# Integrated tools are persisted here and reloaded on startup; None keeps the registry in memory only.
+# Worker processes started with the same directory share one registry: a tool integrated
+# by one is visible to the others within milliseconds, and each capability is
+# discovered by one worker at a time.
+REGISTRY_DATA_DIR: Optional[str] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# Registry log records written before they are folded into the snapshot
+REGISTRY_COMPACT_AFTER = 10_000
+# Shutdown folds the log into the snapshot only from this many records; a shorter
+# log is replayed on the next start, which costs less than rewriting the snapshot
+REGISTRY_COMPACT_ON_CLOSE_AFTER = 250
+
+# Python tools in this directory (a module per tool, with a TOOL declaration and a run()
+# function) run in pre-warmed worker processes, so CPU-heavy tools never block the event
+# loop. Changed tool files are reloaded without a restart; None disables local tools.
+LOCAL_TOOLS_DIRECTORY: Optional[str] = TOOLS_DIRECTORY
+LOCAL_TOOL_WORKERS = min(4, os.cpu_count() or 1)
+# Workers are replaced after this many calls, or once a call leaves them above the memory limit
+LOCAL_TOOL_MAX_TASKS_PER_WORKER = 1_000
+LOCAL_TOOL_MAX_WORKER_MEMORY_BYTES = 512 * 1024 * 1024
+LOCAL_TOOL_TIMEOUT_SECONDS = 30.0
+
 def setup_essential_tools():
     """
     Initializes and registers essential tools for the MCP system.
     Returns the initialized client and registry.
     """
-    print("Setting up essential tools...")
-    client = MCPClient()
-    registry = CapabilityRegistry()
-
+    logger.info("essential_tools_setup_started")
+    # The client and registry share one capability index, so each mapping is stored once.
+    # With a data directory, the index starts from the persisted registry: tools
+    # integrated by earlier runs are available without rediscovery.
+    store = None
+    if REGISTRY_DATA_DIR is not None:
+        store = RegistryStore(
+            REGISTRY_DATA_DIR, compact_after=REGISTRY_COMPACT_AFTER, compact_on_close_after=REGISTRY_COMPACT_ON_CLOSE_AFTER
+        )
+        index = store.load()
+    else:
+        index = CapabilityIndex()
+    # Spread each capability's traffic across its tools by latency, error rate and load
+    # Tools served by MCP servers reuse warm sessions instead of spawning a process per call
+    # Repeated tasks are answered from a bounded TTL + LRU result cache
+    result_cache = ResultCache(
+        max_entries=RESULT_CACHE_MAX_ENTRIES,
+        max_bytes=RESULT_CACHE_MAX_BYTES,
+        default_ttl=RESULT_CACHE_DEFAULT_TTL_SECONDS,
+        ttls=RESULT_CACHE_TTLS
+    )
+    tool_limits = capability_limits = None
+    if ADMISSION_CONTROL:
+        # A traffic spike queues briefly at each tool, then is shed instead of piling up
+        tool_limits = ConcurrencyLimits(
+            TOOL_MAX_CONCURRENCY, EXECUTION_MAX_QUEUE, EXECUTION_QUEUE_TIMEOUT_SECONDS, overrides=TOOL_CONCURRENCY_OVERRIDES
+        )
+        capability_limits = ConcurrencyLimits(CAPABILITY_MAX_CONCURRENCY, EXECUTION_MAX_QUEUE, EXECUTION_QUEUE_TIMEOUT_SECONDS)
+    client = MCPClient(
+        index,
+        selector=PowerOfTwoChoicesSelector(),
+        session_pool=MCPSessionPool(),
+        result_cache=result_cache,
+        metrics=metrics,
+        tool_limits=tool_limits,
+        capability_limits=capability_limits
+    )
+    registry = CapabilityRegistry(index, store=store)
+
+    essential_tools = []
     for tool_name in ESSENTIAL_TOOLS_LIST:
         tool_id = f"{tool_name}_tool"
         tool_display_name = f"{tool_name.replace('_', ' ').title()} Tool"
         tool_capabilities = [tool_name]
 
-        tool = MCPTool(id=tool_id, name=tool_display_name, capabilities=tool_capabilities)
+        essential_tools.append(MCPTool(id=tool_id, name=tool_display_name, capabilities=tool_capabilities))
 
-        client.register_tool(tool)
-        # print(f"Registered '{tool.name}' with MCPClient.")
-        registry.register_capability_from_tool(tool)
-        # print(f"Registered capabilities of '{tool.name}' with CapabilityRegistry.")
+    # One atomic update; the client sees the tools through the shared index
+    registry.register_many(essential_tools)
 
-    print("--- Essential Tools Setup Complete ---")
+    for capability_name, keywords in CAPABILITY_KEYWORDS.items():
+        registry.add_keywords(capability_name, keywords)
 
-    # Verification (optional, can be commented out for production)
-    # print("\nVerifying tool registration in CapabilityRegistry:")
-    # for tool_name_as_capability in ESSENTIAL_TOOLS_LIST:
-    #     if registry.can_handle(tool_name_as_capability):
-    #         print(f"SUCCESS: Capability '{tool_name_as_capability}' is handled.")
-    #     else:
-    #         print(f"ERROR: Capability '{tool_name_as_capability}' is NOT handled.")
+    logger.info("essential_tools_setup_complete", tools=len(essential_tools))
 
     return client, registry
 
-# Initialize client and registry globally
-mcp_client, capability_registry = setup_essential_tools()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the client and registry when the server starts, so importing this
+    module has no side effects, and persists the registry on shutdown.
+    """
+    global mcp_client, capability_registry, capability_analyzer, execution_planner, discovery_coordinator, integration_queue, registry_notifier, query_limiter, local_tool_pool
+    configure_logging(level=LOG_LEVEL, sample_rates=LOG_SAMPLE_RATES)
+    mcp_client, capability_registry = setup_essential_tools()
+    # The analyzer subscribes to the registry, so keywords of newly integrated tools are matched too.
+    # Queries with no keyword fall back to similarity with capability names, keywords and tool names.
+    # Both indexes are built once the server is up, in slices on the event loop: the keyword index
+    # first, which a query arriving earlier waits for, then the similarity matrix, which reads every
+    # tool's name. Until the matrix is ready, queries are matched by keyword only
+    semantic_matcher = SemanticMatcher(capability_registry)
+    capability_analyzer = CapabilityAnalyzer(capability_registry, fallback=semantic_matcher)
+
+    async def build_indexes():
+        await capability_analyzer.build_index_async()
+        await semantic_matcher.build_async()
+
+    index_build = asyncio.ensure_future(build_indexes())
+    # Runs the required capabilities as a DAG, with independent branches in parallel
+    execution_planner = ExecutionPlanner(mcp_client, CAPABILITY_DEPENDENCIES, max_concurrency=PLAN_MAX_CONCURRENCY)
+
+    ownership = None
+    store = capability_registry.store
+    if store is not None:
+        # Other workers' registry changes are read as soon as they notify, not on a timer
+        registry_notifier = RegistryNotifier(REGISTRY_DATA_DIR)
+        registry_notifier.add_callback(schedule_registry_poll)
+        registry_notifier.start()
+        store.notifier = registry_notifier
+        ownership = DiscoveryOwnership(REGISTRY_DATA_DIR, notifier=registry_notifier)
+    discovery_coordinator = DiscoveryCoordinator(
+        discover_tools_placeholder,
+        integrate_and_register_tool,
+        negative_ttl=DISCOVERY_NEGATIVE_TTL_SECONDS,
+        ownership=ownership,
+        is_handled=capability_available
+    )
+    # Missing capabilities are integrated in the background while /query answers with what is available
+    integration_queue = IntegrationQueue(
+        discovery_coordinator.resolve,
+        workers=INTEGRATION_WORKERS,
+        max_pending=INTEGRATION_MAX_PENDING,
+        max_attempts=INTEGRATION_MAX_ATTEMPTS,
+        retry_backoff=INTEGRATION_RETRY_BACKOFF_SECONDS
+    )
+    integration_queue.start()
+    query_limiter = None
+    if ADMISSION_CONTROL:
+        query_limiter = AdaptiveConcurrencyLimit(
+            initial_limit=QUERY_CONCURRENCY_INITIAL,
+            min_limit=QUERY_CONCURRENCY_MIN,
+            max_limit=QUERY_CONCURRENCY_MAX,
+            latency_target=QUERY_LATENCY_TARGET_SECONDS
+        )
+    local_tool_pool = None
+    if LOCAL_TOOLS_DIRECTORY is not None:
+        local_tool_pool = ToolProcessPool(
+            LOCAL_TOOLS_DIRECTORY,
+            workers=LOCAL_TOOL_WORKERS,
+            max_tasks_per_worker=LOCAL_TOOL_MAX_TASKS_PER_WORKER,
+            max_worker_memory=LOCAL_TOOL_MAX_WORKER_MEMORY_BYTES,
+            task_timeout=LOCAL_TOOL_TIMEOUT_SECONDS
+        )
+        local_tool_pool.add_tools_listener(register_local_tools)
+        await local_tool_pool.start()
+    try:
+        yield
+    finally:
+        await integration_queue.close()
+        if local_tool_pool is not None:
+            await local_tool_pool.close()
+        index_build.cancel()
+        await asyncio.gather(index_build, return_exceptions=True)
+        if store is not None:
+            # Appends the queued changes, and folds a long change log into the snapshot
+            await asyncio.to_thread(capability_registry.store.close)
+        if registry_notifier is not None:
+            # Closed after the store, so peers are woken for its last changes
+            registry_notifier.close()
+            registry_notifier = None
+        await mcp_client.session_pool.close()
+        shutdown_logging()
 
 # --- FastAPI App Instantiation ---
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # --- Placeholder Functions ---
-def analyze_capabilities(query: str) -> List[str]:
+async def analyze_capabilities(query: str) -> List[str]:
     """
     Analyzes the query to determine required capabilities.
-    Placeholder implementation.
+    Matches every registered capability keyword in a single pass over the query,
+    or the most similar capabilities if the query contains no keyword.
+    Before the keyword index is built, waits for the build.
+    """
+    with metrics.timer("query_stage_seconds", stage="analyze"):
+        await capability_analyzer.build_index_async()
+        required_capabilities = capability_analyzer.analyze(query)
+    if not required_capabilities:
+        return [UNKNOWN_CAPABILITY] # Default if no keywords match
+    return required_capabilities
+
+def discoverable(capabilities: List[str]) -> List[str]:
+    """
+    The capabilities among `capabilities` that discovery can look for tools for.
     """
-    print(f"Analyzing capabilities for query: '{query}'")
-    if "news" in query.lower():
-        return ["news_api", "text_summarization"] # news_api is essential, text_summarization might be missing
-    elif "weather" in query.lower():
-        return ["weather_api"]
-    elif "search" in query.lower() or "find" in query.lower():
-        return ["web_search"]
-    return ["unknown_capability"] # Default if no keywords match
+    return [capability for capability in capabilities if capability != UNKNOWN_CAPABILITY]
 
 async def discover_tools_placeholder(capabilities_needed: List[str]) -> List[MCPTool]:
     """
     Discovers tools that can provide the given capabilities.
     Placeholder: Returns a dummy tool if 'text_summarization' is needed.
     """
-    print(f"Discovering tools for capabilities: {capabilities_needed}")
+    logger.debug("discovering_tools", capabilities=capabilities_needed)
     discovered_tools = []
     if "text_summarization" in capabilities_needed:
         # Simulate discovering a new tool for text_summarization
@@ -88,7 +337,7 @@ async def discover_tools_placeholder(capabilities_needed: List[str]) -> List[MCP
             capabilities=["text_summarization"]
         )
         discovered_tools.append(summarization_tool)
-        print(f"Discovered tool: {summarization_tool.name}")
+        logger.info("tool_discovered", tool_id=summarization_tool.id)
     return discovered_tools
 
 async def integrate_tool_placeholder(tool: MCPTool):
@@ -96,119 +345,623 @@ async def integrate_tool_placeholder(tool: MCPTool):
     Integrates a new tool into the system.
     Placeholder implementation.
     """
-    print(f"Integrating tool: {tool.name} (ID: {tool.id}) with capabilities: {tool.capabilities}")
+    logger.debug("integrating_tool", tool_id=tool.id, capabilities=tool.capabilities)
     # In a real scenario, this might involve downloading, configuring, etc.
     await asyncio.sleep(0.1) # Simulate async work
 
-async def execute_query_placeholder(query: str, client: MCPClient, primary_capability: Optional[str]) -> Dict[str, Any]:
+async def integrate_and_register_tool(tool: MCPTool):
     """
-    Executes the query using the MCPClient.
-    Placeholder implementation.
+    Integrates a discovered tool and registers it with the client and registry.
     """
-    print(f"Executing query: '{query}' using primary capability: '{primary_capability}'")
-    if primary_capability and client.capabilities.get(primary_capability):
-        # Attempt to use the first tool found for that capability
-        return await client.execute_task(primary_capability, {"query": query})
-    elif primary_capability:
-        print(f"Warning: Primary capability '{primary_capability}' identified, but no tool available in client.")
-        return {"status": "error", "result": f"No tool available for primary capability: {primary_capability}"}
-    else:
-        print("No primary capability identified or capability not supported for execution.")
-        return {"status": "error", "result": "Could not determine primary capability or capability not supported."}
+    with metrics.timer("query_stage_seconds", stage="integrate"):
+        await integrate_tool_placeholder(tool)
+        # The client shares the registry's capability index, so one registration covers both
+        capability_registry.register_capability_from_tool(tool)
+        if capability_registry.store is not None:
+            # Persisted before this worker gives up the capability's discovery, so peers find the tool
+            await asyncio.wrap_future(capability_registry.store.flush())
+    logger.info("tool_registered", tool_id=tool.id, capabilities=tool.capabilities)
+
+def register_local_tools(tools: List[MCPTool], removed_tool_ids: List[str]):
+    """
+    Registers the tools loaded from LOCAL_TOOLS_DIRECTORY, on startup and after
+    every reload, and removes those whose file was deleted. Cached results of
+    reloaded and removed tools are dropped, since their code may have changed.
+    """
+    capability_registry.register_many(tools)
+    changed_capabilities = {capability for tool in tools for capability in tool.capabilities}
+    for tool_id in removed_tool_ids:
+        removed_tool = capability_registry.deregister_tool(tool_id)
+        if removed_tool is not None:
+            changed_capabilities.update(removed_tool.capabilities)
+    for capability in changed_capabilities:
+        mcp_client.result_cache.invalidate(capability)
+    logger.info("local_tools_registered", tools=[tool.id for tool in tools], removed=removed_tool_ids)
+
+async def poll_registry_store():
+    """
+    Applies the changes other workers persisted. The log is read in a thread,
+    so its flock and file I/O never block the event loop; the changes are
+    applied to the registry on the loop.
+    """
+    store = capability_registry.store
+    store.deliver(await asyncio.to_thread(store.read_changes))
+
+def schedule_registry_poll():
+    """
+    Notifier callback: polls the registry store in the background. Wake-ups
+    arriving during a poll lead to one more poll after it, not one each.
+    """
+    global registry_poll, registry_poll_requested
+    registry_poll_requested = True
+    if registry_poll is None or registry_poll.done():
+        registry_poll = asyncio.ensure_future(drain_registry_polls())
+
+async def drain_registry_polls():
+    global registry_poll_requested
+    while registry_poll_requested:
+        registry_poll_requested = False
+        try:
+            await poll_registry_store()
+        except Exception as e:
+            logger.error("registry_poll_failed", error=str(e))
+
+async def capability_available(capability: str) -> bool:
+    """
+    Checks the registry after reading changes other workers persisted, e.g.
+    once another worker finished discovering this capability.
+    """
+    if capability_registry.store is not None:
+        await poll_registry_store()
+    return capability_registry.can_handle(capability)
+
+async def execute_query_plan(query: str, required_capabilities: List[str]) -> Dict[str, Any]:
+    """
+    Executes every required capability as a dependency DAG and merges the results.
+    """
+    plan = execution_planner.build_plan(required_capabilities)
+    logger.debug("executing_plan", plan=plan.capabilities)
+    with metrics.timer("query_stage_seconds", stage="execute"):
+        return await execution_planner.execute(plan, query)
 
 # --- FastAPI Endpoint ---
+def admit_query(endpoint: str):
+    """
+    Takes a slot of the adaptive concurrency limit for a query, raising 429
+    with a Retry-After header if it is to be shed. Every query endpoint is
+    admitted here, so they all shed load the same way.
+
+    Returns the function that releases the slot: `release(ok=True,
+    latency=None)`, where the latency fed back to the limit defaults to the
+    time since admission. `ok=None` releases it without feeding the limit,
+    for a query that neither succeeded nor failed because the client left.
+    Calls after the first do nothing.
+    """
+    limiter = query_limiter
+    if limiter is None:
+        return lambda ok=True, latency=None: None
+    if not limiter.try_acquire():
+        metrics.inc("queries_shed_total", endpoint=endpoint)
+        raise HTTPException(
+            status_code=429, detail="Too many queries in flight", headers={"Retry-After": str(limiter.retry_after())}
+        )
+    start = time.perf_counter()
+    released = False
+
+    def release(ok: Optional[bool] = True, latency: Optional[float] = None):
+        nonlocal released
+        if not released:
+            released = True
+            if ok is None:
+                limiter.abandon()
+                return
+            # Latency feeds the limit back: slow queries shrink it, fast ones grow it
+            limiter.release(latency if latency is not None else time.perf_counter() - start, ok=ok)
+
+    return release
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that calls `on_close` once it has been sent or
+    abandoned, even if the client left before the body started. The body
+    releases what it holds itself; `on_close(ok=None)` only takes effect if
+    it never ran, which is the client's doing, not a failure.
+    """
+
+    def __init__(self, content: AsyncIterator[str], on_close, **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close(ok=None)
+
 @app.post("/query")
-async def process_query_endpoint(query: str): # Using query: str for simplicity (form data)
+async def process_query_endpoint(query: str, wait: bool = False): # Using query: str for simplicity (form data)
     """
     Processes a query by analyzing capabilities, discovering and integrating missing tools (mocked),
     and then executing the query (mocked).
+
+    Missing capabilities are integrated in the background: the response comes at once,
+    with the results of the capabilities available now and a `job_id`. GET /jobs/{job_id}
+    reports the integration's progress, and the full answer once it is done; GET
+    /jobs/{job_id}/events streams the same as server-sent events. With `wait=true`
+    the request blocks until the missing capabilities are integrated instead.
+
+    Under overload, queries beyond the adaptive concurrency limit are rejected
+    with 429 and a Retry-After header rather than queued.
+    """
+    release = admit_query("query")
+    ok = False
+    try:
+        response_data = await answer_query(query, wait)
+        ok = True
+        return response_data
+    finally:
+        release(ok=ok)
+
+async def answer_query(query: str, wait: bool) -> Dict[str, Any]:
+    """
+    The /query pipeline, once the query has been admitted.
     """
     global mcp_client, capability_registry # Ensure we're using the global instances
 
-    print(f"\nReceived query: '{query}'")
-
     # 1. Analyze capabilities
-    required_capabilities = analyze_capabilities(query)
-    print(f"Required capabilities: {required_capabilities}")
-
-    # 2. Find missing capabilities
-    # find_missing_capability returns the *first* missing one or None.
-    # For this logic, we want to see if *any* capability in required_capabilities is missing.
-    # A more robust check might be needed if we want to discover tools for *all* missing ones at once.
-
-    missing_capability_found: Optional[str] = None
-    all_required_available = True
-    for cap in required_capabilities:
-        if not capability_registry.can_handle(cap):
-            missing_capability_found = cap # Record the first one found for the response
-            all_required_available = False
-            print(f"Missing capability: {cap}")
-            break # For this flow, we handle one missing capability discovery at a time
-
-    # 3. Initialize newly integrated tools count
-    newly_integrated_tools_count = 0
+    required_capabilities = await analyze_capabilities(query)
 
-    # 4. If a capability is missing, try to discover and integrate tools
-    if not all_required_available and missing_capability_found:
-        print(f"Attempting to discover tools for missing capability: {missing_capability_found}")
-        # Pass a list with the specific missing capability we are trying to resolve now
-        discovered_tools = await discover_tools_placeholder([missing_capability_found])
-
-        if discovered_tools:
-            print(f"Discovered {len(discovered_tools)} tool(s). Integrating them...")
-            for tool in discovered_tools:
-                await integrate_tool_placeholder(tool)
-                mcp_client.register_tool(tool)
-                capability_registry.register_capability_from_tool(tool)
-                newly_integrated_tools_count += 1
-                print(f"Successfully registered: {tool.name}")
-            # Re-check if the specific missing capability is now handled
-            if capability_registry.can_handle(missing_capability_found):
-                print(f"Capability '{missing_capability_found}' is now handled.")
-            else:
-                print(f"WARN: Capability '{missing_capability_found}' still not handled after integration attempt.")
-        else:
-            print(f"No tools discovered for missing capability: {missing_capability_found}")
-
-    # 5. Execute the query
-    # Determine a primary capability for execution (e.g., the first one from the required list)
-    primary_capability_for_execution = required_capabilities[0] if required_capabilities else None
-
-    # We need to re-evaluate if the primary capability (or all) are now available
-    final_execution_capability = None
-    if primary_capability_for_execution and capability_registry.can_handle(primary_capability_for_execution):
-        final_execution_capability = primary_capability_for_execution
-    else:
-        # Fallback or alternative logic if primary is still missing
-        # For now, we'll just note it won't execute if primary is not ready
-        print(f"Primary capability '{primary_capability_for_execution}' not available for execution.")
+    # 2. Find all missing capabilities
+    # Read from one consistent version of the index, even if integration runs concurrently
+    with metrics.timer("query_stage_seconds", stage="missing_check"):
+        snapshot = capability_registry.snapshot()
+        missing_capabilities = [cap for cap in required_capabilities if not snapshot.can_handle(cap)]
+    logger.debug("query_received", query=query, required=required_capabilities, missing=missing_capabilities)
 
-    if final_execution_capability:
-        result = await execute_query_placeholder(query, mcp_client, final_execution_capability)
-    else:
-        result = {"status": "error", "result": f"Could not execute query. Primary capability '{primary_capability_for_execution}' not available."}
+    # 3. Discover and integrate tools for every missing capability, if the caller waits for them
+    newly_integrated_tools_count = 0
+    to_discover = discoverable(missing_capabilities)
+    if to_discover and wait:
+        with metrics.timer("query_stage_seconds", stage="discover"):
+            integrated_tools = await discovery_coordinator.resolve_many(to_discover)
+        newly_integrated_tools_count = sum(len(tools) for tools in integrated_tools.values())
+        unresolved = [cap for cap in to_discover if not capability_registry.can_handle(cap)]
+        if unresolved:
+            logger.warning("capabilities_unresolved", capabilities=unresolved)
+
+    # 4. Execute the query and 5. return the response
+    response_data = await execute_and_build_response(
+        query, required_capabilities, missing_capabilities, newly_integrated_tools_count
+    )
+    # Otherwise in the background, followed by the full answer
+    job = None
+    if not wait:
+        job = submit_integration_job(query, required_capabilities, response_data)
+    response_data["job_id"] = job.id if job is not None else None
+    metrics.inc("queries_total", endpoint="query", status=response_data["response"]["status"])
+    return response_data
 
+def submit_integration_job(query: str, required_capabilities: List[str], partial_answer: Dict[str, Any]) -> Optional[IntegrationJob]:
+    """
+    Queues the integration of the capabilities a query's partial answer was
+    missing, followed by the full answer. Returns None if none can be
+    discovered, or if the queue is full: the query then gets only its partial
+    answer.
+    """
+    missing_capabilities = discoverable(partial_answer["missing_capabilities"])
+    if not missing_capabilities:
+        return None
+
+    async def answer(job: IntegrationJob) -> Dict[str, Any]:
+        unresolved = [cap for cap in missing_capabilities if not capability_registry.can_handle(cap)]
+        if len(unresolved) == len(missing_capabilities):
+            # Nothing became available, so the answer already given stands
+            logger.warning("capabilities_unresolved", capabilities=unresolved, job_id=job.id)
+            return partial_answer
+        if unresolved:
+            logger.warning("capabilities_unresolved", capabilities=unresolved, job_id=job.id)
+        return await execute_and_build_response(query, required_capabilities, missing_capabilities, len(job.tool_ids))
+
+    try:
+        return integration_queue.submit(missing_capabilities, on_resolved=answer)
+    except asyncio.QueueFull:
+        logger.warning("integration_queue_full", capabilities=missing_capabilities)
+        return None
+
+async def execute_and_build_response(
+    query: str,
+    required_capabilities: List[str],
+    missing_capabilities: List[str],
+    newly_integrated_tools_count: int
+) -> Dict[str, Any]:
+    """
+    Executes the query plan and builds the response payload.
+    Shared by the single and batch query endpoints.
+    """
+    result = await execute_query_plan(query, required_capabilities)
+    return build_response(result, required_capabilities, missing_capabilities, newly_integrated_tools_count)
+
+def build_response(
+    result: Dict[str, Any],
+    required_capabilities: List[str],
+    missing_capabilities: List[str],
+    newly_integrated_tools_count: int
+) -> Dict[str, Any]:
+    """
+    The response payload for an executed plan's merged result.
+    """
+    executed_capabilities = [
+        cap for cap, node_result in result["nodes"].items() if node_result.get("status") not in ("error", "skipped")
+    ]
 
-    # 6. Return response
-    response_data = {
+    return {
         "response": result,
         "new_tools_integrated": newly_integrated_tools_count,
         "required_capabilities": required_capabilities,
-        "initial_missing_capability": missing_capability_found, # The first one we tried to resolve
-        "primary_capability_executed": final_execution_capability
+        "missing_capabilities": missing_capabilities,
+        "initial_missing_capability": missing_capabilities[0] if missing_capabilities else None,
+        "capabilities_executed": executed_capabilities
     }
-    print(f"Sending response: {response_data}")
-    return response_data
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    # Optional per-request fan-out limit, capped at BATCH_MAX_CONCURRENCY
+    max_concurrency: Optional[int] = None
+
+@app.post("/query/batch")
+async def process_query_batch_endpoint(batch: BatchQueryRequest):
+    """
+    Processes many queries in one request and streams one NDJSON line per query,
+    in completion order. Each line carries the query's index in the batch.
+
+    Queries are analyzed together, and every missing capability across the batch
+    is discovered once. Queries whose capabilities are all available start
+    executing immediately, without waiting for discovery of the others.
+
+    A batch takes one slot of the query concurrency limit, like a single query,
+    and is rejected with 429 and a Retry-After header under overload. The
+    limit is fed the batch's mean query latency, not its total duration.
+    """
+    fan_out = min(batch.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    fan_out = max(fan_out, 1)
+
+    await capability_analyzer.build_index_async()
+    required_per_query = [
+        required_capabilities or [UNKNOWN_CAPABILITY]
+        for required_capabilities in capability_analyzer.analyze_many(batch.queries)
+    ]
+
+    # Union of missing capabilities across the batch, in first-seen order
+    snapshot = capability_registry.snapshot()
+    missing_per_query = [
+        [cap for cap in required_capabilities if not snapshot.can_handle(cap)]
+        for required_capabilities in required_per_query
+    ]
+    missing_capabilities = list(dict.fromkeys(cap for missing in missing_per_query for cap in discoverable(missing)))
+    logger.debug("batch_received", queries=len(batch.queries), missing=missing_capabilities)
+    # Admitted once analyzed: the analysis never waits, so it holds no slot
+    release = admit_query("query_batch")
+    # Execution time of each query, from when it gets its share of the fan-out
+    latencies: List[float] = []
+
+    async def answer(index: int, semaphore: asyncio.Semaphore, discoveries: Dict[str, asyncio.Future]) -> Dict[str, Any]:
+        query = batch.queries[index]
+        missing = missing_per_query[index]
+        try:
+            newly_integrated_tools_count = 0
+            to_discover = discoverable(missing)
+            if to_discover:
+                with metrics.timer("query_stage_seconds", stage="discover"):
+                    integrated_tools = await asyncio.gather(*(discoveries[cap] for cap in to_discover))
+                newly_integrated_tools_count = sum(len(tools) for tools in integrated_tools)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response_data = await execute_and_build_response(
+                        query, required_per_query[index], missing, newly_integrated_tools_count
+                    )
+                finally:
+                    latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            logger.error("batch_query_failed", index=index, error=str(e))
+            response_data = {"response": {"status": "error", "result": str(e)}}
+        metrics.inc("queries_total", endpoint="query_batch", status=response_data["response"]["status"])
+        return {"index": index, "query": query, **response_data}
+
+    async def stream_results():
+        semaphore = asyncio.Semaphore(fan_out)
+        # Each missing capability is discovered once, shared by every query that needs it
+        discoveries = {
+            capability: asyncio.ensure_future(discovery_coordinator.resolve(capability))
+            for capability in missing_capabilities
+        }
+        tasks = [asyncio.ensure_future(answer(index, semaphore, discoveries)) for index in range(len(batch.queries))]
+        ok: Optional[bool] = False
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+            ok = True
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client disconnected: no verdict on the server's load
+            ok = None
+            raise
+        finally:
+            # Stop outstanding work if the client disconnects mid-stream
+            for task in [*tasks, *discoveries.values()]:
+                task.cancel()
+            release(ok=ok, latency=sum(latencies) / len(latencies) if latencies else None)
+
+    return ReleasingStreamingResponse(stream_results(), release, media_type="application/x-ndjson")
+
+async def stream_query(query: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    The /query pipeline as events: "plan" at once, with the capabilities
+    required, missing and planned; "chunk" and "node" as the plan's tools
+    produce output; then "done", carrying what POST /query would answer.
+    Missing capabilities are integrated in the background, as by /query.
+    """
+    required_capabilities = await analyze_capabilities(query)
+    with metrics.timer("query_stage_seconds", stage="missing_check"):
+        snapshot = capability_registry.snapshot()
+        missing_capabilities = [cap for cap in required_capabilities if not snapshot.can_handle(cap)]
+    logger.debug("query_stream_received", query=query, required=required_capabilities, missing=missing_capabilities)
+    plan = execution_planner.build_plan(required_capabilities)
+    yield {
+        "event": "plan",
+        "required_capabilities": required_capabilities,
+        "missing_capabilities": missing_capabilities,
+        "plan": plan.capabilities
+    }
+
+    result: Dict[str, Any] = {}
+    async with aclosing(execution_planner.stream(plan, query)) as events:
+        async for event in events:
+            if event["event"] == "done":
+                result = {key: value for key, value in event.items() if key != "event"}
+            else:
+                yield event
+
+    response_data = build_response(result, required_capabilities, missing_capabilities, 0)
+    job = submit_integration_job(query, required_capabilities, response_data)
+    response_data["job_id"] = job.id if job is not None else None
+    metrics.inc("queries_total", endpoint="query_stream", status=response_data["response"]["status"])
+    yield {"event": "done", **response_data}
+
+async def observed_stream(query: str, transport: str, release) -> AsyncIterator[Dict[str, Any]]:
+    """
+    stream_query(), recording the time to first byte and to first partial
+    result, and releasing the query's admission slot when it ends. The limit
+    is fed the time to first byte: how long the client takes to read the
+    rest is not load on the server.
+    """
+    start = time.perf_counter()
+    ttfb: Optional[float] = None
+    first_result = True
+    completed = False
+    try:
+        async with aclosing(stream_query(query)) as events:
+            async for event in events:
+                yield event
+                # Resumed once the transport has sent the event
+                elapsed = time.perf_counter() - start
+                if ttfb is None:
+                    ttfb = elapsed
+                    metrics.observe("stream_ttfb_seconds", ttfb, transport=transport)
+                if first_result and event["event"] in ("chunk", "node"):
+                    first_result = False
+                    metrics.observe("stream_first_result_seconds", elapsed, transport=transport)
+        completed = True
+    finally:
+        if not completed:
+            metrics.inc("streams_cancelled_total", transport=transport)
+            logger.info("query_stream_cancelled", query=query, transport=transport)
+        release(ok=ttfb is not None, latency=ttfb)
+
+@app.get("/query/stream")
+async def query_stream_endpoint(query: str):
+    """
+    Processes a query like POST /query, streaming server-sent events as they
+    happen: "plan", then "chunk" for each piece of output a streaming tool
+    produces and "node" as each capability finishes, then "done" with the
+    full response. Partial results arrive long before a slow tool finishes.
+
+    A client that disconnects cancels the query, down to the running tools.
+    """
+    release = admit_query("query_stream")
+
+    async def stream_events():
+        async for event in observed_stream(query, "sse", release):
+            yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    # Proxies must not buffer the events
+    return ReleasingStreamingResponse(
+        stream_events(), release, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/query/stream/ws")
+async def query_stream_websocket(websocket: WebSocket):
+    """
+    The events of GET /query/stream over a WebSocket, as JSON messages. The
+    client sends {"query": "..."} and receives the query's events, ending
+    with "done"; it may then send the next query. Sending {"type": "cancel"}
+    or closing the socket cancels the query in progress.
+
+    A query shed by admission control gets {"event": "error", "status": 429,
+    "retry_after": seconds} instead.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            query = parse_stream_message(await websocket.receive_text()).get("query")
+            if not isinstance(query, str) or not query:
+                await websocket.send_json({"event": "error", "status": 400, "detail": 'Expected {"query": "..."}'})
+                continue
+            try:
+                release = admit_query("query_stream")
+            except HTTPException as e:
+                await websocket.send_json({"event": "error", "status": e.status_code, "retry_after": int(e.headers["Retry-After"])})
+                continue
+            if not await send_stream(websocket, observed_stream(query, "websocket", release)):
+                break
+    except WebSocketDisconnect:
+        pass
+
+def parse_stream_message(text: str) -> Dict[str, Any]:
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return {}
+    return message if isinstance(message, dict) else {}
+
+async def send_stream(websocket: WebSocket, events: AsyncIterator[Dict[str, Any]]) -> bool:
+    """
+    Sends a query's events while listening for the client cancelling or
+    disconnecting, either of which stops the query. Returns False once the
+    client is gone.
+    """
+
+    async def forward():
+        async with aclosing(events):
+            async for event in events:
+                await websocket.send_text(json.dumps(event, default=str))
+
+    async def listen() -> bool:
+        # Other messages are ignored until the query is done
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return False
+            if parse_stream_message(message.get("text") or "").get("type") == "cancel":
+                return True
+
+    sending = asyncio.ensure_future(forward())
+    listening = asyncio.ensure_future(listen())
+    try:
+        await asyncio.wait([sending, listening], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (sending, listening):
+            task.cancel()
+        await asyncio.gather(sending, listening, return_exceptions=True)
+    if not sending.cancelled():
+        # Sending fails once the client is gone
+        return sending.exception() is None
+    connected = listening.result()
+    if connected:
+        await websocket.send_json({"event": "cancelled"})
+    return connected
+
+def get_job_or_404(job_id: str) -> IntegrationJob:
+    job = integration_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job '{job_id}'")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def job_status_endpoint(job_id: str):
+    """
+    Returns a background integration job's progress per capability, and the
+    full answer to its query once it has completed.
+    """
+    return get_job_or_404(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events_endpoint(job_id: str):
+    """
+    Streams a job's state as server-sent events: once now, then on every
+    change. The stream ends after the event carrying the final result.
+    """
+    job = get_job_or_404(job_id)
+
+    async def stream_events():
+        async for update in job.updates():
+            yield f"event: job\ndata: {json.dumps(update)}\n\n"
+
+    return StreamingResponse(stream_events(), media_type="text/event-stream")
+
+@app.get("/discovery/stats")
+async def discovery_stats_endpoint():
+    """
+    Returns hit/miss/coalesced counters of the discovery coordinator.
+    """
+    return discovery_coordinator.stats()
+
+@app.get("/cache/stats")
+async def cache_stats_endpoint():
+    """
+    Returns hit rates and memory use of the result cache.
+    """
+    return mcp_client.result_cache.stats()
+
+@app.post("/cache/invalidate")
+async def cache_invalidate_endpoint(capability: Optional[str] = None):
+    """
+    Drops cached results for one capability, or the whole cache if none is given.
+    """
+    removed = mcp_client.result_cache.invalidate(capability)
+    return {"invalidated": removed, "capability": capability}
+
+def collect_component_gauges():
+    """
+    Reports discovery, integration queue, cache, logging, admission control,
+    local tool pool and shared registry state at scrape time.
+    """
+    for name, value in discovery_coordinator.stats().items():
+        yield f"discovery_{name}", {}, value
+    for name, value in integration_queue.stats().items():
+        yield f"integration_queue_{name}", {}, value
+    cache_stats = mcp_client.result_cache.stats()
+    for name in ("entries", "bytes", "hits", "stale_hits", "misses", "evictions", "hit_rate"):
+        yield f"result_cache_{name}", {}, cache_stats[name]
+    yield "log_records_dropped", {}, dropped_records()
+    if query_limiter is not None:
+        for name, value in query_limiter.stats().items():
+            yield f"query_concurrency_{name}", {}, value
+    for kind, limits in (("tool", mcp_client.tool_limits), ("capability", mcp_client.capability_limits)):
+        if limits is None:
+            continue
+        for key, limit_stats in limits.stats().items():
+            for name, value in limit_stats.items():
+                yield f"{kind}_concurrency_{name}", {kind: key}, value
+    if local_tool_pool is not None:
+        for name, value in local_tool_pool.stats().items():
+            yield f"local_tools_{name}", {}, value
+    if capability_registry.store is not None:
+        for name, value in capability_registry.store.stats().items():
+            yield f"registry_{name}", {}, value
+    if registry_notifier is not None:
+        for name, value in registry_notifier.stats().items():
+            yield f"registry_notifier_{name}", {}, value
+
+metrics.register_collector(collect_component_gauges)
+# Component statistics that only ever increase; the others are gauges
+metrics.declare_counters([
+    *(f"discovery_{name}" for name in ("hits", "misses", "coalesced", "resolved_elsewhere")),
+    *(f"integration_queue_{name}" for name in ("submitted", "deduplicated", "retries", "failed", "rejected")),
+    *(f"result_cache_{name}" for name in ("hits", "stale_hits", "misses", "evictions")),
+    "log_records_dropped",
+    *(f"query_concurrency_{name}" for name in ("admitted", "shed", "decreases")),
+    *(f"{kind}_concurrency_{name}" for kind in ("tool", "capability") for name in ("admitted", "shed_queue_full", "shed_timeout")),
+    *(f"local_tools_{name}" for name in ("calls", "shared_memory_bytes", "started", "recycled", "crashed", "timed_out", "reloads")),
+    "registry_compactions",
+    *(f"registry_notifier_{name}" for name in ("sent", "received")),
+])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Exposes p50/p95/p99 latency per query stage and per tool, plus component
+    gauges, in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 # --- Uvicorn Runner ---
 # This is for local development. In production, you'd use Gunicorn or another ASGI server.
 if __name__ == "__main__":
     import uvicorn
 
-    print("Starting FastAPI application with Uvicorn...")
-    # Note: The global mcp_client and capability_registry are set up when the module is imported.
-    # If setup_essential_tools had async operations, it would need to be run in an event loop
-    # or via FastAPI's startup events. For now, it's synchronous.
+    configure_logging(level=LOG_LEVEL, sample_rates=LOG_SAMPLE_RATES)
+    logger.info("server_starting", host="0.0.0.0", port=8000)
+    # Note: The global mcp_client and capability_registry are set up by lifespan() at startup.
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
 # To run this:
@@ -221,3 +974,4 @@ if __name__ == "__main__":
 #    curl -X POST "http://localhost:8000/query?query=what%20is%20the%20weather" -H "accept: application/json"
 #    curl -X POST "http://localhost:8000/query?query=search%20for%20cats" -H "accept: application/json"
 #    curl -X POST "http://localhost:8000/query?query=summarize%20this%20news" -H "accept: application/json" (to test discovery)
+#    curl "http://localhost:8000/jobs/<job_id from the previous response>" (full answer once integrated)
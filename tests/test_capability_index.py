@@ -0,0 +1,47 @@
+"""
+Copy-on-write capability index: snapshots stay unchanged while the index is
+written, across shard growth.
+"""
+import random
+from typing import Dict, List, Tuple
+
+from components.capability_index import CapabilityIndex
+from components.mcp_client import MCPTool
+
+def mappings(snapshot) -> Tuple[Dict[str, List[str]], Dict[str, Tuple[str, ...]]]:
+    capabilities = {capability: list(tool_ids) for capability, tool_ids in snapshot.capabilities.items()}
+    tools = {tool_id: snapshot.get_capabilities_for_tool(tool_id) for tool_id in snapshot.tools}
+    return capabilities, tools
+
+def test_snapshots_are_unaffected_by_later_writes():
+    rng = random.Random(7)
+    index = CapabilityIndex()
+    # tool ID -> capabilities, the model the index is checked against
+    model: Dict[str, Tuple[str, ...]] = {}
+    frozen = []
+    for step in range(5_000):
+        tool_id = f"tool_{rng.randrange(1_500)}"
+        if tool_id in model and rng.random() < 0.3:
+            index.deregister_tool(tool_id)
+            del model[tool_id]
+        else:
+            capabilities = tuple(dict.fromkeys(f"capability_{rng.randrange(400)}" for _ in range(rng.randint(1, 3))))
+            index.register_tool(MCPTool(id=tool_id, name=tool_id, capabilities=capabilities))
+            model[tool_id] = capabilities
+        if step % 250 == 0:
+            snapshot = index.snapshot()
+            frozen.append((snapshot, mappings(snapshot)))
+
+    snapshot = index.snapshot()
+    capabilities, tools = mappings(snapshot)
+    assert tools == model
+    expected: Dict[str, List[str]] = {}
+    for tool_id, tool_capabilities in model.items():
+        for capability in tool_capabilities:
+            expected.setdefault(capability, []).append(tool_id)
+    assert {capability: sorted(tool_ids) for capability, tool_ids in capabilities.items()} == {
+        capability: sorted(tool_ids) for capability, tool_ids in expected.items()
+    }
+    assert len(snapshot.tools) == len(model) and len(snapshot.capabilities) == len(expected)
+    for old_snapshot, old_mappings in frozen:
+        assert mappings(old_snapshot) == old_mappings
@@ -0,0 +1,19 @@
+"""
+Cache key canonicalization.
+"""
+from components.result_cache import ResultCache
+
+def test_free_text_fields_ignore_whitespace_and_case():
+    cache = ResultCache()
+    assert cache.make_key("web_search", {"query": "Weather in  Paris "}) == cache.make_key("web_search", {"query": "weather in paris"})
+
+def test_other_strings_are_keyed_verbatim():
+    cache = ResultCache()
+    assert cache.make_key("summarizer", {"text": "a  b"}) != cache.make_key("summarizer", {"text": "a b"})
+    assert cache.make_key("file_reader", {"path": "/data/README"}) != cache.make_key("file_reader", {"path": "/data/readme"})
+    # Downstream inputs the planner passes are payloads, not free text
+    assert cache.make_key("summarizer", {"query": "q", "inputs": {"news_api": "x\ny"}}) != cache.make_key("summarizer", {"query": "q", "inputs": {"news_api": "x y"}})
+
+def test_argument_order_does_not_matter():
+    cache = ResultCache()
+    assert cache.make_key("web_search", {"query": "q", "limit": 5}) == cache.make_key("web_search", {"limit": 5, "query": "q"})
@@ -0,0 +1,51 @@
+"""
+Incremental matcher build: slices on the event loop, over a persisted
+registry, with registry changes arriving during the build.
+"""
+import asyncio
+
+from components.capability_registry import CapabilityRegistry
+from components.mcp_client import MCPTool
+from components.registry_store import RegistryStore
+from components.semantic_matcher import BUILD_SLICE, SemanticMatcher
+
+QUERIES = ["integrated tool 17", "kw123", "capability 42 tool", "brand new tool", "giraffe"]
+
+def persisted_registry(directory: str, tool_count: int) -> CapabilityRegistry:
+    store = RegistryStore(directory)
+    registry = CapabilityRegistry(store.load(), store=store)
+    for i in range(tool_count):
+        registry.register_capability_from_tool(MCPTool(
+            id=f"tool_{i}",
+            name=f"Integrated Tool {i}",
+            capabilities=[f"capability_{i % 300}", f"capability_{i * 7 % 300}"],
+            keywords=[f"kw{i}"]
+        ))
+    store.close()
+    # Reopened, the tools live in the base segment rather than in memory
+    store = RegistryStore(directory)
+    return CapabilityRegistry(store.load(), store=store)
+
+def test_incremental_build_applies_changes_made_during_it(tmp_path):
+    async def main():
+        registry = persisted_registry(str(tmp_path), BUILD_SLICE * 2)
+        matcher = SemanticMatcher(registry)
+        build = asyncio.ensure_future(matcher.build_async())
+        await asyncio.sleep(0)
+        assert not build.done() and matcher.match("integrated tool") == []
+        registry.register_capability_from_tool(MCPTool(id="new", name="Brand New Tool", capabilities=["capability_1", "fresh"]))
+        registry.add_keywords("capability_2", ["giraffe"])
+        registry.deregister_tool("tool_3")
+        await build
+        assert matcher.ready
+
+        rebuilt = SemanticMatcher(registry)
+        rebuilt.build()
+        # Scores differ slightly: rows replaced by the changes still count towards IDF
+        for query in QUERIES:
+            assert [name for name, _ in matcher.match(query)] == [name for name, _ in rebuilt.match(query)], query
+        assert matcher.match("brand new tool")[0][0] == "fresh"
+        assert matcher.match("giraffe", min_score=0.0)[0][0] == "capability_2"
+        registry.store.close(compact=False)
+
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+"""
+Local tool worker pool: a cancelled call does not keep holding its worker.
+"""
+import asyncio
+import os
+
+from components.tool_process_pool import ToolProcessPool
+
+SLEEPY_TOOL = '''import time
+
+TOOL = {"capabilities": ["sleeping"]}
+
+def run(seconds=0.0, **_):
+    time.sleep(seconds)
+    return seconds
+'''
+
+def test_cancelled_call_replaces_its_worker(tmp_path):
+    with open(os.path.join(tmp_path, "sleepy.py"), "w") as tool_file:
+        tool_file.write(SLEEPY_TOOL)
+
+    async def main():
+        pool = ToolProcessPool(str(tmp_path), workers=1, reload_interval=None)
+        await pool.start()
+        try:
+            call = asyncio.ensure_future(pool.call("sleepy", seconds=30.0))
+            await asyncio.sleep(0.2)
+            [busy] = pool._workers
+            call.cancel()
+            await asyncio.gather(call, return_exceptions=True)
+            assert pool.stats()["abandoned"] == 1
+            # The replacement serves the next call; the killed worker is not waited for
+            assert await asyncio.wait_for(pool.call("sleepy", seconds=0.0), timeout=20.0) == 0.0
+            assert busy not in pool._workers and busy.process.exitcode is not None
+            assert pool.stats()["crashed"] == 0
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+Tool selection, failover and hedging against local stub tools with injected
+delays, stalls and failures.
+"""
+import asyncio
+import random
+from collections import Counter
+
+import pytest
+
+from components.mcp_client import MCPClient, MCPTool
+from components.tool_selector import PowerOfTwoChoicesSelector
+
+def stub_tool(tool_id: str, delay: float, failure_rate: float = 0.0, stall_rate: float = 0.0, stall: float = 0.0) -> MCPTool:
+    rng = random.Random(tool_id)
+
+    async def handler(**task_args):
+        if rng.random() < stall_rate:
+            await asyncio.sleep(stall)
+        await asyncio.sleep(delay)
+        if rng.random() < failure_rate:
+            raise RuntimeError(f"{tool_id} failed")
+        return f"{tool_id} handled {task_args.get('query')}"
+
+    return MCPTool(id=tool_id, name=tool_id, capabilities=["web_search"], handler=handler)
+
+async def run_tasks(client: MCPClient, count: int, concurrency: int = 8) -> Counter:
+    used = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            result = await client.execute_task("web_search", {"query": f"q{i}"})
+            used[result.get("tool_id") if result["status"] == "success" else "error"] += 1
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return used
+
+def assert_nothing_in_flight(client: MCPClient):
+    in_flight = {tool_id: stats.in_flight for tool_id, stats in client.selector.stats.items() if stats.in_flight}
+    assert in_flight == {}
+
+def test_p2c_prefers_fast_tool_and_fails_over_flaky_one():
+    async def main():
+        client = MCPClient(selector=PowerOfTwoChoicesSelector(rng=random.Random(1)))
+        client.register_tool(stub_tool("slow", delay=0.05))
+        client.register_tool(stub_tool("fast", delay=0.005))
+        client.register_tool(stub_tool("flaky", delay=0.005, failure_rate=0.5))
+        used = await run_tasks(client, 300)
+        assert used["error"] == 0, used
+        assert used["fast"] > used["slow"] and used["fast"] > used["flaky"], used
+        assert_nothing_in_flight(client)
+
+    asyncio.run(main())
+
+def test_failover_to_backup():
+    async def main():
+        client = MCPClient()
+        client.register_tool(stub_tool("broken", delay=0.001, failure_rate=1.0))
+        client.register_tool(stub_tool("backup", delay=0.001))
+        result = await client.execute_task("web_search", {"query": "cats"})
+        assert result["status"] == "success" and result["tool_id"] == "backup", result
+        assert client.selector.stats["broken"].failures == 1
+        assert_nothing_in_flight(client)
+
+    asyncio.run(main())
+
+@pytest.mark.parametrize("hedge", [False, True])
+def test_all_tools_failing_aggregates_errors(hedge: bool):
+    async def main():
+        client = MCPClient(hedge=hedge)
+        client.register_tool(stub_tool("broken_1", delay=0.001, failure_rate=1.0))
+        client.register_tool(stub_tool("broken_2", delay=0.001, failure_rate=1.0))
+        result = await client.execute_task("web_search", {"query": "cats"})
+        assert result["status"] == "error", result
+        assert sorted(result["errors"]) == ["broken_1: broken_1 failed", "broken_2: broken_2 failed"], result["errors"]
+        assert_nothing_in_flight(client)
+
+    asyncio.run(main())
+
+def test_hedging_masks_stalls_on_p99():
+    async def p99(hedge: bool) -> float:
+        client = MCPClient(hedge=hedge)
+        client.register_tool(stub_tool("stalling", delay=0.002, stall_rate=0.03, stall=0.2))
+        client.register_tool(stub_tool("steady", delay=0.004))
+        loop = asyncio.get_running_loop()
+        latencies = []
+        for i in range(200):
+            start = loop.time()
+            result = await client.execute_task("web_search", {"query": f"q{i}"})
+            latencies.append(loop.time() - start)
+            assert result["status"] == "success", result
+        # Losing hedges are cancelled, not left running
+        await asyncio.sleep(0.01)
+        assert_nothing_in_flight(client)
+        return sorted(latencies)[198]
+
+    async def main():
+        unhedged = await p99(False)
+        hedged = await p99(True)
+        assert hedged < unhedged / 2, (hedged, unhedged)
+
+    asyncio.run(main())
+
+def test_cancelled_caller_cancels_call_before_hedge():
+    async def main():
+        client = MCPClient(hedge=True)
+        calls = Counter()
+
+        async def hanging(**task_args):
+            calls["started"] += 1
+            try:
+                # 20 ms until the tool has enough samples for a hedge delay, then hangs
+                await asyncio.sleep(0.02 if calls["started"] <= client.selector.min_hedge_samples else 10.0)
+            except asyncio.CancelledError:
+                calls["cancelled"] += 1
+                raise
+            return "done"
+
+        client.register_tool(MCPTool(id="hanging", name="hanging", capabilities=["web_search"], handler=hanging))
+        client.register_tool(stub_tool("spare", delay=10.0))
+        for i in range(client.selector.min_hedge_samples):
+            assert (await client.execute_task("web_search", {"query": f"warmup {i}"}))["tool_id"] == "hanging"
+        task = asyncio.ensure_future(client.execute_task("web_search", {"query": "q"}))
+        # Cancelled well before the 20 ms hedge delay
+        await asyncio.sleep(0.005)
+        task.cancel()
+        await asyncio.sleep(0.005)
+        assert calls["cancelled"] == 1, calls
+        assert_nothing_in_flight(client)
+
+    asyncio.run(main())
+
+def test_p2c_scores_only_sampled_candidates_until_failover():
+    class CountingSelector(PowerOfTwoChoicesSelector):
+        scored = 0
+
+        def score(self, tool_id: str) -> float:
+            self.scored += 1
+            return super().score(tool_id)
+
+    selector = CountingSelector(rng=random.Random(1))
+    tool_ids = [f"tool_{i}" for i in range(1_000)]
+    ranked = selector.rank(tool_ids)
+    first_two = [next(ranked), next(ranked)]
+    assert selector.scored == 2
+    assert sorted(first_two + list(ranked)) == sorted(tool_ids)
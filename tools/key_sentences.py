@@ -0,0 +1,56 @@
+"""
+Local tool: the key sentence of each paragraph of a text, streamed one
+paragraph at a time, as an extractive summary.
+
+run() is a generator, so each sentence reaches the client as soon as its
+paragraph has been processed; see tools/text_statistics.py for the module
+layout.
+"""
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, Optional
+
+TOOL = {
+    "id": "key_sentences",
+    "name": "Key Sentences Tool",
+    "capabilities": ["key_sentences"],
+    "keywords": ["key sentences", "highlights", "tl;dr"],
+}
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"[^.!?]+[.!?]*")
+_WORD = re.compile(r"[a-z]+")
+# Words too common to say what a sentence is about
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+def key_sentence(paragraph: str) -> Optional[str]:
+    """
+    The sentence whose words are the most frequent in its paragraph, per
+    word, ignoring stop words.
+    """
+    sentences = [sentence.strip() for sentence in _SENTENCE.findall(paragraph) if sentence.strip()]
+    if not sentences:
+        return None
+    frequencies = Counter(word for word in _WORD.findall(paragraph.lower()) if word not in STOP_WORDS)
+
+    def score(sentence: str) -> float:
+        words = [word for word in _WORD.findall(sentence.lower()) if word not in STOP_WORDS]
+        return sum(frequencies[word] for word in words) / len(words) if words else 0.0
+
+    return max(sentences, key=score)
+
+def run(query: str = "", inputs: Optional[Dict[str, Any]] = None, text: Optional[str] = None, **_: Any) -> Iterator[str]:
+    """
+    Summarizes `text` if given, else the outputs of the capabilities this one
+    depends on, else the query itself.
+    """
+    if text is None:
+        text = "\n\n".join(str(value) for value in inputs.values()) if inputs else query
+    first = True
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        sentence = key_sentence(paragraph)
+        if sentence is not None:
+            yield sentence if first else f" {sentence}"
+            first = False
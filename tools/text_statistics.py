@@ -0,0 +1,54 @@
+"""
+Local tool: word, sentence and readability statistics of a text.
+
+Tools in this directory are run by components.tool_process_pool in worker
+processes. Each module declares its tool in TOOL and provides a synchronous
+run(**task_args) whose return value must be picklable.
+"""
+import re
+from collections import Counter
+from typing import Any, Dict, Optional
+
+TOOL = {
+    "id": "text_statistics",
+    "name": "Text Statistics Tool",
+    "capabilities": ["text_statistics"],
+    "keywords": ["statistics", "word count", "readability"],
+}
+
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_SENTENCE_END = re.compile(r"[.!?]+(?:\s|$)")
+_VOWEL_GROUP = re.compile(r"[aeiouy]+")
+
+def count_syllables(word: str) -> int:
+    """
+    Estimates syllables as groups of vowels, less a silent final "e".
+    """
+    word = word.lower()
+    syllables = len(_VOWEL_GROUP.findall(word))
+    if word.endswith("e") and not word.endswith("le") and syllables > 1:
+        syllables -= 1
+    return max(syllables, 1)
+
+def run(query: str = "", inputs: Optional[Dict[str, Any]] = None, text: Optional[str] = None, top: int = 5, **_: Any) -> Dict[str, Any]:
+    """
+    Analyzes `text` if given, else the outputs of the capabilities this one
+    depends on, else the query itself.
+    """
+    if text is None:
+        text = " ".join(str(value) for value in inputs.values()) if inputs else query
+    words = _WORD.findall(text)
+    sentences = max(len(_SENTENCE_END.findall(text)), 1) if words else 0
+    syllables = sum(count_syllables(word) for word in words)
+    statistics: Dict[str, Any] = {
+        "characters": len(text),
+        "words": len(words),
+        "sentences": sentences,
+        "unique_words": len({word.lower() for word in words}),
+        "top_words": Counter(word.lower() for word in words if len(word) > 3).most_common(top),
+    }
+    if words:
+        statistics["average_word_length"] = round(sum(len(word) for word in words) / len(words), 2)
+        # Flesch reading ease: 60-70 is plain English, lower is harder
+        statistics["reading_ease"] = round(206.835 - 1.015 * len(words) / sentences - 84.6 * syllables / len(words), 1)
+    return statistics